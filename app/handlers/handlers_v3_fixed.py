@@ -14,6 +14,10 @@ from aiogram.types import Message, Sticker
 from aiogram.filters import CommandStart, Command
 from aiogram.exceptions import TelegramBadRequest
 
+from app.handlers.pipeline import UpdatePipeline
+from app.handlers.scheduler import ChatScheduler, ChatSchedulerMiddleware
+from app.handlers.streaming import StreamingReply
+
 logger = logging.getLogger(__name__)
 
 # AI МОДУЛИ
@@ -70,6 +74,15 @@ def register_all_handlers(dp, modules):
     router = Router()
     bot_info = None
     
+    # Фоновая стадия: логирование и обучение не задерживают ответ
+    pipeline = modules.setdefault('update_pipeline', UpdatePipeline())
+    
+    # Порядок внутри чата, чаты параллельно, но не больше N обработчиков сразу
+    scheduler = modules.setdefault(
+        'chat_scheduler', ChatScheduler(modules['config'].bot.max_in_flight_updates)
+    )
+    router.message.outer_middleware(ChatSchedulerMiddleware(scheduler))
+    
     async def get_bot_info():
         nonlocal bot_info
         try:
@@ -98,8 +111,13 @@ def register_all_handlers(dp, modules):
                 logger.info("⚡ Ultimate расширенные триггеры инициализированы")
             
             if MEDIA_AVAILABLE and modules.get('db') and modules.get('bot'):
-                media_triggers = MediaTriggersModule(modules['db'], modules['config'], modules['bot'])
-                await media_triggers.initialize()
+                # Один экземпляр на процесс: счетчики и кулдауны модуля живут в памяти
+                # и сбрасываются в БД фоновой задачей, которую закрывает main.py
+                media_triggers = modules.get('media_triggers')
+                if media_triggers is None:
+                    media_triggers = MediaTriggersModule(modules['db'], modules['config'], modules['bot'])
+                    await media_triggers.initialize()
+                    modules['media_triggers'] = media_triggers
                 logger.info("🎭 Ultimate медиа триггеры инициализированы")
                 
         except Exception as e:
@@ -107,6 +125,7 @@ def register_all_handlers(dp, modules):
     
     asyncio.create_task(get_bot_info())
     asyncio.create_task(initialize_ai_modules())
+    asyncio.create_task(pipeline.start())
     
     # СЛУЖЕБНЫЕ ФУНКЦИИ
     async def update_stats(message: Message):
@@ -166,8 +185,8 @@ def register_all_handlers(dp, modules):
             
         return True
     
-    async def log_and_learn(message: Message):
-        """📝 Логирование"""
+    async def log_and_learn(message: Message, received_at: datetime = None):
+        """📝 Логирование (выполняется воркером фоновой стадии)"""
         try:
             await update_stats(message)
             
@@ -179,7 +198,7 @@ def register_all_handlers(dp, modules):
                     full_name=message.from_user.full_name or '',
                     text=message.text or '',
                     message_type='text',
-                    timestamp=datetime.now()
+                    timestamp=received_at or datetime.now()
                 )
             
             if memory_module:
@@ -193,6 +212,43 @@ def register_all_handlers(dp, modules):
         except Exception as e:
             logger.error(f"❌ Ultimate: Ошибка логирования: {e}")
     
+    async def log_in_background(message: Message):
+        """🧵 Логирование в фоне; порядок внутри чата сохраняется"""
+        await pipeline.submit(message.chat.id, log_and_learn, message, datetime.now())
+    
+    async def reply_with_ai(message: Message, prompt: str, prefix: str, context: dict = None) -> bool:
+        """🧠 Ответ AI: потоком с правками сообщения или целиком"""
+        ai_service = modules['ai']
+        ai_config = modules['config'].ai
+        
+        if ai_config.streaming and hasattr(ai_service, 'stream_response'):
+            interval = (ai_config.stream_edit_interval if message.chat.type == 'private'
+                        else ai_config.stream_group_edit_interval)
+            reply = StreamingReply(message, prefix=prefix, interval=interval)
+            try:
+                text = await reply.run(ai_service.stream_response(
+                    prompt, user_id=message.from_user.id, context=context
+                ))
+            except Exception as e:
+                if not reply.messages:
+                    raise
+                # Часть ответа уже у пользователя - второй ответ был бы дублем
+                logger.error(f"❌ Потоковый ответ прерван: {e}")
+                await reply.finish("\n\n⚠️ Ответ прерван")
+                return True
+            if text:
+                logger.debug(f"✍️ Потоковый ответ: первые слова через {reply.first_chunk_ms or 0:.0f}мс, "
+                             f"{reply.messages} сообщ., {reply.edits} правок")
+            return bool(text)
+        
+        response = await ai_service.generate_response(
+            prompt, user_id=message.from_user.id, context=context
+        )
+        if response:
+            await message.reply(f"{prefix}{response}")
+            return True
+        return False
+    
     # =========================== ВСТРОЕННЫЕ КОМАНДЫ ПЕРСОНАЖЕЙ v3.2 ===========================
     
     @router.message(Command('be'))
@@ -202,7 +258,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         try:
             personality_manager = modules.get('custom_personality_manager')
@@ -288,7 +344,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         try:
             personality_manager = modules.get('custom_personality_manager')
@@ -352,7 +408,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         try:
             personality_manager = modules.get('custom_personality_manager')
@@ -406,7 +462,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         user_name = message.from_user.first_name or "друг"
         
@@ -429,7 +485,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         try:
             karma_manager = modules.get('karma_manager')
@@ -458,7 +514,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
             
-        await log_and_learn(message)
+        await log_in_background(message)
         
         is_admin = message.from_user.id in modules['config'].bot.admin_ids
         is_group = message.chat.id < 0
@@ -510,9 +566,12 @@ def register_all_handlers(dp, modules):
     async def text_handler(message: Message):
         """💬 Умная обработка текста с персонажами v3.2"""
         
-        await log_and_learn(message)
+        # Сначала дешевая проверка доступа, логирование - в фоне (как и раньше,
+        # пишутся все сообщения, включая чаты без доступа)
+        allowed = await check_chat_access(message)
+        await log_in_background(message)
         
-        if not await check_chat_access(message):
+        if not allowed:
             return
         
         if message.text.startswith('/'):
@@ -544,19 +603,15 @@ def register_all_handlers(dp, modules):
                         # ОТВЕЧАЕМ В РОЛИ ПЕРСОНАЖА
                         if modules.get('ai'):
                             try:
-                                ai_service = modules['ai']
-                                
-                                response = await ai_service.generate_response(
+                                # Индикатор персонажа
+                                replied = await reply_with_ai(
+                                    message,
                                     f"Отвечай как персонаж: {personality['system_prompt']}\n\nВопрос: {message.text}",
-                                    user_id=message.from_user.id,
+                                    prefix=f"🎭 {personality['name']}: ",
                                     context={'personality': personality['name']}
                                 )
                                 
-                                if response:
-                                    # Индикатор персонажа
-                                    persona_response = f"🎭 {personality['name']}: {response}"
-                                    await message.reply(persona_response)
-                                    
+                                if replied:
                                     logger.info(f"🎭 Ответ персонажа: {personality['name']} в чате {message.chat.id}")
                                     return
                                     
@@ -566,15 +621,7 @@ def register_all_handlers(dp, modules):
                 # ОБЫЧНЫЙ AI ОТВЕТ (если нет персонажа)
                 if modules.get('ai'):
                     try:
-                        ai_service = modules['ai']
-                        
-                        response = await ai_service.generate_response(
-                            message.text,
-                            user_id=message.from_user.id
-                        )
-
-                        if response:
-                            await message.reply(f"🤖 {response}")
+                        if await reply_with_ai(message, message.text, prefix="🤖 "):
                             return
                             
                     except Exception as e:
@@ -599,7 +646,7 @@ def register_all_handlers(dp, modules):
         if not await check_chat_access(message):
             return
         
-        await log_and_learn(message)
+        await log_in_background(message)
         
         if random.random() < 0.15:
             reactions = ["👍", "😄", "🤷‍♂️", "Норм!", "Ок"]
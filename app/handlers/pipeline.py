@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+🧵 UPDATE PIPELINE - фоновая стадия обработки входящих сообщений
+
+Обработчик сообщения делает только то, что нужно для ответа: проверку
+доступа, решение "отвечать ли" и сам ответ. Логирование, статистика и
+обучение памяти отдаются сюда и выполняются воркерами после ответа.
+
+Задачи раскладываются по воркерам по ключу (id чата), поэтому внутри
+одного чата порядок сохраняется, а разные чаты обрабатываются
+параллельно. Очереди ограничены: если воркеры не успевают, submit()
+ждет свободного места не дольше put_timeout (обратное давление), а
+затем задача отбрасывается и учитывается в метриках - ответ
+пользователю не ждет медленную БД.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+class UpdatePipeline:
+    """🧵 Ограниченные очереди + воркеры для фоновой работы по сообщениям"""
+
+    def __init__(self, workers: int = 4, max_queue: int = 1000, put_timeout: float = 0.1):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, max_queue // self.workers)
+        self.put_timeout = put_timeout
+
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+        # Метрики
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.waited = 0              # Сколько раз submit() ждал места в очереди
+        self.max_job_ms = 0.0
+        self._total_job_ms = 0.0
+        self._last_drop_warning = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self):
+        """▶️ Запуск воркеров"""
+        if self._running:
+            return
+        self._running = True
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+        logger.info(f"🧵 Фоновая стадия запущена: воркеров {self.workers}, очередь {self.queue_size} на воркер")
+
+    async def stop(self, timeout: float = 10.0):
+        """⏹️ Остановка: дожидаемся уже принятых задач, затем гасим воркеры"""
+        if not self._running:
+            return
+        self._running = False
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            pending = sum(queue.qsize() for queue in self._queues)
+            logger.warning(f"⚠️ Фоновая стадия остановлена, не выполнено задач: {pending}")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, key: Any, func: Callable[..., Awaitable], *args, **kwargs) -> bool:
+        """➕ Задача в очередь воркера ключа; False - очередь переполнена"""
+        if not self._running:
+            await self.start()
+
+        queue = self._queues[hash(key) % self.workers]
+        job = (func, args, kwargs)
+
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.waited += 1
+            try:
+                await asyncio.wait_for(queue.put(job), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._drop(func)
+                return False
+
+        self.submitted += 1
+        return True
+
+    def _drop(self, func: Callable):
+        self.dropped += 1
+        now = time.monotonic()
+        if now - self._last_drop_warning > 60:
+            self._last_drop_warning = now
+            logger.warning(
+                f"⚠️ Фоновая очередь переполнена, задача {getattr(func, '__name__', func)} "
+                f"отброшена (всего отброшено: {self.dropped})"
+            )
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            func, args, kwargs = await queue.get()
+            started = time.perf_counter()
+            try:
+                await func(*args, **kwargs)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Ошибка фоновой задачи {getattr(func, '__name__', func)}: {e}")
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._total_job_ms += elapsed_ms
+                self.max_job_ms = max(self.max_job_ms, elapsed_ms)
+                queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Состояние фоновой стадии"""
+        done = self.completed + self.failed
+        return {
+            'running': self._running,
+            'workers': self.workers,
+            'queued': sum(queue.qsize() for queue in self._queues),
+            'queue_capacity': self.queue_size * self.workers,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'backpressure_waits': self.waited,
+            'avg_job_ms': round(self._total_job_ms / done, 2) if done else 0.0,
+            'max_job_ms': round(self.max_job_ms, 2)
+        }
+
+
+__all__ = ["UpdatePipeline"]
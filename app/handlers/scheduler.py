@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+🚦 CHAT SCHEDULER - порядок внутри чата и общий лимит обработки
+
+aiogram запускает каждое обновление отдельной задачей, поэтому всплеск
+сообщений в большой группе мог занять все AI-запросы и соединения БД.
+Планировщик пропускает обработчики так:
+
+• обновления одного чата выполняются строго по очереди;
+• разные чаты выполняются параллельно, но одновременно не больше
+  max_in_flight обработчиков;
+• свободный слот получает следующий чат по кругу (round-robin), а
+  чат, только что отработавший обновление, встает в конец круга -
+  шумная группа не может вытеснить остальные чаты.
+
+По каждому чату считаются длина очереди и время ожидания слота.
+Метрики хранятся для max_tracked_chats чатов, писавших последними:
+самые давние вытесняются (LRU), чтобы словарь не рос с каждым новым
+чатом за время работы бота.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque, OrderedDict
+from typing import Dict, Any, Deque, Tuple, Callable, Awaitable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class ChatQueueStats:
+    """📊 Метрики очереди одного чата"""
+
+    __slots__ = ('processed', 'total_wait_ms', 'max_wait_ms', 'max_queue')
+
+    def __init__(self):
+        self.processed = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.max_queue = 0
+
+    def as_dict(self, queued: int) -> Dict[str, Any]:
+        return {
+            'queued': queued,
+            'max_queue': self.max_queue,
+            'processed': self.processed,
+            'avg_wait_ms': round(self.total_wait_ms / self.processed, 2) if self.processed else 0.0,
+            'max_wait_ms': round(self.max_wait_ms, 2)
+        }
+
+
+class ChatScheduler:
+    """🚦 Очередь на чат + общий лимит одновременных обработчиков"""
+
+    def __init__(self, max_in_flight: int = 8, max_tracked_chats: int = 1000):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_tracked_chats = max(1, max_tracked_chats)
+
+        self._waiters: Dict[Any, Deque[Tuple[asyncio.Future, float]]] = {}
+        self._ready: Deque[Any] = deque()   # Чаты с ожидающими, по кругу
+        self._active: set = set()           # Чаты, чей обработчик сейчас выполняется
+        self._in_flight = 0
+
+        self._chat_stats: 'OrderedDict[Any, ChatQueueStats]' = OrderedDict()
+        self.processed = 0
+        self.max_in_flight_seen = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def run(self, chat_id, func: Callable[..., Awaitable], *args, **kwargs):
+        """▶️ Выполнение обработчика в очереди чата"""
+        await self._acquire(chat_id)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._release(chat_id)
+
+    async def _acquire(self, chat_id):
+        future = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(chat_id, deque())
+        queue.append((future, time.perf_counter()))
+
+        stats = self._stats_for(chat_id)
+        stats.max_queue = max(stats.max_queue, len(queue))
+
+        if chat_id not in self._active and len(queue) == 1:
+            self._ready.append(chat_id)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот уже выдан - возвращаем его
+                self._release(chat_id)
+            else:
+                self._forget(chat_id, future)
+            raise
+
+    def _stats_for(self, chat_id) -> ChatQueueStats:
+        """📊 Метрики чата; давно не писавшие чаты вытесняются"""
+        stats = self._chat_stats.get(chat_id)
+        if stats is None:
+            stats = self._chat_stats[chat_id] = ChatQueueStats()
+            while len(self._chat_stats) > self.max_tracked_chats:
+                self._chat_stats.popitem(last=False)
+        else:
+            self._chat_stats.move_to_end(chat_id)
+        return stats
+
+    def _forget(self, chat_id, future: asyncio.Future):
+        """🗑️ Отмененное ожидание убирается из очереди чата"""
+        queue = self._waiters.get(chat_id)
+        if not queue:
+            return
+        for item in queue:
+            if item[0] is future:
+                queue.remove(item)
+                break
+        if not queue:
+            del self._waiters[chat_id]
+            if chat_id in self._ready:
+                self._ready.remove(chat_id)
+
+    def _dispatch(self):
+        """🔄 Раздача свободных слотов чатам по кругу"""
+        while self._in_flight < self.max_in_flight and self._ready:
+            chat_id = self._ready.popleft()
+            queue = self._waiters.get(chat_id)
+            if not queue:
+                continue
+
+            future, enqueued_at = queue.popleft()
+            if not queue:
+                del self._waiters[chat_id]
+
+            wait_ms = (time.perf_counter() - enqueued_at) * 1000
+            stats = self._stats_for(chat_id)
+            stats.processed += 1
+            stats.total_wait_ms += wait_ms
+            stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+
+            self._active.add(chat_id)
+            self._in_flight += 1
+            self.max_in_flight_seen = max(self.max_in_flight_seen, self._in_flight)
+            future.set_result(None)
+
+    def _release(self, chat_id):
+        self._in_flight -= 1
+        self._active.discard(chat_id)
+        self.processed += 1
+
+        # Следующее обновление чата - в конец круга
+        if self._waiters.get(chat_id):
+            self._ready.append(chat_id)
+        self._dispatch()
+
+    def chat_stats(self, chat_id) -> Optional[Dict[str, Any]]:
+        """📊 Метрики очереди чата"""
+        stats = self._chat_stats.get(chat_id)
+        if stats is None:
+            return None
+        return stats.as_dict(len(self._waiters.get(chat_id, ())))
+
+    def get_stats(self, top: int = 10) -> Dict[str, Any]:
+        """📊 Общие метрики и самые загруженные чаты"""
+        busiest = sorted(
+            self._chat_stats.items(),
+            key=lambda item: (len(self._waiters.get(item[0], ())), item[1].max_wait_ms),
+            reverse=True
+        )[:top]
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self._in_flight,
+            'max_in_flight_seen': self.max_in_flight_seen,
+            'queued': sum(len(queue) for queue in self._waiters.values()),
+            'waiting_chats': len(self._ready),
+            'processed': self.processed,
+            'tracked_chats': len(self._chat_stats),
+            'chats': {chat_id: stats.as_dict(len(self._waiters.get(chat_id, ()))) for chat_id, stats in busiest}
+        }
+
+
+class ChatSchedulerMiddleware(BaseMiddleware):
+    """🚦 Middleware aiogram: обработчики сообщений проходят через ChatScheduler"""
+
+    def __init__(self, scheduler: ChatScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(self, handler, event: TelegramObject, data: Dict[str, Any]):
+        chat = getattr(event, 'chat', None)
+        if chat is None:
+            return await handler(event, data)
+        return await self.scheduler.run(chat.id, handler, event, data)
+
+
+__all__ = ["ChatScheduler", "ChatSchedulerMiddleware", "ChatQueueStats"]
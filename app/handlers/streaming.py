@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+✍️ STREAMING REPLY - ответ AI, который дописывается по мере генерации
+
+Раньше бот ждал весь ответ AI (5-20 секунд на длинных ответах) и только
+потом отправлял сообщение. Теперь:
+
+• первое сообщение уходит, как только пришли первые слова;
+• дальше оно правится (edit_message_text) не чаще раза в interval
+  секунд - части, пришедшие между правками, копятся и уходят одной
+  правкой. Telegram ограничивает правки в чате: ~1 в секунду в личке и
+  ~20 в минуту в группе, отсюда разные интервалы в конфиге;
+• промежуточные правки - простым текстом с курсором ▌ (незакрытая
+  разметка Markdown ломает сообщение), последняя - с разметкой бота,
+  а если разметка не разбирается - простым текстом;
+• ответ длиннее лимита Telegram продолжается новым сообщением;
+• RetryAfter на промежуточной правке откладывает следующую правку, на
+  последней - ждем и повторяем.
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from aiogram.enums import ChatAction
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingReply:
+    """✍️ Ответ на сообщение из потока частей текста с редкими правками"""
+
+    MAX_LENGTH = 4096
+    CURSOR = " ▌"
+
+    def __init__(self, message: Message, prefix: str = "", interval: float = 1.0):
+        self.message = message
+        self.prefix = prefix
+        self.interval = interval
+
+        self.text = ""
+        self.sent: Optional[Message] = None   # Сообщение, которое сейчас правится
+        self._offset = 0                      # Начало его текста в self.text
+        self._shown = ""                      # Что сейчас видно в этом сообщении
+        self._next_edit = 0.0
+
+        # Метрики
+        self.messages = 0
+        self.edits = 0
+        self.first_chunk_ms: Optional[float] = None
+
+    async def run(self, chunks: AsyncIterator[str]) -> str:
+        """🌊 Отправка ответа из потока; возвращает полный текст ("" если его не было)"""
+        started = time.monotonic()
+        await self._typing()
+
+        async for chunk in chunks:
+            if self.first_chunk_ms is None:
+                self.first_chunk_ms = (time.monotonic() - started) * 1000
+            self.text += chunk
+
+            if not self.text.strip():
+                continue
+            if self.sent is None or time.monotonic() >= self._next_edit:
+                await self._flush(final=False)
+
+        if self.text.strip():
+            await self._flush(final=True)
+        return self.text
+
+    async def _typing(self):
+        try:
+            await self.message.bot.send_chat_action(self.message.chat.id, ChatAction.TYPING)
+        except Exception:
+            pass
+
+    # =================== ОТПРАВКА И ПРАВКИ ===================
+
+    async def _flush(self, final: bool):
+        head = self.prefix if self._offset == 0 else ""
+        body = self.text[self._offset:]
+        # Промежуточная правка несет еще и курсор
+        limit = self.MAX_LENGTH if final else self.MAX_LENGTH - len(self.CURSOR)
+
+        # Не влезает в одно сообщение - закрываем текущее, остаток - новым
+        while len(head) + len(body) > limit:
+            cut = self._split_point(body, limit - len(head))
+            await self._show(head + body[:cut], final=True)
+            self._offset += cut
+            self.sent = None
+            self._shown = ""
+            head, body = "", self.text[self._offset:]
+
+        if body.strip() or head:
+            await self._show(head + body + ("" if final else self.CURSOR), final)
+
+    async def finish(self, notice: str = ""):
+        """🧯 Поток прерван: уже отправленная часть остается без курсора, с пометкой notice"""
+        self.text += notice
+        try:
+            await self._flush(final=True)
+        except Exception as e:
+            logger.debug(f"✍️ Не удалось дописать прерванный ответ: {e}")
+            if self.sent is not None and self._shown.endswith(self.CURSOR):
+                try:
+                    await self._deliver(self._shown[:-len(self.CURSOR)], parse_mode=None)
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _split_point(body: str, limit: int) -> int:
+        """✂️ Граница разбиения: по абзацу, строке или пробелу, иначе по лимиту"""
+        for separator in ("\n\n", "\n", " "):
+            cut = body.rfind(separator, limit // 2, limit)
+            if cut > 0:
+                return cut + len(separator)
+        return limit
+
+    async def _show(self, text: str, final: bool):
+        if self.sent is not None and text == self._shown and not final:
+            return
+
+        try:
+            await self._send(text, final)
+        except TelegramRetryAfter as e:
+            if not final:
+                # Промежуточная правка не важна - просто откладываем следующую
+                self._next_edit = time.monotonic() + e.retry_after
+                return
+            await asyncio.sleep(e.retry_after)
+            await self._send(text, final)
+
+        self._shown = text
+        self._next_edit = time.monotonic() + self.interval
+
+    async def _send(self, text: str, final: bool):
+        if final:
+            # Итог - с разметкой бота, а если она не разбирается - как есть
+            try:
+                await self._deliver(text)
+                return
+            except TelegramBadRequest as e:
+                if "not modified" in str(e):
+                    return
+                logger.debug(f"✍️ Разметка ответа не разобрана, отправляем простым текстом: {e}")
+        try:
+            await self._deliver(text, parse_mode=None)
+        except TelegramBadRequest as e:
+            if "not modified" not in str(e):
+                raise
+
+    async def _deliver(self, text: str, **kwargs):
+        if self.sent is None:
+            self.sent = await self.message.reply(text, **kwargs)
+            self.messages += 1
+        else:
+            await self.sent.edit_text(text, **kwargs)
+            self.edits += 1
+
+
+__all__ = ["StreamingReply"]
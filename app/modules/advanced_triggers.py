@@ -15,14 +15,16 @@
 import logging
 import asyncio
 import random
-import re
 import json
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 import aiofiles
 
+from app.modules.trigger_engine import TriggerIndex
+from app.modules.timer_wheel import TimerWheel
+
 logger = logging.getLogger(__name__)
 
 
@@ -59,6 +61,15 @@ class CustomTrigger:
     last_used: Optional[datetime] = None
 
 
+# Типы триггеров -> тип движка (остальные типы по тексту не срабатывают)
+MATCHER_KINDS = {
+    'keyword': 'keyword',
+    'emotion': 'keyword',
+    'time_keyword': 'keyword',
+    'regex': 'regex'
+}
+
+
 class TriggerStats:
     """📊 Статистика триггеров"""
     
@@ -114,9 +125,17 @@ class AdvancedTriggersModule:
         
         # Хранилища
         self.custom_triggers = {}
-        self.trigger_cooldowns = {}
+        self.trigger_cooldowns = TimerWheel()  # Истекшие кулдауны удаляются сами
         self.stats = TriggerStats()
         
+        # Индекс по чатам: сообщение проверяется только триггерами своего чата,
+        # allowed_chats/allowed_users хранятся в нем как frozenset
+        self.index = TriggerIndex()
+        
+        # InvalidationBus при нескольких воркерах: изменения триггеров
+        # объявляются остальным процессам
+        self.invalidation = None
+        
         # Предустановленные триггеры
         self.default_triggers = []
         
@@ -124,113 +143,92 @@ class AdvancedTriggersModule:
     
     async def initialize(self):
         """🚀 Инициализация модуля"""
-        await self._create_triggers_tables()
+        # Таблицы триггеров создает миграция migrations/0003_triggers_schema.py
         await self._load_custom_triggers()
         await self._setup_default_triggers()
         logger.info("⚡ Расширенные триггеры загружены")
     
-    async def _create_triggers_tables(self):
-        """📋 Создание таблиц триггеров"""
-        tables = [
-            """
-            CREATE TABLE IF NOT EXISTS custom_triggers (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                trigger_type TEXT NOT NULL,
-                trigger_pattern TEXT NOT NULL,
-                actions TEXT NOT NULL,  -- JSON
-                probability REAL DEFAULT 1.0,
-                cooldown REAL DEFAULT 0.0,
-                allowed_chats TEXT,  -- JSON
-                allowed_users TEXT,  -- JSON
-                is_active BOOLEAN DEFAULT TRUE,
-                created_by INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                usage_count INTEGER DEFAULT 0,
-                success_rate REAL DEFAULT 0.0,
-                last_used DATETIME
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS trigger_usage_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                trigger_id TEXT NOT NULL,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                message_text TEXT,
-                success BOOLEAN DEFAULT FALSE,
-                response_text TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (trigger_id) REFERENCES custom_triggers (id)
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS trigger_stats_daily (
-                date DATE PRIMARY KEY,
-                total_activations INTEGER DEFAULT 0,
-                successful_activations INTEGER DEFAULT 0,
-                unique_users INTEGER DEFAULT 0,
-                unique_chats INTEGER DEFAULT 0,
-                stats_data TEXT  -- JSON
-            )
-            """
-        ]
-        
-        for table_sql in tables:
-            await self.db.execute(table_sql)
-    
     async def _load_custom_triggers(self):
         """📥 Загрузка пользовательских триггеров"""
         try:
             triggers_data = await self.db.fetch_all("SELECT * FROM custom_triggers WHERE is_active = TRUE")
             
             for trigger_row in triggers_data:
-                # Парсим действия из JSON
-                actions_json = json.loads(trigger_row['actions'])
-                actions = []
-                
-                for action_data in actions_json:
-                    action = TriggerAction(
-                        type=action_data['type'],
-                        content=action_data['content'],
-                        probability=action_data.get('probability', 1.0),
-                        delay=action_data.get('delay', 0.0),
-                        context_filters=action_data.get('context_filters', []),
-                        success_count=action_data.get('success_count', 0),
-                        total_attempts=action_data.get('total_attempts', 0)
-                    )
-                    actions.append(action)
-                
-                # Создаем объект триггера
-                trigger = CustomTrigger(
-                    id=trigger_row['id'],
-                    name=trigger_row['name'],
-                    description=trigger_row['description'] or '',
-                    trigger_type=trigger_row['trigger_type'],
-                    trigger_pattern=trigger_row['trigger_pattern'],
-                    actions=actions,
-                    probability=trigger_row['probability'],
-                    cooldown=trigger_row['cooldown'],
-                    allowed_chats=json.loads(trigger_row['allowed_chats'] or '[]'),
-                    allowed_users=json.loads(trigger_row['allowed_users'] or '[]'),
-                    is_active=trigger_row['is_active'],
-                    created_by=trigger_row['created_by'],
-                    created_at=datetime.fromisoformat(trigger_row['created_at']) if trigger_row['created_at'] else datetime.now(),
-                    usage_count=trigger_row['usage_count'],
-                    success_rate=trigger_row['success_rate'],
-                    last_used=datetime.fromisoformat(trigger_row['last_used']) if trigger_row['last_used'] else None
-                )
-                
+                trigger = self._trigger_from_row(trigger_row)
                 self.custom_triggers[trigger.id] = trigger
+                self._index_trigger(trigger)
             
             logger.info(f"📥 Загружено {len(self.custom_triggers)} пользовательских триггеров")
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки триггеров: {e}")
     
+    @staticmethod
+    def _trigger_from_row(trigger_row: Dict) -> CustomTrigger:
+        """🧱 Триггер из строки custom_triggers"""
+        # Парсим действия из JSON
+        actions_json = json.loads(trigger_row['actions'])
+        actions = []
+        
+        for action_data in actions_json:
+            action = TriggerAction(
+                type=action_data['type'],
+                content=action_data['content'],
+                probability=action_data.get('probability', 1.0),
+                delay=action_data.get('delay', 0.0),
+                context_filters=action_data.get('context_filters', []),
+                success_count=action_data.get('success_count', 0),
+                total_attempts=action_data.get('total_attempts', 0)
+            )
+            actions.append(action)
+        
+        # Создаем объект триггера
+        return CustomTrigger(
+            id=trigger_row['id'],
+            name=trigger_row['name'],
+            description=trigger_row['description'] or '',
+            trigger_type=trigger_row['trigger_type'],
+            trigger_pattern=trigger_row['trigger_pattern'],
+            actions=actions,
+            probability=trigger_row['probability'],
+            cooldown=trigger_row['cooldown'],
+            allowed_chats=json.loads(trigger_row['allowed_chats'] or '[]'),
+            allowed_users=json.loads(trigger_row['allowed_users'] or '[]'),
+            is_active=trigger_row['is_active'],
+            created_by=trigger_row['created_by'],
+            created_at=datetime.fromisoformat(trigger_row['created_at']) if trigger_row['created_at'] else datetime.now(),
+            usage_count=trigger_row['usage_count'],
+            success_rate=trigger_row['success_rate'],
+            last_used=datetime.fromisoformat(trigger_row['last_used']) if trigger_row['last_used'] else None
+        )
+    
+    async def refresh_trigger(self, trigger_id: str):
+        """🔄 Перечитывание триггера из БД (изменен в другом воркере)"""
+        try:
+            row = await self.db.fetch_one(
+                "SELECT * FROM custom_triggers WHERE id = ? AND is_active = TRUE", (trigger_id,)
+            )
+            if row:
+                trigger = self._trigger_from_row(row)
+                self.custom_triggers[trigger.id] = trigger
+                self._index_trigger(trigger)
+            elif self.custom_triggers.pop(trigger_id, None):
+                self.index.remove(trigger_id)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления триггера {trigger_id}: {e}")
+    
+    def _index_trigger(self, trigger: CustomTrigger):
+        """🗂️ Добавление триггера в индекс по чатам и пользователям"""
+        kind = MATCHER_KINDS.get(trigger.trigger_type)
+        if kind:
+            self.index.add(
+                trigger.id, trigger.trigger_pattern, kind,
+                chats=trigger.allowed_chats, users=trigger.allowed_users
+            )
+        else:
+            self.index.remove(trigger.id)
+    
     async def _setup_default_triggers(self):
         """🎯 Настройка триггеров по умолчанию"""
         
@@ -378,6 +376,9 @@ class AdvancedTriggersModule:
             
             # Добавляем в память
             self.custom_triggers[trigger.id] = trigger
+            self._index_trigger(trigger)
+            if self.invalidation:
+                self.invalidation.publish('custom_triggers', trigger.id)
             
             logger.info(f"➕ Создан триггер: {trigger.name} ({trigger.id})")
             return True
@@ -391,18 +392,11 @@ class AdvancedTriggersModule:
         responses = []
         
         try:
-            message_lower = message.lower()
-            
-            # Перебираем все активные триггеры
-            for trigger in self.custom_triggers.values():
-                if not trigger.is_active:
-                    continue
-                
-                # Проверяем права доступа
-                if trigger.allowed_chats and chat_id not in trigger.allowed_chats:
-                    continue
-                
-                if trigger.allowed_users and user_id not in trigger.allowed_users:
+            # Только триггеры, доступные в чате и пользователю, чей шаблон
+            # нашелся в сообщении (в порядке добавления)
+            for trigger_id in self.index.match(message, chat_id, user_id):
+                trigger = self.custom_triggers.get(trigger_id)
+                if trigger is None or not trigger.is_active:
                     continue
                 
                 # Проверяем кулдаун
@@ -410,23 +404,21 @@ class AdvancedTriggersModule:
                 if await self._check_cooldown(cooldown_key, trigger.cooldown):
                     continue
                 
-                # Проверяем соответствие триггеру
-                if await self._matches_trigger(message, message_lower, trigger):
-                    # Проверяем вероятность
-                    if random.random() < trigger.probability:
-                        # Выполняем действия триггера
-                        trigger_responses = await self._execute_trigger_actions(trigger, message, context)
-                        responses.extend(trigger_responses)
-                        
-                        # Обновляем статистику
-                        await self._update_trigger_usage(trigger.id, user_id, chat_id, message, True)
-                        
-                        # Устанавливаем кулдаун
-                        await self._set_cooldown(cooldown_key, trigger.cooldown)
-                        
-                        # Если высокоприоритетный триггер, прекращаем обработку
-                        if trigger.probability > 0.8:
-                            break
+                # Проверяем вероятность
+                if random.random() < trigger.probability:
+                    # Выполняем действия триггера
+                    trigger_responses = await self._execute_trigger_actions(trigger, message, context)
+                    responses.extend(trigger_responses)
+                    
+                    # Обновляем статистику
+                    await self._update_trigger_usage(trigger.id, user_id, chat_id, message, True)
+                    
+                    # Устанавливаем кулдаун
+                    await self._set_cooldown(cooldown_key, trigger.cooldown)
+                    
+                    # Если высокоприоритетный триггер, прекращаем обработку
+                    if trigger.probability > 0.8:
+                        break
             
             return responses
             
@@ -434,55 +426,6 @@ class AdvancedTriggersModule:
             logger.error(f"❌ Ошибка обработки триггеров: {e}")
             return []
     
-    async def _matches_trigger(self, message: str, message_lower: str, trigger: CustomTrigger) -> bool:
-        """🎯 Проверка соответствия триггеру"""
-        
-        pattern = trigger.trigger_pattern.lower()
-        
-        if trigger.trigger_type == 'keyword':
-            # Ключевые слова (через |)
-            keywords = pattern.split('|')
-            return any(keyword.strip() in message_lower for keyword in keywords)
-        
-        elif trigger.trigger_type == 'regex':
-            # Регулярное выражение
-            try:
-                return bool(re.search(pattern, message, re.IGNORECASE))
-            except re.error:
-                logger.error(f"❌ Неверное регулярное выражение в триггере {trigger.id}: {pattern}")
-                return False
-        
-        elif trigger.trigger_type == 'emotion':
-            # Эмоциональные ключевые слова
-            emotion_keywords = pattern.split('|')
-            return any(keyword.strip() in message_lower for keyword in emotion_keywords)
-        
-        elif trigger.trigger_type == 'time_keyword':
-            # Проверка времени + ключевые слова
-            hour = datetime.now().hour
-            keywords = pattern.split('|')
-            
-            # Утро (5-12)
-            if 5 <= hour < 12 and any('утр' in keyword or 'morning' in keyword for keyword in keywords):
-                return any(keyword.strip() in message_lower for keyword in keywords)
-            
-            # День (12-18)
-            if 12 <= hour < 18 and any('день' in keyword or 'day' in keyword for keyword in keywords):
-                return any(keyword.strip() in message_lower for keyword in keywords)
-            
-            # Вечер (18-22)
-            if 18 <= hour < 22 and any('вечер' in keyword or 'evening' in keyword for keyword in keywords):
-                return any(keyword.strip() in message_lower for keyword in keywords)
-            
-            # Ночь (22-5)
-            if hour >= 22 or hour < 5 and any('ноч' in keyword or 'night' in keyword for keyword in keywords):
-                return any(keyword.strip() in message_lower for keyword in keywords)
-            
-            # Обычная проверка ключевых слов
-            return any(keyword.strip() in message_lower for keyword in keywords)
-        
-        return False
-    
     async def _execute_trigger_actions(self, trigger: CustomTrigger, message: str, context: Dict) -> List[str]:
         """🎬 Выполнение действий триггера"""
         responses = []
@@ -510,34 +453,30 @@ class AdvancedTriggersModule:
         if cooldown_seconds <= 0:
             return False
         
-        if cooldown_key in self.trigger_cooldowns:
-            last_used = self.trigger_cooldowns[cooldown_key]
-            if datetime.now() - last_used < timedelta(seconds=cooldown_seconds):
-                return True
-        
-        return False
+        return cooldown_key in self.trigger_cooldowns
     
     async def _set_cooldown(self, cooldown_key: str, cooldown_seconds: float):
         """🕐 Установка кулдауна"""
         if cooldown_seconds > 0:
-            self.trigger_cooldowns[cooldown_key] = datetime.now()
+            self.trigger_cooldowns.set(cooldown_key, cooldown_seconds)
     
     async def _update_trigger_usage(self, trigger_id: str, user_id: int, chat_id: int, message: str, success: bool):
         """📊 Обновление статистики триггера"""
         try:
-            # Обновляем в БД
-            await self.db.execute("""
-                UPDATE custom_triggers 
-                SET usage_count = usage_count + 1, last_used = ?
-                WHERE id = ?
-            """, (datetime.now().isoformat(), trigger_id))
-            
-            # Логируем использование
-            await self.db.execute("""
-                INSERT INTO trigger_usage_log 
-                (trigger_id, user_id, chat_id, message_text, success)
-                VALUES (?, ?, ?, ?, ?)
-            """, (trigger_id, user_id, chat_id, message[:200], success))
+            async with self.db.transaction():
+                # Обновляем в БД
+                await self.db.execute("""
+                    UPDATE custom_triggers 
+                    SET usage_count = usage_count + 1, last_used = ?
+                    WHERE id = ?
+                """, (datetime.now().isoformat(), trigger_id))
+                
+                # Логируем использование
+                await self.db.execute("""
+                    INSERT INTO trigger_usage_log 
+                    (trigger_id, user_id, chat_id, message_text, success)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (trigger_id, user_id, chat_id, message[:200], success))
             
             # Обновляем статистику
             self.stats.record_trigger_use(trigger_id, user_id, chat_id, success)
@@ -582,6 +521,7 @@ class AdvancedTriggersModule:
                 'active_triggers': active_triggers,
                 'total_usage': total_usage,
                 'average_success_rate': avg_success_rate,
+                'index': self.index.get_stats(),
                 'top_triggers': [
                     {
                         'name': trigger.name,
@@ -614,6 +554,9 @@ class AdvancedTriggersModule:
             
             # Удаляем из памяти
             del self.custom_triggers[trigger_id]
+            self.index.remove(trigger_id)
+            if self.invalidation:
+                self.invalidation.publish('custom_triggers', trigger_id)
             
             logger.info(f"🗑️ Удален триггер: {trigger.name} ({trigger_id})")
             return True
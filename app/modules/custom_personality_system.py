@@ -41,9 +41,7 @@ class CustomPersonalityManager:
     async def initialize(self):
         """🚀 Инициализация системы"""
         try:
-            # Создаем таблицы для персонажей
-            await self._create_tables()
-            
+            # Таблицы персонажей создают миграции migrations/0006 и 0007
             # Загружаем активные персонажи в кэш
             await self._load_active_personalities()
             
@@ -53,41 +51,6 @@ class CustomPersonalityManager:
             logger.error(f"❌ Ошибка инициализации персонажей: {e}")
             raise
     
-    async def _create_tables(self):
-        """📋 Создание таблиц для персонажей"""
-        try:
-            # Таблица персонажей - оптимизирована для групп
-            await self.db.execute("""
-                CREATE TABLE IF NOT EXISTS custom_personalities (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    chat_id INTEGER NOT NULL,
-                    admin_id INTEGER NOT NULL,
-                    personality_name TEXT NOT NULL,
-                    personality_description TEXT NOT NULL,
-                    system_prompt TEXT NOT NULL,
-                    is_active BOOLEAN DEFAULT FALSE,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Индексы для быстрого поиска
-            await self.db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_personalities_chat_active 
-                ON custom_personalities(chat_id, is_active)
-            """)
-            
-            await self.db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_personalities_admin 
-                ON custom_personalities(admin_id, chat_id)
-            """)
-            
-            logger.info("📋 Таблицы персонажей созданы (v3.2)")
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка создания таблиц персонажей: {e}")
-            raise
-    
     async def _load_active_personalities(self):
         """💾 Загрузка активных персонажей в кэш"""
         try:
@@ -179,29 +142,31 @@ class CustomPersonalityManager:
             # Генерируем системный промпт
             system_prompt = await self._generate_system_prompt(description)
             
-            # Деактивируем предыдущий персонаж в этом чате
-            await self.db.execute("""
-                UPDATE custom_personalities 
-                SET is_active = FALSE 
-                WHERE chat_id = ?
-            """, (chat_id,))
+            # Создаем имя персонажа из первых слов описания
+            personality_name = self._extract_personality_name(description)
+            
+            # Смена персонажа атомарна: чат не останется без активного персонажа
+            async with self.db.transaction():
+                # Деактивируем предыдущий персонаж в этом чате
+                await self.db.execute("""
+                    UPDATE custom_personalities 
+                    SET is_active = FALSE 
+                    WHERE chat_id = ?
+                """, (chat_id,))
+                
+                # Сохраняем новый персонаж
+                await self.db.execute("""
+                    INSERT INTO custom_personalities 
+                    (chat_id, admin_id, personality_name, personality_description, 
+                     system_prompt, is_active)
+                    VALUES (?, ?, ?, ?, ?, TRUE)
+                """, (chat_id, user_id, personality_name, description, system_prompt))
             
             # Удаляем из кэша
             cache_key = f"chat_{chat_id}"
             if cache_key in self.active_personalities:
                 del self.active_personalities[cache_key]
             
-            # Создаем имя персонажа из первых слов описания
-            personality_name = self._extract_personality_name(description)
-            
-            # Сохраняем новый персонаж
-            await self.db.execute("""
-                INSERT INTO custom_personalities 
-                (chat_id, admin_id, personality_name, personality_description, 
-                 system_prompt, is_active)
-                VALUES (?, ?, ?, ?, ?, TRUE)
-            """, (chat_id, user_id, personality_name, description, system_prompt))
-            
             # Добавляем в кэш
             personality_data = {
                 'name': personality_name,
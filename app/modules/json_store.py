@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+💾 JSON STORE - отложенная атомарная запись JSON-файлов модулей
+
+Модуль помечает документ измененным (mark_dirty), а запись происходит
+не чаще раза в interval секунд: все изменения за это время попадают в
+один снимок. В цикле событий копируются только контейнеры документа
+(словари и списки, без строк и чисел) - сериализация в JSON и запись
+идут в потоке. Файл пишется через временный файл и os.replace, поэтому
+при падении остается либо старая, либо новая версия целиком.
+
+Счетчики срабатываний (add_counter) не переписывают документ, а
+дописываются строками в журнал <файл>.delta. Когда журнал разрастается,
+снимок перезаписывается и журнал обнуляется. Номер поколения в снимке
+отсекает строки журнала, которые уже вошли в снимок.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Tuple, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+
+def _detach(value: Any) -> Any:
+    """📋 Копия словарей и списков документа: модуль может менять их, пока поток пишет"""
+    if isinstance(value, dict):
+        return {key: _detach(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_detach(item) for item in value]
+    return value
+
+
+class JsonStore:
+    """💾 JSON-документ с отложенной записью и журналом счетчиков
+
+    snapshot - функция, возвращающая текущее состояние документа; она
+    вызывается в цикле событий в момент записи.
+    """
+
+    def __init__(self, path, snapshot: Callable[[], Dict[str, Any]],
+                 interval: float = 5.0, compact_bytes: int = 1024 * 1024):
+        self.path = Path(path)
+        self.delta_path = self.path.with_name(self.path.name + '.delta')
+        self.snapshot = snapshot
+        self.interval = interval
+        self.compact_bytes = compact_bytes
+
+        # Строки журнала с поколением меньше, чем в снимке, уже учтены
+        self.generation = 0
+
+        self._dirty = False
+        self._counters: Dict[str, List] = {}  # ключ -> [прирост, поля]
+        self._delta_size = 0
+        self._last_write = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        # Метрики
+        self.snapshots_written = 0
+        self.delta_lines_written = 0
+        self.errors = 0
+
+    # =================== ЧТЕНИЕ ===================
+
+    async def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """📥 Снимок (None - файла нет) и еще не вошедшие в него строки журнала"""
+        return await asyncio.to_thread(self._read)
+
+    def _read(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        data = None
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.generation = int(data.get('delta_generation', 0))
+
+        deltas = []
+        if self.delta_path.exists():
+            self._delta_size = self.delta_path.stat().st_size
+            with open(self.delta_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка после падения
+                        continue
+                    if record.get('g', 0) >= self.generation:
+                        deltas.append(record)
+
+        return data, deltas
+
+    # =================== ИЗМЕНЕНИЯ ===================
+
+    def mark_dirty(self):
+        """✏️ Документ изменился - снимок будет записан при следующем сбросе"""
+        self._dirty = True
+        self._schedule()
+
+    def add_counter(self, key: str, amount: int = 1, **fields):
+        """➕ Прирост счетчика (и последние значения полей) в журнал"""
+        entry = self._counters.get(key)
+        if entry is None:
+            self._counters[key] = [amount, fields]
+        else:
+            entry[0] += amount
+            entry[1].update(fields)
+        self._schedule()
+
+    def _schedule(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            delay = self._last_write + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # close() может отменить ожидание, но не начатую запись
+            await asyncio.shield(self.flush())
+        finally:
+            self._task = None
+
+        # Изменения, пришедшие во время записи
+        if self._dirty or self._counters:
+            self._schedule()
+
+    # =================== ЗАПИСЬ ===================
+
+    async def flush(self) -> bool:
+        """💾 Немедленная запись накопленного: снимок или строки журнала"""
+        async with self._lock:
+            self._last_write = time.monotonic()
+            if self._delta_size >= self.compact_bytes:
+                self._dirty = True
+
+            if self._dirty:
+                return await self._write_snapshot()
+            if self._counters:
+                return await self._write_deltas()
+            return True
+
+    async def _write_snapshot(self) -> bool:
+        # Снимок включает все счетчики в памяти - журнал начинается заново
+        self._dirty = False
+        self._counters = {}
+        self.generation += 1
+
+        data = _detach(self.snapshot())
+        data['delta_generation'] = self.generation
+
+        try:
+            await asyncio.to_thread(self._dump, data)
+            self._delta_size = 0
+            self.snapshots_written += 1
+            logger.debug(f"💾 {self.path.name} сохранен")
+            return True
+        except Exception as e:
+            # Счетчики остались в документе в памяти - войдут в следующий снимок
+            self._dirty = True
+            self.errors += 1
+            logger.error(f"❌ Ошибка сохранения {self.path}: {e}")
+            return False
+
+    async def _write_deltas(self) -> bool:
+        counters, self._counters = self._counters, {}
+        lines = ''.join(
+            json.dumps({'g': self.generation, 'k': key, 'n': amount, **fields}, ensure_ascii=False) + '\n'
+            for key, (amount, fields) in counters.items()
+        )
+
+        try:
+            await asyncio.to_thread(self._append, lines)
+            self._delta_size += len(lines.encode('utf-8'))
+            self.delta_lines_written += len(counters)
+            return True
+        except Exception as e:
+            for key, (amount, fields) in counters.items():
+                self.add_counter(key, amount, **fields)
+            self.errors += 1
+            logger.error(f"❌ Ошибка записи журнала {self.delta_path}: {e}")
+            return False
+
+    def _dump(self, data: Dict[str, Any]):
+        """🧵 Сериализация снимка и атомарная замена файла (в потоке)"""
+        self._replace(json.dumps(data, indent=2, ensure_ascii=False))
+
+    def _replace(self, text: str):
+        """📝 Временный файл + fsync + os.replace, затем обнуление журнала"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        if self.delta_path.exists():
+            self.delta_path.unlink()
+
+    def _append(self, lines: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.delta_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    async def close(self):
+        """🛑 Отмена отложенной записи и финальный сброс"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Состояние хранилища"""
+        return {
+            'file': str(self.path),
+            'dirty': self._dirty,
+            'pending_counters': len(self._counters),
+            'delta_bytes': self._delta_size,
+            'generation': self.generation,
+            'snapshots_written': self.snapshots_written,
+            'delta_lines_written': self.delta_lines_written,
+            'errors': self.errors
+        }
+
+
+__all__ = ["JsonStore"]
@@ -14,6 +14,7 @@
 
 import logging
 import json
+import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
@@ -22,6 +23,24 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Именованные запросы горячих путей (регистрируются в DatabaseService)
+KARMA_QUERIES = {
+    'karma.user': """
+        SELECT user_id, chat_id, karma, level, total_positive, total_negative,
+               message_count, last_activity, created_at
+        FROM user_karma WHERE user_id = ? AND chat_id = ?
+    """,
+    'karma.all_users': """
+        SELECT user_id, chat_id, karma, level, total_positive, total_negative,
+               message_count, last_activity, created_at
+        FROM user_karma
+    """,
+    'karma.achievement_exists': """
+        SELECT 1 FROM karma_achievements
+        WHERE user_id = ? AND chat_id = ? AND achievement_type = ?
+    """,
+}
+
 
 class KarmaActionType(Enum):
     """🎯 Типы действий для кармы"""
@@ -151,76 +170,12 @@ class KarmaManager:
     
     async def initialize(self):
         """🚀 Инициализация системы"""
-        await self._create_karma_tables()
+        # Таблицы кармы создает миграция migrations/0002_karma_schema.py
+        self.db.register_queries(KARMA_QUERIES)
         await self._load_karma_cache()
         await self._load_settings()
         logger.info("⚖️ Система кармы загружена")
     
-    async def _create_karma_tables(self):
-        """📋 Создание таблиц кармы"""
-        tables = [
-            """
-            CREATE TABLE IF NOT EXISTS user_karma (
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                karma INTEGER DEFAULT 0,
-                level INTEGER DEFAULT 0,
-                total_positive INTEGER DEFAULT 0,
-                total_negative INTEGER DEFAULT 0,
-                message_count INTEGER DEFAULT 0,
-                last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, chat_id)
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS karma_actions (
-                id TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                action_type TEXT NOT NULL,
-                karma_change INTEGER NOT NULL,
-                reason TEXT,
-                moderator_id INTEGER,
-                message_id INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS karma_settings (
-                chat_id INTEGER PRIMARY KEY,
-                settings_json TEXT NOT NULL,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS karma_achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                achievement_type TEXT NOT NULL,
-                achieved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                karma_bonus INTEGER DEFAULT 0
-            )
-            """
-        ]
-        
-        for table_sql in tables:
-            await self.db.execute(table_sql)
-        
-        # Индексы
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_karma_user_chat ON user_karma (user_id, chat_id)",
-            "CREATE INDEX IF NOT EXISTS idx_karma_actions_user ON karma_actions (user_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_karma_actions_chat ON karma_actions (chat_id, timestamp)"
-        ]
-        
-        for index_sql in indexes:
-            await self.db.execute(index_sql)
-    
     async def add_karma(self, user_id: int, chat_id: int, action_type: KarmaActionType, 
                        reason: str = "", moderator_id: Optional[int] = None, 
                        message_id: Optional[int] = None, custom_value: Optional[int] = None) -> Tuple[bool, int, int]:
@@ -236,40 +191,55 @@ class KarmaManager:
             if not await self._check_karma_limits(user_id, chat_id, karma_change, action_type):
                 return False, 0, 0
             
-            # Получаем текущую карму
-            current_karma = await self.get_user_karma(user_id, chat_id)
-            new_karma = max(self.settings.min_karma, min(self.settings.max_karma, current_karma.karma + karma_change))
-            actual_change = new_karma - current_karma.karma
-            
-            # Обновляем карму
-            await self.db.execute("""
-                INSERT OR REPLACE INTO user_karma 
-                (user_id, chat_id, karma, level, total_positive, total_negative, message_count, last_activity)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                user_id, chat_id, new_karma,
-                self._get_level_by_karma(new_karma),
-                current_karma.total_positive + max(0, actual_change),
-                current_karma.total_negative + abs(min(0, actual_change)),
-                current_karma.message_count + (1 if action_type == KarmaActionType.MESSAGE else 0),
-                datetime.now().isoformat()
-            ))
+            message_increment = 1 if action_type == KarmaActionType.MESSAGE else 0
+            now = datetime.now().isoformat()
             
-            # Записываем действие
-            action_id = f"karma_{user_id}_{chat_id}_{int(datetime.now().timestamp())}"
-            await self.db.execute("""
-                INSERT INTO karma_actions 
-                (id, user_id, chat_id, action_type, karma_change, reason, moderator_id, message_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (action_id, user_id, chat_id, action_type.value, actual_change, reason, moderator_id, message_id))
-            
-            # Обновляем кэш
-            if (user_id, chat_id) in self.user_karma_cache:
-                self.user_karma_cache[(user_id, chat_id)].karma = new_karma
-                self.user_karma_cache[(user_id, chat_id)].level = self._get_level_by_karma(new_karma)
+            # Чтение, расчет и запись - одна транзакция: параллельные изменения
+            # кармы того же пользователя ждут ее конца и видят результат
+            async with self.db.transaction():
+                await self.db.execute("""
+                    INSERT OR IGNORE INTO user_karma (user_id, chat_id, karma, level)
+                    VALUES (?, ?, 0, 0)
+                """, (user_id, chat_id))
+                
+                # Блокируем строку до конца транзакции (для PostgreSQL; в SQLite
+                # транзакция и так держит блокировку писателя)
+                await self.db.execute(
+                    "UPDATE user_karma SET last_activity = ? WHERE user_id = ? AND chat_id = ?",
+                    (now, user_id, chat_id)
+                )
+                row = await self.db.fetch_one('karma.user', (user_id, chat_id), row_shape='tuple')
+                current_karma, total_positive, total_negative, message_count = row[2], row[4], row[5], row[6]
+                
+                new_karma = max(self.settings.min_karma, min(self.settings.max_karma, current_karma + karma_change))
+                actual_change = new_karma - current_karma
+                
+                await self.db.execute("""
+                    UPDATE user_karma SET
+                        karma = ?, level = ?, total_positive = ?, total_negative = ?, message_count = ?
+                    WHERE user_id = ? AND chat_id = ?
+                """, (
+                    new_karma,
+                    self._get_level_by_karma(new_karma),
+                    total_positive + max(0, actual_change),
+                    total_negative + abs(min(0, actual_change)),
+                    message_count + message_increment,
+                    user_id, chat_id
+                ))
+                
+                # Записываем действие
+                action_id = f"karma_{uuid.uuid4().hex}"
+                await self.db.execute("""
+                    INSERT INTO karma_actions 
+                    (id, user_id, chat_id, action_type, karma_change, reason, moderator_id, message_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (action_id, user_id, chat_id, action_type.value, actual_change, reason, moderator_id, message_id))
+                
+                # Достижения и бонусная карма - в той же транзакции
+                await self._check_achievements(user_id, chat_id, new_karma, action_type)
             
-            # Проверяем достижения
-            await self._check_achievements(user_id, chat_id, new_karma, action_type)
+            # Кэш перечитается из БД при следующем обращении
+            self.user_karma_cache.pop((user_id, chat_id), None)
             
             logger.info(f"⚖️ Карма изменена: пользователь {user_id}, чат {chat_id}, {actual_change:+d} ({action_type.value})")
             return True, actual_change, new_karma
@@ -286,22 +256,10 @@ class KarmaManager:
             return self.user_karma_cache[cache_key]
         
         try:
-            karma_data = await self.db.fetch_one("""
-                SELECT * FROM user_karma WHERE user_id = ? AND chat_id = ?
-            """, (user_id, chat_id))
+            karma_row = await self.db.fetch_one('karma.user', (user_id, chat_id), row_shape='tuple')
             
-            if karma_data:
-                user_karma = UserKarma(
-                    user_id=karma_data['user_id'],
-                    chat_id=karma_data['chat_id'],
-                    karma=karma_data['karma'],
-                    level=karma_data['level'],
-                    total_positive=karma_data['total_positive'],
-                    total_negative=karma_data['total_negative'],
-                    message_count=karma_data['message_count'],
-                    last_activity=datetime.fromisoformat(karma_data['last_activity']),
-                    created_at=datetime.fromisoformat(karma_data['created_at'])
-                )
+            if karma_row:
+                user_karma = self._karma_from_row(karma_row)
             else:
                 # Создаем новую запись
                 user_karma = UserKarma(
@@ -317,7 +275,7 @@ class KarmaManager:
                 )
                 
                 await self.db.execute("""
-                    INSERT INTO user_karma (user_id, chat_id, karma, level)
+                    INSERT OR IGNORE INTO user_karma (user_id, chat_id, karma, level)
                     VALUES (?, ?, ?, ?)
                 """, (user_id, chat_id, 0, 0))
             
@@ -386,6 +344,21 @@ class KarmaManager:
             logger.error(f"❌ Ошибка получения истории: {e}")
             return []
     
+    @staticmethod
+    def _karma_from_row(row: tuple) -> UserKarma:
+        """🔧 UserKarma из строки запроса karma.user / karma.all_users"""
+        return UserKarma(
+            user_id=row[0],
+            chat_id=row[1],
+            karma=row[2],
+            level=row[3],
+            total_positive=row[4],
+            total_negative=row[5],
+            message_count=row[6],
+            last_activity=datetime.fromisoformat(row[7]),
+            created_at=datetime.fromisoformat(row[8])
+        )
+    
     def _get_level_by_karma(self, karma: int) -> int:
         """📊 Определение уровня по карме"""
         for i, level in enumerate(reversed(self.settings.levels)):
@@ -441,10 +414,9 @@ class KarmaManager:
         for milestone in milestones:
             if new_karma >= milestone:
                 # Проверяем, не получал ли уже
-                existing = await self.db.fetch_one("""
-                    SELECT id FROM karma_achievements 
-                    WHERE user_id = ? AND chat_id = ? AND achievement_type = ?
-                """, (user_id, chat_id, f"karma_{milestone}"))
+                existing = await self.db.fetch_one(
+                    'karma.achievement_exists', (user_id, chat_id, f"karma_{milestone}"), row_shape='tuple'
+                )
                 
                 if not existing:
                     # Выдаем достижение
@@ -461,24 +433,15 @@ class KarmaManager:
     async def _load_karma_cache(self):
         """📥 Загрузка кэша кармы"""
         try:
-            karma_data = await self.db.fetch_all("SELECT * FROM user_karma")
+            loaded = 0
             
-            for row in karma_data:
-                user_karma = UserKarma(
-                    user_id=row['user_id'],
-                    chat_id=row['chat_id'],
-                    karma=row['karma'],
-                    level=row['level'],
-                    total_positive=row['total_positive'],
-                    total_negative=row['total_negative'],
-                    message_count=row['message_count'],
-                    last_activity=datetime.fromisoformat(row['last_activity']),
-                    created_at=datetime.fromisoformat(row['created_at'])
-                )
-                
-                self.user_karma_cache[(row['user_id'], row['chat_id'])] = user_karma
+            # Потоковое чтение: таблица не материализуется целиком
+            async for row in self.db.iterate('karma.all_users', row_shape='tuple'):
+                user_karma = self._karma_from_row(row)
+                self.user_karma_cache[(user_karma.user_id, user_karma.chat_id)] = user_karma
+                loaded += 1
             
-            logger.info(f"📥 Загружено {len(karma_data)} записей кармы")
+            logger.info(f"📥 Загружено {loaded} записей кармы")
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки кэша кармы: {e}")
@@ -21,6 +21,7 @@ import random
 import re
 import json
 import os
+import time
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
@@ -28,6 +29,9 @@ from collections import defaultdict
 import aiofiles
 import aiohttp
 
+from app.modules.trigger_engine import TriggerMatcher
+from app.modules.timer_wheel import TimerWheel
+
 logger = logging.getLogger(__name__)
 
 
@@ -266,9 +270,197 @@ class AudioManager:
             return None
 
 
+@dataclass
+class MediaTrigger:
+    """🎯 Медиа-триггер в памяти"""
+    id: str
+    name: str
+    trigger_type: str  # emotion, keyword, context, sticker
+    trigger_pattern: str
+    media_type: str
+    media_content: str
+    probability: float = 1.0
+    cooldown: float = 0.0
+    usage_count: int = 0
+    rank: int = 0  # Порядок загрузки - при равной вероятности
+
+
+class MediaTriggerRegistry:
+    """🗂️ Активные медиа-триггеры, разложенные по способу срабатывания
+
+    Ключевые слова и регулярки - в одном TriggerMatcher, эмоции, темы и
+    эмодзи стикеров - в словарях. Кандидаты отдаются по убыванию
+    вероятности, как раньше отдавал ORDER BY probability DESC.
+
+    Счетчики срабатываний и кулдауны копятся в памяти; take_pending()
+    забирает накопленное для записи в БД пачкой.
+    """
+
+    def __init__(self):
+        self.triggers: Dict[str, MediaTrigger] = {}
+        self.text_matcher = TriggerMatcher()
+        self.by_emotion: Dict[str, List[MediaTrigger]] = defaultdict(list)
+        self.by_context: Dict[str, List[MediaTrigger]] = defaultdict(list)
+        self.by_sticker_emoji: Dict[str, List[MediaTrigger]] = defaultdict(list)
+        self._next_rank = 0
+
+        # (trigger_id, chat_id) на время кулдауна; по unix time - сроки пишутся в БД
+        self.cooldowns = TimerWheel(clock=time.time)
+
+        # Еще не записанное в БД
+        self._pending_usage: Dict[str, int] = defaultdict(int)
+        self._pending_last_used: Dict[str, str] = {}
+        self._pending_cooldowns: Dict[Tuple[str, int], float] = {}
+
+    def __len__(self) -> int:
+        return len(self.triggers)
+
+    @staticmethod
+    def _emoji_keys(pattern: str) -> set:
+        """😀 Ключи эмодзи: варианты через '|', пробел или запятую и отдельные символы"""
+        keys = set()
+        for token in re.split(r'[|,\s]+', pattern):
+            token = token.replace('\ufe0f', '')
+            if not token:
+                continue
+            keys.add(token)
+            # '😊🎉' без разделителей - каждый эмодзи отдельно (составные через ZWJ не режем)
+            if len(token) > 1 and '\u200d' not in token:
+                keys.update(token)
+        return keys
+
+    def add(self, trigger: MediaTrigger) -> bool:
+        """➕ Добавление (или замена) триггера"""
+        old = self.triggers.get(trigger.id)
+        trigger.rank = old.rank if old else self._next_rank
+        if not old:
+            self._next_rank += 1
+        self.remove(trigger.id)
+
+        if trigger.trigger_type == 'keyword':
+            kind = 'keyword' if '|' in trigger.trigger_pattern else 'regex'
+            if not self.text_matcher.add(trigger.id, trigger.trigger_pattern, kind):
+                return False
+        elif trigger.trigger_type == 'emotion':
+            self.by_emotion[trigger.trigger_pattern].append(trigger)
+        elif trigger.trigger_type == 'context':
+            self.by_context[trigger.trigger_pattern].append(trigger)
+        elif trigger.trigger_type == 'sticker':
+            for key in self._emoji_keys(trigger.trigger_pattern):
+                self.by_sticker_emoji[key].append(trigger)
+        else:
+            logger.warning(f"⚠️ Неизвестный тип медиа триггера {trigger.id}: {trigger.trigger_type}")
+            return False
+
+        self.triggers[trigger.id] = trigger
+        return True
+
+    def remove(self, trigger_id: str) -> bool:
+        """➖ Удаление триггера из всех карт"""
+        trigger = self.triggers.pop(trigger_id, None)
+        if not trigger:
+            return False
+
+        self.text_matcher.remove(trigger_id)
+        for mapping in (self.by_emotion, self.by_context, self.by_sticker_emoji):
+            for key in [key for key, items in mapping.items() if trigger in items]:
+                mapping[key].remove(trigger)
+                if not mapping[key]:
+                    del mapping[key]
+        return True
+
+    def clear(self):
+        """🧹 Удаление всех триггеров (накопленная статистика остается)"""
+        self.triggers.clear()
+        self.text_matcher.clear()
+        self.by_emotion.clear()
+        self.by_context.clear()
+        self.by_sticker_emoji.clear()
+
+    @staticmethod
+    def _by_priority(candidates) -> List[MediaTrigger]:
+        unique = {trigger.id: trigger for trigger in candidates}
+        return sorted(unique.values(), key=lambda t: (-t.probability, t.rank))
+
+    def for_text(self, message: str, emotion: str, topic: str) -> List[MediaTrigger]:
+        """📝 Кандидаты для текстового сообщения"""
+        candidates = [self.triggers[key] for key in self.text_matcher.match(message)]
+        candidates += self.by_emotion.get(emotion, ())
+        candidates += self.by_context.get(topic, ())
+        return self._by_priority(candidates)
+
+    def for_sticker(self, emotion: Optional[str], sticker_emoji: str) -> List[MediaTrigger]:
+        """🎭 Кандидаты для стикера (emotion=None - эмоция не распознана уверенно)"""
+        candidates = list(self.by_sticker_emoji.get(sticker_emoji.replace('\ufe0f', ''), ()))
+        if emotion is not None:
+            candidates += self.by_emotion.get(emotion, ())
+        return self._by_priority(candidates)
+
+    # =================== СТАТИСТИКА И КУЛДАУНЫ ===================
+
+    def is_ready(self, trigger: MediaTrigger, chat_id: Optional[int]) -> bool:
+        """⏰ Кулдаун триггера в чате истек"""
+        return (trigger.id, chat_id) not in self.cooldowns
+
+    def record_use(self, trigger: MediaTrigger, chat_id: Optional[int] = None, now: float = None):
+        """📊 Срабатывание: счетчик и кулдаун (в БД - при следующем сбросе)"""
+        now = now or time.time()
+        trigger.usage_count += 1
+        self._pending_usage[trigger.id] += 1
+        self._pending_last_used[trigger.id] = datetime.fromtimestamp(now).isoformat()
+
+        if chat_id is not None and trigger.cooldown > 0:
+            self.cooldowns.set((trigger.id, chat_id), trigger.cooldown)
+            self._pending_cooldowns[(trigger.id, chat_id)] = now + trigger.cooldown
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_usage) + len(self._pending_cooldowns)
+
+    def take_pending(self) -> Tuple[List[tuple], List[tuple]]:
+        """📤 Накопленные изменения: (usage_count, last_used, id) и (trigger_id, chat_id, expires_at)"""
+        usage = [
+            (count, self._pending_last_used.get(trigger_id), trigger_id)
+            for trigger_id, count in self._pending_usage.items()
+        ]
+        cooldowns = [
+            (trigger_id, chat_id, expires_at)
+            for (trigger_id, chat_id), expires_at in self._pending_cooldowns.items()
+        ]
+        self._pending_usage = defaultdict(int)
+        self._pending_last_used = {}
+        self._pending_cooldowns = {}
+        return usage, cooldowns
+
+    def restore_pending(self, usage: List[tuple], cooldowns: List[tuple]):
+        """↩️ Возврат несохраненных изменений (запись в БД не удалась)"""
+        for count, last_used, trigger_id in usage:
+            self._pending_usage[trigger_id] += count
+            if last_used and trigger_id not in self._pending_last_used:
+                self._pending_last_used[trigger_id] = last_used
+        for trigger_id, chat_id, expires_at in cooldowns:
+            self._pending_cooldowns.setdefault((trigger_id, chat_id), expires_at)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Размер реестра"""
+        return {
+            'triggers': len(self.triggers),
+            'keyword_triggers': len(self.text_matcher),
+            'emotions': len(self.by_emotion),
+            'contexts': len(self.by_context),
+            'sticker_emojis': len(self.by_sticker_emoji),
+            'active_cooldowns': len(self.cooldowns),
+            'pending_writes': self.pending
+        }
+
+
 class MediaTriggersModule:
     """🎭 Модуль мультимедийных триггеров"""
     
+    # Сброс счетчиков и кулдаунов в БД: по таймеру или при накоплении
+    FLUSH_INTERVAL = 30.0
+    FLUSH_THRESHOLD = 100
+    
     def __init__(self, db_service, config, bot):
         self.db = db_service
         self.config = config
@@ -285,68 +477,111 @@ class MediaTriggersModule:
             'audio': {}
         }
         
+        # Активные триггеры в памяти - без SELECT на каждое сообщение
+        self.registry = MediaTriggerRegistry()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        
+        # InvalidationBus при нескольких воркерах
+        self.invalidation = None
+        
         logger.info("🎭 Модуль мультимедийных триггеров инициализирован")
     
     async def initialize(self):
         """🚀 Инициализация модуля"""
-        await self._create_media_tables()
+        # Таблицы медиа создает миграция migrations/0004_media_schema.py
         await self._load_media_collections()
         await self._setup_default_media_triggers()
-        logger.info("🎭 Мультимедийные триггеры загружены")
-    
-    async def _create_media_tables(self):
-        """📋 Создание таблиц для медиа"""
-        tables = [
-            """
-            CREATE TABLE IF NOT EXISTS media_content (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,  -- sticker, gif, emoji, audio, voice
-                content TEXT NOT NULL,  -- file_id или путь
-                description TEXT,
-                tags TEXT,  -- JSON
-                emotion TEXT DEFAULT 'neutral',
-                context TEXT DEFAULT 'general',
-                usage_count INTEGER DEFAULT 0,
-                success_rate REAL DEFAULT 0.0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS media_triggers (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                trigger_type TEXT NOT NULL,  -- emotion, keyword, context, time
-                trigger_pattern TEXT NOT NULL,
-                media_type TEXT NOT NULL,
-                media_content TEXT NOT NULL,
-                probability REAL DEFAULT 1.0,
-                cooldown REAL DEFAULT 0.0,
-                allowed_chats TEXT,  -- JSON
-                allowed_users TEXT,  -- JSON
-                is_active BOOLEAN DEFAULT TRUE,
-                usage_count INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            """
-            CREATE TABLE IF NOT EXISTS sticker_responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                input_sticker_id TEXT,
-                input_emotion TEXT,
-                response_type TEXT,  -- sticker, gif, emoji
-                response_content TEXT,
-                confidence REAL DEFAULT 0.8,
-                usage_count INTEGER DEFAULT 0,
-                success_rate REAL DEFAULT 0.0
-            )
-            """
-        ]
+        await self.reload_triggers()
+        await self._load_cooldowns()
         
-        for table_sql in tables:
-            await self.db.execute(table_sql)
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"🎭 Мультимедийные триггеры загружены: {len(self.registry)}")
+    
+    async def close(self):
+        """🛑 Остановка сброса и запись накопленной статистики"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_stats()
+    
+    async def reload_triggers(self):
+        """🔄 Загрузка активных триггеров из БД в реестр"""
+        try:
+            rows = await self.db.fetch_all("SELECT * FROM media_triggers WHERE is_active = TRUE")
+            
+            self.registry.clear()
+            for row in sorted(rows, key=lambda r: -(r['probability'] or 0.0)):
+                self.registry.add(self._trigger_from_row(row))
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки медиа триггеров: {e}")
+    
+    @staticmethod
+    def _trigger_from_row(row: Dict) -> MediaTrigger:
+        return MediaTrigger(
+            id=row['id'],
+            name=row['name'],
+            trigger_type=row['trigger_type'],
+            trigger_pattern=row['trigger_pattern'],
+            media_type=row['media_type'],
+            media_content=row['media_content'],
+            probability=row['probability'] if row['probability'] is not None else 1.0,
+            cooldown=row['cooldown'] or 0.0,
+            usage_count=row['usage_count'] or 0
+        )
+    
+    async def _load_cooldowns(self):
+        """⏰ Незакончившиеся кулдауны с прошлого запуска"""
+        try:
+            now = time.time()
+            await self.db.execute("DELETE FROM media_trigger_cooldowns WHERE expires_at <= ?", (now,))
+            rows = await self.db.fetch_all("SELECT trigger_id, chat_id, expires_at FROM media_trigger_cooldowns")
+            
+            for row in rows:
+                self.registry.cooldowns.set((row['trigger_id'], row['chat_id']), row['expires_at'] - now)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки кулдаунов: {e}")
+    
+    async def _flush_loop(self):
+        """🔁 Периодический сброс статистики в БД"""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush_stats()
+    
+    async def flush_stats(self) -> int:
+        """💾 Запись накопленных счетчиков и кулдаунов одной транзакцией"""
+        async with self._flush_lock:
+            usage, cooldowns = self.registry.take_pending()
+            if not usage and not cooldowns:
+                return 0
+            
+            try:
+                async with self.db.transaction():
+                    if usage:
+                        await self.db.execute_many("""
+                            UPDATE media_triggers
+                            SET usage_count = usage_count + ?, last_used = ?
+                            WHERE id = ?
+                        """, usage)
+                    if cooldowns:
+                        await self.db.execute_many("""
+                            INSERT OR REPLACE INTO media_trigger_cooldowns
+                            (trigger_id, chat_id, expires_at)
+                            VALUES (?, ?, ?)
+                        """, cooldowns)
+                return len(usage) + len(cooldowns)
+                
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения статистики медиа триггеров: {e}")
+                self.registry.restore_pending(usage, cooldowns)
+                return 0
     
     async def _load_media_collections(self):
         """📥 Загрузка медиа коллекций"""
@@ -373,6 +608,10 @@ class MediaTriggersModule:
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки медиа: {e}")
     
+    async def refresh_media(self, media_type: str = None):
+        """🔄 Перечитывание медиа коллекций (добавлено в другом воркере)"""
+        await self._load_media_collections()
+    
     async def _setup_default_media_triggers(self):
         """🎯 Настройка триггеров по умолчанию"""
         
@@ -434,14 +673,12 @@ class MediaTriggersModule:
             }
         ]
         
+        # Один запрос на все существующие триггеры
+        rows = await self.db.fetch_all("SELECT id FROM media_triggers")
+        existing = {row['id'] for row in rows}
+        
         for trigger_data in default_triggers:
-            # Проверяем, есть ли уже такой триггер
-            existing = await self.db.fetch_one(
-                "SELECT id FROM media_triggers WHERE id = ?",
-                (trigger_data['id'],)
-            )
-            
-            if not existing:
+            if trigger_data['id'] not in existing:
                 await self._save_media_trigger(trigger_data)
     
     async def _save_media_trigger(self, trigger_data: Dict):
@@ -465,6 +702,17 @@ class MediaTriggersModule:
                 True
             ))
             
+            self.registry.add(MediaTrigger(
+                id=trigger_data['id'],
+                name=trigger_data['name'],
+                trigger_type=trigger_data['trigger_type'],
+                trigger_pattern=trigger_data['trigger_pattern'],
+                media_type=trigger_data['media_type'],
+                media_content=trigger_data['media_content'],
+                probability=trigger_data.get('probability', 1.0),
+                cooldown=trigger_data.get('cooldown', 0.0)
+            ))
+            
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения медиа триггера: {e}")
     
@@ -479,27 +727,15 @@ class MediaTriggersModule:
             
             logger.info(f"🎭 Стикер проанализирован: эмоция={emotion}, уверенность={confidence}")
             
-            # Ищем подходящие медиа триггеры
-            media_triggers = await self.db.fetch_all("""
-                SELECT * FROM media_triggers 
-                WHERE is_active = TRUE AND (trigger_type = 'emotion' OR trigger_type = 'sticker')
-                ORDER BY probability DESC
-            """)
+            # Подходящие триггеры из реестра: по эмоции (если уверены) и по эмодзи
+            candidates = self.registry.for_sticker(emotion if confidence >= 0.5 else None, sticker_emoji)
             
-            for trigger in media_triggers:
-                should_respond = False
-                
-                if trigger['trigger_type'] == 'emotion':
-                    should_respond = (emotion == trigger['trigger_pattern'] and 
-                                    confidence >= 0.5)
-                elif trigger['trigger_type'] == 'sticker':
-                    should_respond = sticker_emoji in trigger['trigger_pattern']
-                
-                if should_respond and random.random() < trigger['probability']:
+            for trigger in candidates:
+                if random.random() < trigger.probability:
                     # Генерируем медиа ответ
                     media_response = await self._generate_media_response(
-                        trigger['media_type'], 
-                        trigger['media_content'],
+                        trigger.media_type, 
+                        trigger.media_content,
                         emotion,
                         context
                     )
@@ -508,10 +744,10 @@ class MediaTriggersModule:
                         responses.append(media_response)
                         
                         # Обновляем статистику
-                        await self._update_trigger_stats(trigger['id'])
+                        await self._update_trigger_stats(trigger.id)
                         
                         # Если сработал высокоприоритетный триггер, прерываем
-                        if trigger['probability'] > 0.7:
+                        if trigger.probability > 0.7:
                             break
             
             # Если нет специальных триггеров, используем базовую логику
@@ -534,50 +770,24 @@ class MediaTriggersModule:
         responses = []
         
         try:
-            # Получаем активные медиа триггеры
-            media_triggers = await self.db.fetch_all("""
-                SELECT * FROM media_triggers 
-                WHERE is_active = TRUE 
-                ORDER BY probability DESC
-            """)
-            
-            message_lower = message.lower()
+            # Ключевые слова, эмоция и тема - один проход по реестру
+            chat_id = context.get('chat_id')
+            candidates = self.registry.for_text(message, emotion, context.get('topic', 'general'))
             
-            for trigger in media_triggers:
-                should_respond = False
-                
-                if trigger['trigger_type'] == 'keyword':
-                    # Проверяем ключевые слова
-                    pattern = trigger['trigger_pattern']
-                    if '|' in pattern:
-                        keywords = pattern.split('|')
-                        should_respond = any(keyword in message_lower for keyword in keywords)
-                    else:
-                        should_respond = re.search(pattern, message_lower) is not None
-                
-                elif trigger['trigger_type'] == 'emotion':
-                    should_respond = emotion == trigger['trigger_pattern']
-                
-                elif trigger['trigger_type'] == 'context':
-                    context_value = context.get('topic', 'general')
-                    should_respond = context_value == trigger['trigger_pattern']
-                
-                if should_respond and random.random() < trigger['probability']:
+            for trigger in candidates:
+                if random.random() < trigger.probability:
                     # Проверяем кулдаун
-                    if await self._check_trigger_cooldown(trigger['id'], context.get('chat_id')):
+                    if await self._check_trigger_cooldown(trigger.id, chat_id):
                         media_response = await self._generate_media_response(
-                            trigger['media_type'],
-                            trigger['media_content'],
+                            trigger.media_type,
+                            trigger.media_content,
                             emotion,
                             context
                         )
                         
                         if media_response:
                             responses.append(media_response)
-                            await self._update_trigger_stats(trigger['id'])
-                            
-                            # Устанавливаем кулдаун
-                            await self._set_trigger_cooldown(trigger['id'], context.get('chat_id'), trigger['cooldown'])
+                            await self._update_trigger_stats(trigger.id, chat_id)
                             
                             break  # Один медиа ответ за раз
             
@@ -663,45 +873,19 @@ class MediaTriggersModule:
             return None
     
     async def _check_trigger_cooldown(self, trigger_id: str, chat_id: int) -> bool:
-        """⏰ Проверка кулдауна триггера"""
-        try:
-            cooldown_key = f"{trigger_id}_{chat_id}"
-            
-            # Проверяем последнее использование из БД или кеша
-            last_used = await self.db.fetch_one("""
-                SELECT MAX(created_at) as last_used FROM media_triggers 
-                WHERE id = ?
-            """, (trigger_id,))
-            
-            if last_used and last_used['last_used']:
-                last_time = datetime.fromisoformat(last_used['last_used'])
-                cooldown_seconds = 300  # По умолчанию 5 минут
-                
-                if (datetime.now() - last_time).total_seconds() < cooldown_seconds:
-                    return False
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка проверки кулдауна: {e}")
-            return True
-    
-    async def _set_trigger_cooldown(self, trigger_id: str, chat_id: int, cooldown: float):
-        """🕐 Установка кулдауна триггера"""
-        # Здесь можно реализовать более сложную логику кулдаунов
-        pass
+        """⏰ Проверка кулдауна триггера в чате (в памяти)"""
+        trigger = self.registry.triggers.get(trigger_id)
+        return trigger is None or self.registry.is_ready(trigger, chat_id)
     
-    async def _update_trigger_stats(self, trigger_id: str):
-        """📊 Обновление статистики триггера"""
-        try:
-            await self.db.execute("""
-                UPDATE media_triggers 
-                SET usage_count = usage_count + 1
-                WHERE id = ?
-            """, (trigger_id,))
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка обновления статистики: {e}")
+    async def _update_trigger_stats(self, trigger_id: str, chat_id: int = None):
+        """📊 Учет срабатывания и кулдауна; в БД попадет при следующем сбросе"""
+        trigger = self.registry.triggers.get(trigger_id)
+        if not trigger:
+            return
+        
+        self.registry.record_use(trigger, chat_id)
+        if self.registry.pending >= self.FLUSH_THRESHOLD:
+            await self.flush_stats()
     
     async def add_custom_media(self, media_type: str, content: str, tags: List[str], 
                               emotion: str = "neutral", context: str = "general") -> bool:
@@ -726,6 +910,8 @@ class MediaTriggersModule:
                 self.media_collections[media_type] = {}
             
             self.media_collections[media_type][content] = media_content
+            if self.invalidation:
+                self.invalidation.publish('media_content', media_type)
             
             logger.info(f"➕ Добавлен медиа контент: {media_type} - {emotion}")
             return True
@@ -737,6 +923,9 @@ class MediaTriggersModule:
     async def get_media_stats(self) -> Dict[str, Any]:
         """📊 Статистика медиа"""
         try:
+            # Накопленные срабатывания должны попасть в SUM(usage_count)
+            await self.flush_stats()
+            
             # Статистика по типам медиа
             media_stats = await self.db.fetch_all("""
                 SELECT type, COUNT(*) as count, AVG(success_rate) as avg_success
@@ -756,7 +945,8 @@ class MediaTriggersModule:
                 'media_content': [dict(row) for row in media_stats],
                 'triggers': [dict(row) for row in trigger_stats],
                 'total_media': sum(row['count'] for row in media_stats),
-                'total_triggers': len(trigger_stats)
+                'total_triggers': len(trigger_stats),
+                'registry': self.registry.get_stats()
             }
             
         except Exception as e:
@@ -797,5 +987,7 @@ __all__ = [
     "GifManager",
     "AudioManager",
     "MediaContent",
-    "MediaTriggerAction"
+    "MediaTriggerAction",
+    "MediaTrigger",
+    "MediaTriggerRegistry"
 ]
\ No newline at end of file
@@ -6,9 +6,10 @@
 
 import logging
 from typing import Dict, Any, List
-from datetime import datetime, timedelta
 import re
 
+from app.modules.timer_wheel import RateWindow
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,7 +34,9 @@ class ModerationModule:
         
         # Счетчики для пользователей
         self.user_warnings = {}
-        self.flood_protection = {}
+        
+        # Сообщения пользователя за последнюю минуту (кольцевой буфер)
+        self.flood_protection = RateWindow(window=60, limit=config.moderation.flood_threshold)
         
         logger.info("🛡️ Moderation Module инициализирован")
     
@@ -103,23 +106,7 @@ class ModerationModule:
         """🌊 Проверка флуда"""
         
         try:
-            current_time = datetime.now()
-            
-            if user_id not in self.flood_protection:
-                self.flood_protection[user_id] = []
-            
-            # Добавляем текущее время
-            self.flood_protection[user_id].append(current_time)
-            
-            # Оставляем только последние сообщения за минуту
-            minute_ago = current_time - timedelta(minutes=1)
-            self.flood_protection[user_id] = [
-                t for t in self.flood_protection[user_id] 
-                if t > minute_ago
-            ]
-            
-            # Проверяем количество сообщений
-            return len(self.flood_protection[user_id]) > self.config.moderation.flood_threshold
+            return self.flood_protection.exceeded(user_id)
             
         except Exception as e:
             logger.error(f"❌ Ошибка проверки флуда: {e}")
@@ -7,12 +7,13 @@
 """
 
 import logging
-import json
 import asyncio  # ДОБАВЛЕН ИМПОРТ
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Set
 from pathlib import Path
 
+from app.modules.json_store import JsonStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -24,6 +25,7 @@ class PermissionsModule:
         
         # Файл с настройками доступа
         self.permissions_file = Path('data/permissions.json')
+        self.store = JsonStore(self.permissions_file, self._snapshot)
         
         # Разрешенные чаты (whitelist)
         self.allowed_chats: Set[int] = set()
@@ -64,27 +66,26 @@ class PermissionsModule:
         """📥 Загрузка настроек разрешений"""
         
         try:
-            if self.permissions_file.exists():
-                with open(self.permissions_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # Загружаем списки доступа
-                    self.allowed_chats = set(data.get('allowed_chats', []))
-                    self.blocked_chats = set(data.get('blocked_chats', []))
-                    self.allowed_users = set(data.get('allowed_users', []))
-                    self.blocked_users = set(data.get('blocked_users', []))
-                    
-                    # Загружаем ограничения команд
-                    cmd_restrictions = data.get('command_restrictions', {})
-                    self.command_restrictions = {
-                        cmd: set(chats) for cmd, chats in cmd_restrictions.items()
-                    }
-                    
-                    # Загружаем настройки модулей
-                    self.module_settings = {
-                        int(chat_id): settings 
-                        for chat_id, settings in data.get('module_settings', {}).items()
-                    }
+            data, _ = await self.store.load()
+            
+            if data is not None:
+                # Загружаем списки доступа
+                self.allowed_chats = set(data.get('allowed_chats', []))
+                self.blocked_chats = set(data.get('blocked_chats', []))
+                self.allowed_users = set(data.get('allowed_users', []))
+                self.blocked_users = set(data.get('blocked_users', []))
+                
+                # Загружаем ограничения команд
+                cmd_restrictions = data.get('command_restrictions', {})
+                self.command_restrictions = {
+                    cmd: set(chats) for cmd, chats in cmd_restrictions.items()
+                }
+                
+                # Загружаем настройки модулей
+                self.module_settings = {
+                    int(chat_id): settings 
+                    for chat_id, settings in data.get('module_settings', {}).items()
+                }
                 
                 logger.info("📥 Настройки разрешений загружены")
             else:
@@ -94,36 +95,31 @@ class PermissionsModule:
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки разрешений: {e}")
     
+    def _snapshot(self) -> Dict[str, Any]:
+        """📸 Содержимое permissions.json"""
+        return {
+            'allowed_chats': list(self.allowed_chats),
+            'blocked_chats': list(self.blocked_chats),
+            'allowed_users': list(self.allowed_users),
+            'blocked_users': list(self.blocked_users),
+            'command_restrictions': {
+                cmd: list(chats) for cmd, chats in self.command_restrictions.items()
+            },
+            'module_settings': {
+                str(chat_id): settings 
+                for chat_id, settings in self.module_settings.items()
+            },
+            'last_updated': datetime.now().isoformat()
+        }
+    
     async def save_permissions(self):
-        """💾 Сохранение настроек разрешений"""
-        
-        try:
-            data = {
-                'allowed_chats': list(self.allowed_chats),
-                'blocked_chats': list(self.blocked_chats),
-                'allowed_users': list(self.allowed_users),
-                'blocked_users': list(self.blocked_users),
-                'command_restrictions': {
-                    cmd: list(chats) for cmd, chats in self.command_restrictions.items()
-                },
-                'module_settings': {
-                    str(chat_id): settings 
-                    for chat_id, settings in self.module_settings.items()
-                },
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            self.permissions_file.parent.mkdir(exist_ok=True)
-            
-            with open(self.permissions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            logger.debug("💾 Настройки разрешений сохранены")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения разрешений: {e}")
-            return False
+        """💾 Сохранение настроек разрешений (запись отложена и атомарна)"""
+        self.store.mark_dirty()
+        return True
+    
+    async def close(self):
+        """🛑 Запись несохраненных изменений"""
+        await self.store.close()
     
     async def check_chat_access(self, chat_id: int, user_id: int = None) -> bool:
         """🔍 Проверка доступа к чату"""
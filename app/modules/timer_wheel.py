@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+⏳ TIMER WHEEL - кулдауны и скользящие окна с ограниченной памятью
+
+TimerWheel хранит ключи со сроком жизни. Ключ попадает в ячейку колеса
+по времени истечения; при каждом обращении колесо докручивается до
+текущего момента и просроченные ключи из пройденных ячеек удаляются.
+Ключи со сроком дольше одного оборота остаются в ячейке до нужного
+оборота - решает сам срок, а не ячейка.
+
+Число ключей ограничено max_keys: при переполнении первыми вытесняются
+ключи, которые и так истекут раньше всех.
+
+RateWindow считает события ключа за последние window секунд в кольцевом
+буфере на limit + 1 отметку - больше для ответа "превышен ли лимит" не
+нужно. Буфер молчащего ключа удаляется колесом через window секунд.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Tuple, List, Optional, Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """⏳ Ключи со сроком жизни на хешированном колесе таймеров
+
+    clock - источник времени: time.monotonic для кулдаунов в памяти,
+    time.time, если сроки сохраняются между перезапусками.
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 512, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.resolution = resolution
+        self.max_keys = max_keys
+        self.clock = clock
+
+        self._items: Dict[Any, Tuple[float, Any]] = {}  # ключ -> (срок, значение)
+        self._slots: List[set] = [set() for _ in range(slots)]
+        self._tick = self._tick_of(clock())
+
+        # Метрики
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return self.remaining(key) > 0
+
+    def _tick_of(self, moment: float) -> int:
+        return int(moment / self.resolution)
+
+    def _slot_of(self, deadline: float) -> int:
+        return self._tick_of(deadline) % len(self._slots)
+
+    # =================== КОЛЕСО ===================
+
+    def _advance(self, now: float):
+        """🔄 Удаление просроченных ключей из ячеек, пройденных с прошлого вызова"""
+        tick = self._tick_of(now)
+        if tick < self._tick:
+            return
+
+        # Текущая ячейка просматривается повторно: часть ее ключей истекает позже
+        count = min(tick - self._tick + 1, len(self._slots))
+        for step in range(count):
+            index = (self._tick + step) % len(self._slots)
+            self._sweep(index, now)
+        self._tick = tick
+
+    def _sweep(self, index: int, now: float):
+        slot = self._slots[index]
+        for key in list(slot):
+            item = self._items.get(key)
+            if item is None:
+                slot.discard(key)
+            elif item[0] <= now:
+                slot.discard(key)
+                del self._items[key]
+                self.expired += 1
+            elif self._slot_of(item[0]) != index:
+                # Ключ переставлен в другую ячейку
+                slot.discard(key)
+
+    def _evict(self, now: float):
+        """🧹 Вытеснение ключей, истекающих раньше всех (при переполнении)"""
+        target = max(0, self.max_keys - max(1, self.max_keys // 64))
+        for step in range(len(self._slots)):
+            index = (self._tick + step) % len(self._slots)
+            slot = self._slots[index]
+            for key in list(slot):
+                slot.discard(key)
+                if key in self._items and self._slot_of(self._items[key][0]) == index:
+                    del self._items[key]
+                    self.evicted += 1
+            if len(self._items) <= target:
+                break
+        logger.debug(f"🧹 Колесо таймеров переполнено, вытеснено ключей: {self.evicted}")
+
+    # =================== КЛЮЧИ ===================
+
+    def set(self, key, ttl: float, value: Any = True):
+        """⏱️ Ключ (с значением) на ttl секунд; повторный set продлевает срок"""
+        now = self.clock()
+        self._advance(now)
+        if ttl <= 0:
+            self._items.pop(key, None)
+            return
+
+        if key not in self._items and len(self._items) >= self.max_keys:
+            self._evict(now)
+
+        deadline = now + ttl
+        self._items[key] = (deadline, value)
+        self._slots[self._slot_of(deadline)].add(key)
+
+    def get(self, key, default: Any = None) -> Any:
+        """🔎 Значение живого ключа"""
+        now = self.clock()
+        self._advance(now)
+        item = self._items.get(key)
+        if item is None:
+            return default
+        if item[0] <= now:
+            del self._items[key]
+            self.expired += 1
+            return default
+        return item[1]
+
+    def remaining(self, key) -> float:
+        """⏰ Секунд до истечения ключа (0 - ключа нет)"""
+        now = self.clock()
+        self._advance(now)
+        item = self._items.get(key)
+        if item is None:
+            return 0.0
+        return max(0.0, item[0] - now)
+
+    def pop(self, key, default: Any = None) -> Any:
+        """➖ Удаление ключа"""
+        item = self._items.pop(key, None)
+        return default if item is None else item[1]
+
+    def items(self) -> Iterator[Tuple[Any, float, Any]]:
+        """📋 Живые ключи: (ключ, срок, значение)"""
+        now = self.clock()
+        self._advance(now)
+        return ((key, deadline, value) for key, (deadline, value) in list(self._items.items())
+                if deadline > now)
+
+    def clear(self):
+        self._items.clear()
+        for slot in self._slots:
+            slot.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Размер колеса"""
+        self._advance(self.clock())
+        return {
+            'keys': len(self._items),
+            'max_keys': self.max_keys,
+            'expired': self.expired,
+            'evicted': self.evicted
+        }
+
+
+class RateWindow:
+    """🌊 Скользящее окно: сколько событий ключа было за window секунд"""
+
+    def __init__(self, window: float, limit: int, max_keys: int = 100_000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.limit = limit
+        self.clock = clock
+        self._rings = TimerWheel(resolution=max(window / 64, 0.01), max_keys=max_keys, clock=clock)
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def hit(self, key) -> int:
+        """➕ Событие ключа; возвращает число событий в окне (не больше limit + 1)"""
+        now = self.clock()
+        ring: Optional[deque] = self._rings.get(key)
+        if ring is None:
+            ring = deque(maxlen=self.limit + 1)
+
+        ring.append(now)
+        while ring and ring[0] <= now - self.window:
+            ring.popleft()
+
+        # Буфер живет, пока ключ присылает события
+        self._rings.set(key, self.window, ring)
+        return len(ring)
+
+    def exceeded(self, key) -> bool:
+        """🚨 Событие ключа превысило лимит окна"""
+        return self.hit(key) > self.limit
+
+    def count(self, key) -> int:
+        """🔢 Событий в окне без добавления нового"""
+        ring = self._rings.get(key)
+        if not ring:
+            return 0
+        border = self.clock() - self.window
+        return sum(1 for moment in ring if moment > border)
+
+    def reset(self, key):
+        self._rings.pop(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._rings.get_stats()
+        stats.update({'window': self.window, 'limit': self.limit})
+        return stats
+
+
+__all__ = ["TimerWheel", "RateWindow"]
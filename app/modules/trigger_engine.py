@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+🧭 TRIGGER ENGINE - скомпилированный поиск триггеров
+
+Все текстовые шаблоны (contains / exact / starts_with / ends_with и
+ключевые слова через '|') собираются в один автомат Ахо-Корасик:
+сообщение проходится один раз, сколько бы триггеров ни было.
+Регулярные выражения компилируются один раз при добавлении.
+
+Добавление триггера дописывает шаблон в бор, ссылки неудач
+пересчитываются при следующем поиске. Удаленные шаблоны просто
+снимаются с узлов; когда мусора становится больше, чем живых
+шаблонов, бор пересобирается целиком.
+
+TriggerIndex раскладывает триггеры по чатам: у каждого чата свой
+автомат, плюс общий для глобальных триггеров. Сообщение проверяется
+только шаблонами, которые могут сработать в его чате.
+"""
+
+import logging
+import re
+from collections import deque
+from typing import Dict, List, Any, Tuple, Set, Optional, FrozenSet, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Типы, которые ищутся автоматом
+TEXT_KINDS = ('contains', 'exact', 'starts_with', 'ends_with', 'keyword')
+
+
+class TriggerMatcher:
+    """🧭 Поиск всех подходящих триггеров за один проход по сообщению
+
+    Ключ - идентификатор триггера; match() возвращает ключи в порядке
+    добавления, чтобы сохранялся приоритет триггеров.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Any, Tuple[str, str]] = {}     # ключ -> (шаблон, тип)
+        self._order: Dict[Any, int] = {}                   # ключ -> порядковый номер
+        self._next_order = 0
+
+        self._regexes: Dict[Any, re.Pattern] = {}
+        self._always: Set[Any] = set()                     # Пустая подстрока есть в любом тексте
+
+        # Бор: переходы, ссылки неудач, ссылки на ближайший узел с выходами
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._dict_link: List[int] = []
+        self._outputs: List[List[Tuple[Any, str, int]]] = []
+        self._live_needles = 0
+        self._dead_needles = 0
+        self._dirty = False
+        self._reset_trie()
+
+        # Метрики
+        self.rebuilds = 0
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    # =================== ИЗМЕНЕНИЕ ===================
+
+    def add(self, key, pattern: str, kind: str = 'contains') -> bool:
+        """➕ Добавление (или замена) шаблона триггера
+
+        kind: contains, exact, starts_with, ends_with, keyword (варианты
+        через '|', любое вхождение) или regex. Неизвестный тип - False.
+        """
+        if kind not in TEXT_KINDS and kind != 'regex':
+            return False
+        if self._entries.get(key) == (pattern, kind):
+            return True
+
+        regex = None
+        if kind == 'regex':
+            try:
+                regex = re.compile(pattern, re.IGNORECASE)
+            except re.error:
+                logger.warning(f"⚠️ Некорректное регулярное выражение в триггере {key}: {pattern}")
+                self.remove(key)
+                return False
+
+        if key in self._entries:
+            self._detach(key)
+        else:
+            self._order[key] = self._next_order
+            self._next_order += 1
+
+        if regex is not None:
+            self._regexes[key] = regex
+        else:
+            for needle in self._needles(pattern, kind):
+                self._insert(key, needle, kind)
+
+        self._entries[key] = (pattern, kind)
+        return True
+
+    def remove(self, key) -> bool:
+        """➖ Удаление шаблона триггера"""
+        if key not in self._entries:
+            return False
+
+        self._detach(key)
+        del self._entries[key]
+        del self._order[key]
+
+        if self._dead_needles > max(64, self._live_needles):
+            self._rebuild()
+        return True
+
+    def clear(self):
+        """🧹 Удаление всех шаблонов"""
+        self._entries.clear()
+        self._order.clear()
+        self._regexes.clear()
+        self._always.clear()
+        self._reset_trie()
+
+    @staticmethod
+    def _needles(pattern: str, kind: str) -> List[str]:
+        """🧩 Строки для бора (в нижнем регистре)"""
+        pattern = pattern.lower()
+        if kind == 'keyword':
+            return [keyword.strip() for keyword in pattern.split('|')]
+        return [pattern]
+
+    def _insert(self, key, needle: str, kind: str):
+        """🌱 Вставка строки в бор"""
+        if not needle:
+            # Пустой exact подходит только к пустому тексту, а его не проверяем
+            if kind != 'exact':
+                self._always.add(key)
+            return
+
+        node = 0
+        for char in needle:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._dict_link.append(0)
+                self._outputs.append([])
+            node = next_node
+
+        self._outputs[node].append((key, kind, len(needle)))
+        self._live_needles += 1
+        self._dirty = True
+
+    def _detach(self, key):
+        """✂️ Снятие выходов ключа с узлов бора (узлы остаются до пересборки)"""
+        pattern, kind = self._entries[key]
+        self._always.discard(key)
+
+        if kind == 'regex':
+            self._regexes.pop(key, None)
+            return
+
+        for needle in set(self._needles(pattern, kind)):
+            if not needle:
+                continue
+            node = 0
+            for char in needle:
+                node = self._goto[node].get(char)
+                if node is None:
+                    break
+            if node is None:
+                continue
+
+            before = len(self._outputs[node])
+            self._outputs[node] = [output for output in self._outputs[node] if output[0] != key]
+            removed = before - len(self._outputs[node])
+            self._live_needles -= removed
+            self._dead_needles += removed
+
+        # Ссылки на узлы с выходами могли устареть
+        self._dirty = True
+
+    def _reset_trie(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._dict_link = [0]
+        self._outputs = [[]]
+        self._live_needles = 0
+        self._dead_needles = 0
+        self._dirty = False
+
+    def _rebuild(self):
+        """🔁 Полная пересборка бора без удаленных веток"""
+        entries = sorted(self._entries.items(), key=lambda item: self._order[item[0]])
+        self._reset_trie()
+        self._always.clear()
+
+        for key, (pattern, kind) in entries:
+            if kind != 'regex':
+                for needle in self._needles(pattern, kind):
+                    self._insert(key, needle, kind)
+
+        self.rebuilds += 1
+
+    def _link(self):
+        """🔗 Ссылки неудач и словарные ссылки (обход в ширину)"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._dict_link[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                if fail == child:
+                    fail = 0
+
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._outputs[fail] else self._dict_link[fail]
+                queue.append(child)
+
+        self._dirty = False
+
+    # =================== ПОИСК ===================
+
+    def match(self, text: str) -> List[Any]:
+        """🎯 Ключи всех подходящих триггеров в порядке добавления"""
+        if not text or not self._entries:
+            return []
+
+        if self._dirty:
+            self._link()
+
+        lowered = text.lower()
+        last = len(lowered) - 1
+        found = set(self._always)
+
+        goto, fail, dict_link, outputs = self._goto, self._fail, self._dict_link, self._outputs
+        state = 0
+        for position, char in enumerate(lowered):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            node = state if outputs[state] else dict_link[state]
+            while node:
+                for key, kind, length in outputs[node]:
+                    if kind == 'contains' or kind == 'keyword':
+                        found.add(key)
+                    elif kind == 'starts_with':
+                        if position + 1 == length:
+                            found.add(key)
+                    elif position == last:
+                        # ends_with - совпадение в конце, exact - еще и с начала
+                        if kind == 'ends_with' or length == len(lowered):
+                            found.add(key)
+                node = dict_link[node]
+
+        for key, regex in self._regexes.items():
+            if key not in found and regex.search(text):
+                found.add(key)
+
+        if found:
+            self.matches += 1
+        return sorted(found, key=self._order.__getitem__)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Размер автомата"""
+        return {
+            'patterns': len(self._entries),
+            'regexes': len(self._regexes),
+            'trie_nodes': len(self._goto),
+            'needles': self._live_needles,
+            'dead_needles': self._dead_needles,
+            'rebuilds': self.rebuilds,
+            'matched_messages': self.matches
+        }
+
+
+class TriggerIndex:
+    """🗂️ Триггеры по чатам: глобальный автомат + автомат каждого чата
+
+    Область действия триггера - frozenset чатов (None - все чаты) и
+    frozenset пользователей (None - все пользователи).
+    """
+
+    def __init__(self):
+        self._global = TriggerMatcher()
+        self._chats: Dict[int, TriggerMatcher] = {}
+        self._scopes: Dict[Any, Optional[FrozenSet[int]]] = {}
+        self._users: Dict[Any, FrozenSet[int]] = {}
+        self._order: Dict[Any, int] = {}
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._scopes)
+
+    def __contains__(self, key) -> bool:
+        return key in self._scopes
+
+    def add(self, key, pattern: str, kind: str = 'contains',
+            chats: Optional[Iterable[int]] = None, users: Optional[Iterable[int]] = None) -> bool:
+        """➕ Добавление (или замена) триггера; пустой chats - глобальный"""
+        order = self._order.get(key)
+        self.remove(key)
+
+        scope = frozenset(chats) if chats else None
+        matchers = [self._global] if scope is None else [
+            self._chats.setdefault(chat_id, TriggerMatcher()) for chat_id in scope
+        ]
+        if not all([matcher.add(key, pattern, kind) for matcher in matchers]):
+            for matcher in matchers:
+                matcher.remove(key)
+            self._drop_empty(scope)
+            return False
+
+        self._scopes[key] = scope
+        if users:
+            self._users[key] = frozenset(users)
+
+        # Замена триггера сохраняет его место в порядке срабатывания
+        if order is None:
+            order = self._next_order
+            self._next_order += 1
+        self._order[key] = order
+        return True
+
+    def remove(self, key) -> bool:
+        """➖ Удаление триггера из всех чатов"""
+        if key not in self._scopes:
+            return False
+
+        scope = self._scopes.pop(key)
+        self._users.pop(key, None)
+        del self._order[key]
+
+        if scope is None:
+            self._global.remove(key)
+        else:
+            for chat_id in scope:
+                self._chats[chat_id].remove(key)
+            self._drop_empty(scope)
+        return True
+
+    def clear(self):
+        """🧹 Удаление всех триггеров"""
+        self._global.clear()
+        self._chats.clear()
+        self._scopes.clear()
+        self._users.clear()
+        self._order.clear()
+
+    def _drop_empty(self, scope: Optional[FrozenSet[int]]):
+        for chat_id in scope or ():
+            matcher = self._chats.get(chat_id)
+            if matcher is not None and not len(matcher):
+                del self._chats[chat_id]
+
+    def scope(self, key) -> Optional[FrozenSet[int]]:
+        """🔎 Чаты триггера (None - глобальный)"""
+        return self._scopes.get(key)
+
+    def match(self, text: str, chat_id: int, user_id: Optional[int] = None) -> List[Any]:
+        """🎯 Сработавшие в чате триггеры (чатовые и глобальные) в порядке добавления"""
+        if not text or not self._scopes:
+            return []
+
+        found = self._global.match(text)
+        chat_matcher = self._chats.get(chat_id)
+        if chat_matcher is not None:
+            found += chat_matcher.match(text)
+
+        # Порядок индекса: замена триггера не сдвигает его приоритет
+        found.sort(key=self._order.__getitem__)
+
+        if user_id is not None and self._users:
+            found = [key for key in found if key not in self._users or user_id in self._users[key]]
+        return found
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Размер индекса"""
+        return {
+            'triggers': len(self._scopes),
+            'global_triggers': len(self._global),
+            'indexed_chats': len(self._chats),
+            'user_restricted': len(self._users),
+            'trie_nodes': sum(m.get_stats()['trie_nodes'] for m in (self._global, *self._chats.values())),
+            'global_matcher': self._global.get_stats()
+        }
+
+
+__all__ = ["TriggerMatcher", "TriggerIndex", "TEXT_KINDS"]
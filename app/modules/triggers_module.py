@@ -7,13 +7,13 @@
 """
 
 import logging
-import json
-import re
-import asyncio  # ДОБАВЛЕН ИМПОРТ
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
+from app.modules.trigger_engine import TriggerIndex
+from app.modules.json_store import JsonStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,13 +28,19 @@ class TriggersModule:
         self.triggers_file = Path('data/triggers/triggers.json')
         self.triggers_file.parent.mkdir(exist_ok=True)
         
-        # Кэш триггеров
+        # Кэш триггеров: {chat_id (int): {trigger_id: данные}}
         self.triggers = {}
         self.global_triggers = {}
         
         # Статистика срабатывания
         self.trigger_stats = {}
         
+        # Скомпилированный поиск: автомат каждого чата + глобальный
+        self.index = TriggerIndex()
+        
+        # Отложенная запись файла; срабатывания - в журнал счетчиков
+        self.store = JsonStore(self.triggers_file, self._snapshot)
+        
         # Типы триггеров
         self.trigger_types = {
             'text': 'Текстовый триггер',
@@ -56,38 +62,84 @@ class TriggersModule:
         """📥 Загрузка триггеров из файла"""
         
         try:
-            if self.triggers_file.exists():
-                with open(self.triggers_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.triggers = data.get('chat_triggers', {})
-                    self.global_triggers = data.get('global_triggers', {})
-                    self.trigger_stats = data.get('statistics', {})
-                
+            data, deltas = await self.store.load()
+            
+            if data is not None:
+                # В JSON ключи - строки, в памяти - id чатов
+                self.triggers = {
+                    int(chat_id): chat_triggers
+                    for chat_id, chat_triggers in data.get('chat_triggers', {}).items()
+                }
+                self.global_triggers = data.get('global_triggers', {})
+                self.trigger_stats = data.get('statistics', {})
+            
+            if deltas:
+                # Срабатывания после последнего снимка - переносим в документ
+                self._apply_deltas(deltas)
+                self.store.mark_dirty()
+            
+            if data is not None:
+                self._rebuild_index()
                 logger.info(f"📥 Загружено триггеров: {len(self.triggers)} чатовых, {len(self.global_triggers)} глобальных")
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки триггеров: {e}")
     
-    async def save_triggers(self):
-        """💾 Сохранение триггеров в файл"""
+    @staticmethod
+    def _matcher_kind(trigger_data: Dict) -> str:
+        """🧭 Тип для движка ('text' и неизвестные - contains)"""
+        trigger_type = trigger_data.get('type', 'contains')
+        if trigger_type in ('exact', 'contains', 'starts_with', 'ends_with', 'regex'):
+            return trigger_type
+        return 'contains'
+    
+    def _index_trigger(self, trigger_data: Dict):
+        """🗂️ Добавление триггера в индекс (глобальный - во все чаты)"""
+        chats = None if trigger_data.get('is_global') else [trigger_data['chat_id']]
+        self.index.add(trigger_data['id'], trigger_data['pattern'], self._matcher_kind(trigger_data), chats=chats)
+    
+    def _rebuild_index(self):
+        """🗂️ Сборка индекса: сначала чатовые триггеры, затем глобальные"""
+        self.index.clear()
+        for chat_triggers in self.triggers.values():
+            for trigger_data in chat_triggers.values():
+                self._index_trigger(trigger_data)
+        for trigger_data in self.global_triggers.values():
+            self._index_trigger(trigger_data)
+    
+    def _apply_deltas(self, deltas: List[Dict]):
+        """➕ Счетчики срабатываний из журнала"""
+        by_id = dict(self.global_triggers)
+        for chat_triggers in self.triggers.values():
+            by_id.update(chat_triggers)
         
-        try:
-            data = {
-                'chat_triggers': self.triggers,
-                'global_triggers': self.global_triggers,
-                'statistics': self.trigger_stats,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            with open(self.triggers_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-                
-            logger.debug("💾 Триггеры сохранены")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Ошибка сохранения триггеров: {e}")
-            return False
+        for record in deltas:
+            trigger_id, count = record['k'], record.get('n', 0)
+            self.trigger_stats[trigger_id] = self.trigger_stats.get(trigger_id, 0) + count
+            
+            trigger_data = by_id.get(trigger_id)
+            if trigger_data is not None:
+                trigger_data['usage_count'] = trigger_data.get('usage_count', 0) + count
+                if record.get('last_used'):
+                    trigger_data['last_used'] = record['last_used']
+    
+    def _snapshot(self) -> Dict[str, Any]:
+        """📸 Содержимое triggers.json"""
+        return {
+            'chat_triggers': self.triggers,
+            'global_triggers': self.global_triggers,
+            'statistics': self.trigger_stats,
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    async def save_triggers(self):
+        """💾 Сохранение триггеров в файл (запись отложена, не чаще раза в несколько секунд)"""
+        self.store.mark_dirty()
+        return True
+    
+    async def close(self):
+        """🛑 Запись несохраненных изменений"""
+        await self.store.close()
     
     async def add_trigger(self, user_id: int, chat_id: int, trigger_name: str, 
                          trigger_pattern: str, response: str, 
@@ -134,10 +186,11 @@ class TriggersModule:
             if trigger_data['is_global']:
                 self.global_triggers[trigger_data['id']] = trigger_data
             else:
-                chat_key = str(chat_id)
-                if chat_key not in self.triggers:
-                    self.triggers[chat_key] = {}
-                self.triggers[chat_key][trigger_data['id']] = trigger_data
+                if chat_id not in self.triggers:
+                    self.triggers[chat_id] = {}
+                self.triggers[chat_id][trigger_data['id']] = trigger_data
+            
+            self._index_trigger(trigger_data)
             
             # Сохраняем в файл
             await self.save_triggers()
@@ -187,9 +240,10 @@ class TriggersModule:
             if trigger_data['is_global']:
                 del self.global_triggers[trigger_data['id']]
             else:
-                chat_key = str(chat_id)
-                if chat_key in self.triggers and trigger_data['id'] in self.triggers[chat_key]:
-                    del self.triggers[chat_key][trigger_data['id']]
+                if chat_id in self.triggers and trigger_data['id'] in self.triggers[chat_id]:
+                    del self.triggers[chat_id][trigger_data['id']]
+            
+            self.index.remove(trigger_data['id'])
             
             # Сохраняем изменения
             await self.save_triggers()
@@ -221,16 +275,21 @@ class TriggersModule:
             if not message_text:
                 return None
             
+            # Только триггеры этого чата и глобальные, все совпадения за проход
+            matched = self.index.match(message_text, chat_id)
+            if not matched:
+                return None
+            
             # Получаем триггеры для этого чата
-            chat_triggers = self.triggers.get(str(chat_id), {})
+            chat_triggers = self.triggers.get(chat_id, {})
             
             # Проверяем чатовые триггеры
-            response = await self._check_triggers(message_text, chat_triggers, user_id, chat_id)
+            response = await self._check_triggers(message_text, chat_triggers, matched, user_id, chat_id)
             if response:
                 return response
             
             # Проверяем глобальные триггеры
-            response = await self._check_triggers(message_text, self.global_triggers, user_id, chat_id)
+            response = await self._check_triggers(message_text, self.global_triggers, matched, user_id, chat_id)
             if response:
                 return response
             
@@ -240,40 +299,39 @@ class TriggersModule:
             logger.error(f"❌ Ошибка проверки триггеров: {e}")
             return None
     
-    async def _check_triggers(self, message_text: str, triggers: Dict, 
+    async def _check_triggers(self, message_text: str, triggers: Dict, matched: List[str],
                             user_id: int, chat_id: int) -> Optional[str]:
-        """🔍 Проверка сообщения против набора триггеров"""
+        """🔍 Первый сработавший триггер набора среди найденных движком"""
         
         try:
-            for trigger_id, trigger_data in triggers.items():
-                if not trigger_data.get('is_active', True):
+            for trigger_id in matched:
+                trigger_data = triggers.get(trigger_id)
+                if trigger_data is None or not trigger_data.get('is_active', True):
                     continue
                 
-                # Проверяем соответствие
-                if await self._match_trigger(message_text, trigger_data):
-                    # Увеличиваем счетчик использования
-                    trigger_data['usage_count'] = trigger_data.get('usage_count', 0) + 1
-                    trigger_data['last_used'] = datetime.now().isoformat()
-                    
-                    # Обновляем статистику
-                    if trigger_id not in self.trigger_stats:
-                        self.trigger_stats[trigger_id] = 0
-                    self.trigger_stats[trigger_id] += 1
-                    
-                    # Сохраняем статистику
-                    asyncio.create_task(self.save_triggers())
-                    
-                    # Логируем срабатывание
-                    if self.db:
-                        await self.db.track_event(
-                            user_id, chat_id, 'trigger_activated',
-                            {'trigger_name': trigger_data['name'], 'trigger_id': trigger_id}
-                        )
-                    
-                    # Обрабатываем ответ триггера
-                    return await self._process_trigger_response(
-                        trigger_data['response'], user_id, chat_id, message_text
+                # Увеличиваем счетчик использования
+                trigger_data['usage_count'] = trigger_data.get('usage_count', 0) + 1
+                trigger_data['last_used'] = datetime.now().isoformat()
+                
+                # Обновляем статистику
+                if trigger_id not in self.trigger_stats:
+                    self.trigger_stats[trigger_id] = 0
+                self.trigger_stats[trigger_id] += 1
+                
+                # Счетчик - строкой в журнал, без перезаписи всего файла
+                self.store.add_counter(trigger_id, 1, last_used=trigger_data['last_used'])
+                
+                # Логируем срабатывание
+                if self.db:
+                    await self.db.track_event(
+                        user_id, chat_id, 'trigger_activated',
+                        {'trigger_name': trigger_data['name'], 'trigger_id': trigger_id}
                     )
+                
+                # Обрабатываем ответ триггера
+                return await self._process_trigger_response(
+                    trigger_data['response'], user_id, chat_id, message_text
+                )
             
             return None
             
@@ -281,39 +339,6 @@ class TriggersModule:
             logger.error(f"❌ Ошибка при проверке набора триггеров: {e}")
             return None
     
-    async def _match_trigger(self, message_text: str, trigger_data: Dict) -> bool:
-        """🎯 Проверка соответствия сообщения триггеру"""
-        
-        try:
-            pattern = trigger_data['pattern']
-            trigger_type = trigger_data.get('type', 'contains')
-            
-            # Приводим к нижнему регистру для сравнения
-            message_lower = message_text.lower()
-            pattern_lower = pattern.lower()
-            
-            if trigger_type == 'exact':
-                return message_lower == pattern_lower
-            elif trigger_type == 'contains':
-                return pattern_lower in message_lower
-            elif trigger_type == 'starts_with':
-                return message_lower.startswith(pattern_lower)
-            elif trigger_type == 'ends_with':
-                return message_lower.endswith(pattern_lower)
-            elif trigger_type == 'regex':
-                try:
-                    return bool(re.search(pattern, message_text, re.IGNORECASE))
-                except re.error:
-                    logger.warning(f"⚠️ Некорректное регулярное выражение в триггере: {pattern}")
-                    return False
-            else:
-                # По умолчанию - contains
-                return pattern_lower in message_lower
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка сопоставления триггера: {e}")
-            return False
-    
     async def _process_trigger_response(self, response: str, user_id: int, 
                                       chat_id: int, original_message: str) -> str:
         """🔧 Обработка ответа триггера с заменой переменных"""
@@ -344,16 +369,13 @@ class TriggersModule:
         """🔍 Поиск триггера по идентификатору или имени"""
         
         try:
-            # Сначала ищем по ID
-            chat_key = str(chat_id)
-            
-            # Поиск в чатовых триггерах
-            if chat_key in self.triggers:
-                if identifier in self.triggers[chat_key]:
-                    return self.triggers[chat_key][identifier]
+            # Сначала ищем по ID в чатовых триггерах
+            if chat_id in self.triggers:
+                if identifier in self.triggers[chat_id]:
+                    return self.triggers[chat_id][identifier]
                 
                 # Поиск по имени
-                for trigger_data in self.triggers[chat_key].values():
+                for trigger_data in self.triggers[chat_id].values():
                     if trigger_data['name'].lower() == identifier.lower():
                         return trigger_data
             
@@ -407,9 +429,8 @@ class TriggersModule:
             # Подсчитываем существующие триггеры пользователя
             user_triggers_count = 0
             
-            chat_key = str(chat_id)
-            if chat_key in self.triggers:
-                for trigger_data in self.triggers[chat_key].values():
+            if chat_id in self.triggers:
+                for trigger_data in self.triggers[chat_id].values():
                     if trigger_data.get('creator_id') == user_id:
                         user_triggers_count += 1
             
@@ -426,9 +447,8 @@ class TriggersModule:
             user_triggers = []
             
             # Триггеры в текущем чате
-            chat_key = str(chat_id)
-            if chat_key in self.triggers:
-                for trigger_data in self.triggers[chat_key].values():
+            if chat_id in self.triggers:
+                for trigger_data in self.triggers[chat_id].values():
                     if trigger_data.get('creator_id') == user_id:
                         user_triggers.append(trigger_data)
             
@@ -507,6 +527,8 @@ class TriggersModule:
             'loaded_triggers': len(self.triggers),
             'global_triggers': len(self.global_triggers),
             'trigger_types': list(self.trigger_types.keys()),
+            'index': self.index.get_stats(),
+            'storage': self.store.get_stats(),
             'status': 'active'
         }
 
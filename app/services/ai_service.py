@@ -3,16 +3,20 @@
 🧠 AI SERVICE v2.0
 🤖 Продвинутый AI сервис с поддержкой GPT-4 и Claude-3
 
-Интеграция с OpenAI и Anthropic API для генерации умных ответов
+Интеграция с OpenAI и Anthropic API для генерации умных ответов.
+stream_response() отдает ответ частями по мере генерации (SSE, stream=true).
 """
 
 import logging
 import asyncio
 import json
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
-import aiohttp
-from cachetools import TTLCache
+from typing import Dict, Any, Optional, List, AsyncIterator
+
+from app.services.http_client import HttpClient, iter_sse
+from app.services.provider_router import ProviderRouter, Provider, ProviderHealth
+from app.services.response_cache import ResponseCache, CacheKey
+from app.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -20,12 +24,34 @@ logger = logging.getLogger(__name__)
 class AIService:
     """🧠 Сервис искусственного интеллекта"""
     
-    def __init__(self, config):
+    # Таймаут одного запроса к API (секунды)
+    REQUEST_TIMEOUT = 30.0
+    # Потоковый ответ идет дольше: таймаут на весь поток (секунды)
+    STREAM_TIMEOUT = 120.0
+    
+    SYSTEM_PROMPT = "Ты - продвинутый AI помощник в Telegram боте Enhanced Telegram Bot v2.0. Отвечай полезно, дружелюбно и информативно. Используй эмодзи для украшения ответов."
+    
+    def __init__(self, config, http: HttpClient = None):
         self.config = config
         self.ai_config = config.ai
         
-        # Кэш ответов
-        self.response_cache = TTLCache(maxsize=100, ttl=3600)  # 1 час
+        # Общий пул соединений (main.py); без него - собственный клиент
+        self._owns_http = http is None
+        self.http = http or HttpClient(getattr(config, 'http', None))
+        
+        self.openai_url = self.ai_config.openai_url
+        self.anthropic_url = self.ai_config.anthropic_url
+        
+        # Кэш ответов: ключ - весь нормализованный промпт с контекстом и моделью
+        self.response_cache = ResponseCache(
+            max_bytes=int(self.ai_config.cache_max_mb * 1024 * 1024),
+            ttl=self.ai_config.cache_ttl,
+            similarity=self.ai_config.cache_similarity,
+            namespace=f"{self.ai_config.default_model}|{self.ai_config.temperature}|{self.ai_config.max_tokens}"
+        )
+        
+        # Одинаковые одновременные запросы ждут один вызов API
+        self.flights = SingleFlight("ai")
         
         # Счетчики лимитов
         self.daily_usage = {}
@@ -40,8 +66,36 @@ class AIService:
             'claude-3-5-sonnet-20241022', 'claude-3-haiku-20240307', 'claude-3-opus-20240229'
         ]
         
+        # Порядок провайдеров по задержке и ошибкам, предохранители, hedging
+        self.router = ProviderRouter(
+            self._build_providers(),
+            hedging=self.ai_config.hedging,
+            hedge_min_delay=self.ai_config.hedge_min_delay,
+            hedge_max_delay=self.ai_config.hedge_max_delay
+        )
+        
         logger.info("🧠 AI Service инициализирован")
     
+    def _build_providers(self) -> List[Provider]:
+        """🔀 Провайдеры с ключами, в порядке конфигурации"""
+        
+        def health():
+            return ProviderHealth(
+                failure_threshold=self.ai_config.breaker_failures,
+                cooldown=self.ai_config.breaker_cooldown
+            )
+        
+        providers = []
+        if self.ai_config.openai_api_key:
+            providers.append(Provider(
+                "openai", self.ai_config.default_model, self._call_openai, health(), stream=self._stream_openai
+            ))
+        if self.ai_config.anthropic_api_key:
+            providers.append(Provider(
+                "anthropic", self._anthropic_model(), self._call_anthropic, health(), stream=self._stream_anthropic
+            ))
+        return providers
+    
     async def generate_response(self, prompt: str, user_id: int = None, 
                               context: Dict = None) -> Optional[str]:
         """🎯 Генерация ответа от AI"""
@@ -53,70 +107,55 @@ class AIService:
             
             # Проверяем кэш
             cache_key = self._generate_cache_key(prompt, context)
-            if cache_key in self.response_cache:
+            cached = self.response_cache.get(cache_key)
+            if cached:
                 logger.debug("📋 Ответ получен из кэша")
-                return self.response_cache[cache_key]
+                return cached
             
             # Подготавливаем промпт с контекстом
             enhanced_prompt = self._enhance_prompt(prompt, context)
             
-            # Генерируем ответ
-            response = None
-            
-            # Пробуем OpenAI
-            if self.ai_config.openai_api_key:
-                response = await self._call_openai(enhanced_prompt)
-            
-            # Если OpenAI не сработал, пробуем Anthropic
-            if not response and self.ai_config.anthropic_api_key:
-                response = await self._call_anthropic(enhanced_prompt)
+            # Одинаковый запрос уже выполняется - ждем его ответ
+            response = await self.flights.do(
+                ('full', enhanced_prompt), self._generate_uncached, enhanced_prompt, cache_key, user_id
+            )
             
             if not response:
                 return "❌ AI сервисы временно недоступны. Проверьте настройки API ключей."
             
-            # Сохраняем в кэш
-            self.response_cache[cache_key] = response
-            
-            # Учитываем использование
-            self._track_usage(user_id)
-            
             return response
             
         except Exception as e:
             logger.error(f"❌ Ошибка генерации ответа: {e}")
             return "❌ Произошла ошибка при обращении к AI. Попробуйте позже."
     
+    async def _generate_uncached(self, enhanced_prompt: str, cache_key: CacheKey, user_id: int = None) -> Optional[str]:
+        """📡 Запрос к провайдерам через маршрутизатор: лучший первым, при ошибке - следующий"""
+        
+        response = await self.router.call(enhanced_prompt)
+        
+        if response:
+            # Сохраняем в кэш
+            self.response_cache.put(cache_key, response)
+            
+            # Учитываем использование (объединенные вызовы, как и кэш, не считаются)
+            self._track_usage(user_id)
+        
+        return response
+    
     async def _call_openai(self, prompt: str) -> Optional[str]:
         """🔵 Вызов OpenAI API"""
         
         try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.ai_config.openai_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": self.ai_config.default_model,
-                "messages": [
-                    {
-                        "role": "system", 
-                        "content": "Ты - продвинутый AI помощник в Telegram боте Enhanced Telegram Bot v2.0. Отвечай полезно, дружелюбно и информативно. Используй эмодзи для украшения ответов."
-                    },
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": self.ai_config.max_tokens,
-                "temperature": self.ai_config.temperature
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        return result['choices'][0]['message']['content'].strip()
-                    else:
-                        logger.error(f"OpenAI API ошибка {resp.status}: {await resp.text()}")
-                        return None
+            headers, data = self._openai_request(prompt)
+            
+            async with self.http.post(self.openai_url, headers=headers, json=data, timeout=self.REQUEST_TIMEOUT) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    return result['choices'][0]['message']['content'].strip()
+                else:
+                    logger.error(f"OpenAI API ошибка {resp.status}: {await resp.text()}")
+                    return None
                         
         except Exception as e:
             logger.error(f"❌ Ошибка вызова OpenAI: {e}")
@@ -126,45 +165,185 @@ class AIService:
         """🟠 Вызов Anthropic Claude API"""
         
         try:
-            url = "https://api.anthropic.com/v1/messages"
-            headers = {
-                "x-api-key": self.ai_config.anthropic_api_key,
-                "Content-Type": "application/json",
-                "anthropic-version": "2023-06-01"
-            }
-            
-            # Определяем модель Claude
-            model = "claude-3-5-sonnet-20241022"
-            if "haiku" in self.ai_config.default_model.lower():
-                model = "claude-3-haiku-20240307"
-            elif "opus" in self.ai_config.default_model.lower():
-                model = "claude-3-opus-20240229"
-            
-            data = {
-                "model": model,
-                "max_tokens": self.ai_config.max_tokens,
-                "temperature": self.ai_config.temperature,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": f"Ты - продвинутый AI помощник в Telegram боте Enhanced Telegram Bot v2.0. Отвечай полезно, дружелюбно и информативно. Используй эмодзи для украшения ответов.\n\nВопрос: {prompt}"
-                    }
-                ]
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=30) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        return result['content'][0]['text'].strip()
-                    else:
-                        logger.error(f"Anthropic API ошибка {resp.status}: {await resp.text()}")
-                        return None
+            headers, data = self._anthropic_request(prompt)
+            
+            async with self.http.post(self.anthropic_url, headers=headers, json=data, timeout=self.REQUEST_TIMEOUT) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    return result['content'][0]['text'].strip()
+                else:
+                    logger.error(f"Anthropic API ошибка {resp.status}: {await resp.text()}")
+                    return None
                         
         except Exception as e:
             logger.error(f"❌ Ошибка вызова Anthropic: {e}")
             return None
     
+    def _openai_request(self, prompt: str, stream: bool = False):
+        """🔵 Заголовки и тело запроса к OpenAI"""
+        headers = {
+            "Authorization": f"Bearer {self.ai_config.openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": self.ai_config.default_model,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": self.ai_config.max_tokens,
+            "temperature": self.ai_config.temperature
+        }
+        if stream:
+            data["stream"] = True
+        
+        return headers, data
+    
+    def _anthropic_model(self) -> str:
+        """🟠 Модель Claude, соответствующая default_model"""
+        model = "claude-3-5-sonnet-20241022"
+        if "haiku" in self.ai_config.default_model.lower():
+            model = "claude-3-haiku-20240307"
+        elif "opus" in self.ai_config.default_model.lower():
+            model = "claude-3-opus-20240229"
+        return model
+    
+    def _anthropic_request(self, prompt: str, stream: bool = False):
+        """🟠 Заголовки и тело запроса к Anthropic"""
+        headers = {
+            "x-api-key": self.ai_config.anthropic_api_key,
+            "Content-Type": "application/json",
+            "anthropic-version": "2023-06-01"
+        }
+        
+        data = {
+            "model": self._anthropic_model(),
+            "max_tokens": self.ai_config.max_tokens,
+            "temperature": self.ai_config.temperature,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": f"{self.SYSTEM_PROMPT}\n\nВопрос: {prompt}"
+                }
+            ]
+        }
+        if stream:
+            data["stream"] = True
+        
+        return headers, data
+    
+    # =================== ПОТОКОВЫЕ ОТВЕТЫ ===================
+    
+    async def stream_response(self, prompt: str, user_id: int = None,
+                              context: Dict = None) -> AsyncIterator[str]:
+        """🌊 Генерация ответа частями по мере прихода от API
+        
+        Те же лимиты, кэш, учет и объединение одинаковых запросов, что у
+        generate_response. Ответ из кэша и сообщения об ошибках приходят
+        одной частью.
+        """
+        
+        if not self._check_limits(user_id):
+            yield "❌ Превышен лимит запросов к AI. Попробуйте позже."
+            return
+        
+        cache_key = self._generate_cache_key(prompt, context)
+        cached = self.response_cache.get(cache_key)
+        if cached:
+            logger.debug("📋 Ответ получен из кэша")
+            yield cached
+            return
+        
+        enhanced_prompt = self._enhance_prompt(prompt, context)
+        
+        # Одинаковый поток уже идет - получаем его части с начала
+        async for chunk in self.flights.stream(
+            ('stream', enhanced_prompt), self._stream_uncached, enhanced_prompt, cache_key, user_id
+        ):
+            yield chunk
+    
+    async def _stream_uncached(self, enhanced_prompt: str, cache_key: CacheKey,
+                               user_id: int = None) -> AsyncIterator[str]:
+        """📡 Поток от провайдеров
+        
+        Провайдеры - в порядке маршрутизатора, без отключенных предохранителем.
+        Если провайдер упал до первой части - пробуем следующий; после первой
+        части ответ уже у пользователя, поэтому ошибка пробрасывается
+        вызывающему (он закрывает оборванный ответ), а поток не повторяется и
+        не кэшируется. Потоки не дублируются (hedging только для обычных
+        запросов), результат учитывается предохранителем.
+        """
+        
+        parts = []
+        complete = False
+        for provider in self.router.ranked():
+            provider.health.acquire()
+            ok = False
+            try:
+                async for chunk in provider.stream(enhanced_prompt):
+                    parts.append(chunk)
+                    yield chunk
+                complete = ok = bool(parts)
+            except Exception as e:
+                logger.error(f"❌ Ошибка потока {provider.key}: {e}")
+                if parts:
+                    provider.health.record(None, False)
+                    self._track_usage(user_id)
+                    raise
+            except BaseException:
+                # Поток отменен - не ошибка провайдера
+                provider.health.release()
+                raise
+            provider.health.record(None, ok)
+            if parts:
+                break
+        
+        if not parts:
+            yield "❌ AI сервисы временно недоступны. Проверьте настройки API ключей."
+            return
+        
+        if complete:
+            self.response_cache.put(cache_key, "".join(parts).strip())
+        self._track_usage(user_id)
+    
+    async def _stream_openai(self, prompt: str) -> AsyncIterator[str]:
+        """🔵 Потоковый вызов OpenAI: choices[0].delta.content до [DONE]"""
+        headers, data = self._openai_request(prompt, stream=True)
+        
+        async with self.http.post(self.openai_url, headers=headers, json=data, timeout=self.STREAM_TIMEOUT) as resp:
+            if resp.status != 200:
+                logger.error(f"OpenAI API ошибка {resp.status}: {await resp.text()}")
+                return
+            
+            async for _, payload in iter_sse(resp):
+                if payload == "[DONE]":
+                    return
+                event = json.loads(payload)
+                choices = event.get('choices') or [{}]
+                content = (choices[0].get('delta') or {}).get('content')
+                if content:
+                    yield content
+    
+    async def _stream_anthropic(self, prompt: str) -> AsyncIterator[str]:
+        """🟠 Потоковый вызов Anthropic: content_block_delta до message_stop"""
+        headers, data = self._anthropic_request(prompt, stream=True)
+        
+        async with self.http.post(self.anthropic_url, headers=headers, json=data, timeout=self.STREAM_TIMEOUT) as resp:
+            if resp.status != 200:
+                logger.error(f"Anthropic API ошибка {resp.status}: {await resp.text()}")
+                return
+            
+            async for event_type, payload in iter_sse(resp):
+                if event_type == "message_stop":
+                    return
+                if event_type == "error":
+                    raise RuntimeError(payload)
+                if event_type == "content_block_delta":
+                    text = json.loads(payload).get('delta', {}).get('text')
+                    if text:
+                        yield text
+    
     def _enhance_prompt(self, prompt: str, context: Dict = None) -> str:
         """💡 Улучшение промпта с контекстом"""
         
@@ -193,23 +372,23 @@ class AIService:
             logger.error(f"❌ Ошибка улучшения промпта: {e}")
             return prompt
     
-    def _generate_cache_key(self, prompt: str, context: Dict = None) -> str:
-        """🔑 Генерация ключа для кэша"""
+    def _generate_cache_key(self, prompt: str, context: Dict = None) -> CacheKey:
+        """🔑 Ключ кэша: весь промпт и та часть контекста, что попадает в запрос"""
         
-        try:
-            # Создаем ключ на основе промпта и контекста
-            key_parts = [prompt[:100]]  # Первые 100 символов промпта
-            
-            if context:
-                behavior = context.get('behavior_analysis', {})
-                if behavior:
-                    key_parts.append(behavior.get('user_type', ''))
-                    key_parts.append(behavior.get('communication_style', ''))
-            
-            return "|".join(key_parts)
-            
-        except Exception:
-            return prompt[:50]
+        scope = {}
+        if context:
+            scope = {key: value for key, value in context.items() if key not in ('behavior_analysis', 'memory')}
+            
+            behavior = context.get('behavior_analysis', {})
+            if behavior:
+                scope['behavior'] = [behavior.get('user_type', ''), behavior.get('communication_style', '')]
+            
+            # В промпт попадают последние 6 реплик (_enhance_prompt)
+            memory = context.get('memory', [])
+            if memory:
+                scope['memory'] = list(memory[-6:])
+        
+        return self.response_cache.key(prompt, scope)
     
     def _check_limits(self, user_id: int = None) -> bool:
         """🚦 Проверка лимитов использования"""
@@ -285,14 +464,24 @@ class AIService:
                 'daily_usage': self.daily_usage.get(today, 0),
                 'daily_limit': self.ai_config.daily_limit,
                 'cache_size': len(self.response_cache),
+                'cache': self.response_cache.get_stats(),
                 'openai_available': bool(self.ai_config.openai_api_key),
                 'anthropic_available': bool(self.ai_config.anthropic_api_key),
-                'default_model': self.ai_config.default_model
+                'default_model': self.ai_config.default_model,
+                'coalescing': self.flights.get_stats(),
+                'providers': self.router.get_stats(),
+                'http': self.http.get_stats()
             }
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики: {e}")
             return {}
+    
+    async def close(self):
+        """🔒 Сброс кэша ответов и закрытие собственного HTTP-клиента (общий закрывает main.py)"""
+        await self.response_cache.close()
+        if self._owns_http:
+            await self.http.close()
 
 
 __all__ = ["AIService"]
\ No newline at end of file
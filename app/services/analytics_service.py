@@ -98,8 +98,8 @@ class AnalyticsService:
         """🔍 Анализ активности пользователя"""
         
         try:
-            # В реальной реализации это был бы сложный анализ событий из БД
-            # Для демонстрации возвращаем структурированные данные
+            # Число сообщений и время активности - из логов чатов,
+            # остальные показатели пока условные
             
             analysis = {
                 'activity_level': 'moderate',
@@ -110,9 +110,22 @@ class AnalyticsService:
                 'activity_trend': 'stable'
             }
             
-            # Определяем уровень активности
-            message_count = 10  # Заглушка - в реальности из БД
+            # Сообщения за период - вместе с архивными месяцами, если период их задевает
+            until = datetime.now()
+            since = until - timedelta(days=self.config['activity_days_range'])
+            message_count = 0
+            hours = Counter()
+            async for row in self.db.iterate_logs_range(
+                'chat_logs', since, until, "user_id = ?", (user_id,), columns="timestamp", row_shape='tuple'
+            ):
+                message_count += 1
+                hours[int(str(row[0])[11:13])] += 1
+            
+            analysis['messages_in_period'] = message_count
+            if hours:
+                analysis['most_active_time'] = self._time_of_day(hours.most_common(1)[0][0])
             
+            # Определяем уровень активности
             if message_count >= 100:
                 analysis['activity_level'] = 'high'
                 analysis['engagement_score'] = 0.9
@@ -132,6 +145,17 @@ class AnalyticsService:
             logger.error(f"❌ Ошибка анализа активности: {e}")
             return {'activity_level': 'unknown', 'engagement_score': 0.5}
     
+    @staticmethod
+    def _time_of_day(hour: int) -> str:
+        """🕐 Время суток по часу"""
+        if 6 <= hour < 12:
+            return 'morning'
+        if 12 <= hour < 18:
+            return 'afternoon'
+        if 18 <= hour < 24:
+            return 'evening'
+        return 'night'
+    
     async def _generate_user_insights(self, user_id: int, stats: Dict, 
                                     analysis: Dict) -> List[str]:
         """💡 Генерация инсайтов для пользователя"""
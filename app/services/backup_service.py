@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+💾 BACKUP SERVICE
+🔄 Горячее резервное копирование базы без остановки бота
+
+Копия снимается через SQLite online backup API порциями страниц в
+отдельном потоке: цикл событий продолжает обрабатывать сообщения,
+а между порциями писатель может фиксировать свои транзакции.
+Снимки сжимаются gzip и ротируются по max_backups.
+"""
+
+import asyncio
+import gzip
+import logging
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз копию можно начать заново из-за записи в источник,
+# прежде чем скопировать базу одним шагом
+MAX_BACKUP_RESTARTS = 3
+
+
+class _BackupRestarted(Exception):
+    """Источник слишком часто меняется во время пошагового копирования"""
+
+
+class BackupService:
+    """💾 Планировщик резервных копий"""
+
+    def __init__(self, config, db_service):
+        self.db = db_service
+        self.db_config = config.database
+
+        self.enabled = (
+            self.db_config.backup_enabled
+            and self.db_config.path != ':memory:'
+            and self.db.backend.supports_backup
+        )
+        self.backup_dir = Path(getattr(self.db_config, 'backup_dir', '') or 'data/backups')
+        self.interval = max(0.1, self.db_config.backup_interval_hours) * 3600
+        self.max_backups = max(1, self.db_config.max_backups)
+        self.step_pages = max(1, getattr(self.db_config, 'backup_step_pages', 256))
+        self.file_prefix = f"{Path(self.db_config.path).stem}_"
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._last_changes: Optional[int] = None
+
+        # Метрики
+        self.backups_done = 0
+        self.backups_skipped = 0
+        self.backups_failed = 0
+        self.restarts = 0
+        self.last_backup_at: Optional[datetime] = None
+        self.last_duration_ms = 0.0
+        self.last_db_size = 0
+        self.last_backup_size = 0
+        self.last_backup_path: Optional[Path] = None
+        self.last_error: Optional[str] = None
+
+        logger.info("💾 Backup Service инициализирован")
+
+    async def start(self):
+        """▶️ Запуск планировщика"""
+        if not self.enabled:
+            if self.db_config.backup_enabled and not self.db.backend.supports_backup:
+                logger.info(
+                    f"💾 Бэкенд {self.db.backend.dialect} копируется своими средствами (pg_dump), "
+                    f"встроенное копирование отключено"
+                )
+            else:
+                logger.info("💾 Резервное копирование отключено")
+            return
+        if self._task:
+            return
+
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._schedule_loop())
+        logger.info(
+            f"💾 Резервное копирование: каждые {self.interval / 3600:g} ч, "
+            f"хранится {self.max_backups} копий"
+        )
+
+    async def close(self):
+        """🔒 Остановка планировщика"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("💾 Backup Service закрыт")
+
+    async def _schedule_loop(self):
+        """🔄 Копия раз в interval, отсчет от самой свежей существующей копии"""
+        while True:
+            backups = self.list_backups()
+            age = time.time() - backups[-1].stat().st_mtime if backups else self.interval
+            await asyncio.sleep(max(0.0, self.interval - age))
+
+            try:
+                await self.backup_now()
+            except Exception as e:
+                logger.error(f"❌ Ошибка планового резервного копирования: {e}")
+                # Не повторяем ошибку в цикле без паузы
+                await asyncio.sleep(min(self.interval, 600))
+
+    # =================== СОЗДАНИЕ КОПИИ ===================
+
+    async def backup_now(self, force: bool = False) -> Optional[Path]:
+        """💾 Снять копию сейчас (без изменений с прошлой копии - пропуск)"""
+        if not self.enabled:
+            return None
+
+        async with self._lock:
+            # Дописываем отложенные логи, чтобы они попали в копию
+            await self.db.flush_writes()
+
+            # Писатель в приложении один: его счетчик изменений показывает,
+            # менялась ли база с прошлой копии
+            changes = self.db.connection.total_changes if self.db.connection else None
+            if not force and changes is not None and changes == self._last_changes:
+                self.backups_skipped += 1
+                logger.info("💾 База не менялась, копия пропущена")
+                return None
+
+            self.backup_dir.mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            raw_path = self.backup_dir / f"{self.file_prefix}{stamp}.db.part"
+            final_path = self.backup_dir / f"{self.file_prefix}{stamp}.db.gz"
+
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._copy_database, raw_path)
+                self.last_db_size = raw_path.stat().st_size
+                await asyncio.to_thread(self._compress, raw_path, final_path)
+            except Exception as e:
+                self.backups_failed += 1
+                self.last_error = str(e)
+                logger.error(f"❌ Ошибка резервного копирования: {e}")
+                for path in (raw_path, final_path):
+                    path.unlink(missing_ok=True)
+                raise
+            finally:
+                raw_path.unlink(missing_ok=True)
+
+            self.last_duration_ms = (time.perf_counter() - started) * 1000
+            self.last_backup_size = final_path.stat().st_size
+            self.last_backup_at = datetime.now()
+            self.last_backup_path = final_path
+            self.last_error = None
+            self.backups_done += 1
+            self._last_changes = changes
+
+            logger.info(
+                f"💾 Копия {final_path.name}: {self.last_db_size / 1024:.0f} КБ -> "
+                f"{self.last_backup_size / 1024:.0f} КБ за {self.last_duration_ms:.0f} мс"
+            )
+
+            self.rotate()
+            return final_path
+
+    def _copy_database(self, target_path: Path):
+        """📄 Online backup порциями по step_pages страниц (выполняется в потоке)"""
+        uri = f"file:{quote(Path(self.db_config.path).resolve().as_posix())}?mode=ro"
+        source = sqlite3.connect(uri, uri=True, timeout=30.0)
+        try:
+            try:
+                self._run_backup(source, target_path, self.step_pages)
+            except _BackupRestarted:
+                # Запись в источник сбрасывает пошаговую копию; при частой записи
+                # копируем одним шагом - в WAL это не блокирует писателя
+                logger.warning("⚠️ База часто меняется, копия снимается одним шагом")
+                target_path.unlink(missing_ok=True)
+                self._run_backup(source, target_path, -1)
+        finally:
+            source.close()
+
+    def _run_backup(self, source, target_path: Path, pages: int):
+        """🔁 Один проход backup API с отслеживанием перезапусков"""
+        last_remaining = None
+        restarts = 0
+
+        def progress(status, remaining, total):
+            nonlocal last_remaining, restarts
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                self.restarts += 1
+                if restarts > MAX_BACKUP_RESTARTS:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+
+        target = sqlite3.connect(str(target_path))
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        finally:
+            target.close()
+
+    @staticmethod
+    def _compress(raw_path: Path, final_path: Path):
+        """🗜️ Сжатие снимка gzip (выполняется в потоке)"""
+        with open(raw_path, 'rb') as src, gzip.open(final_path, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, length=1024 * 1024)
+
+    # =================== РОТАЦИЯ ===================
+
+    def list_backups(self) -> List[Path]:
+        """📋 Копии по возрастанию времени создания"""
+        if not self.backup_dir.exists():
+            return []
+        return sorted(self.backup_dir.glob(f"{self.file_prefix}*.db.gz"))
+
+    def rotate(self) -> int:
+        """🗑️ Удаление копий сверх max_backups (самые старые)"""
+        backups = self.list_backups()
+        removed = 0
+
+        for path in backups[:max(0, len(backups) - self.max_backups)]:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось удалить копию {path.name}: {e}")
+
+        if removed:
+            logger.info(f"🗑️ Удалено старых копий: {removed}")
+        return removed
+
+    def get_service_stats(self) -> Dict[str, Any]:
+        """📊 Статистика сервиса"""
+        backups = self.list_backups()
+        return {
+            'enabled': self.enabled,
+            'backups_stored': len(backups),
+            'backups_bytes': sum(path.stat().st_size for path in backups),
+            'backups_done': self.backups_done,
+            'backups_skipped': self.backups_skipped,
+            'backups_failed': self.backups_failed,
+            'restarts': self.restarts,
+            'last_backup_at': self.last_backup_at.isoformat() if self.last_backup_at else None,
+            'last_backup_file': self.last_backup_path.name if self.last_backup_path else None,
+            'last_duration_ms': round(self.last_duration_ms, 2),
+            'last_db_size_bytes': self.last_db_size,
+            'last_backup_size_bytes': self.last_backup_size,
+            'last_error': self.last_error
+        }
+
+
+__all__ = ["BackupService"]
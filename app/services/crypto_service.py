@@ -9,21 +9,29 @@
 import logging
 import asyncio
 import json
-import aiohttp
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from cachetools import TTLCache
 
+from app.services.http_client import HttpClient
+
 logger = logging.getLogger(__name__)
 
 
 class CryptoService:
     """₿ Сервис криптовалют"""
     
-    def __init__(self, config):
+    # Таймаут одного запроса к CoinGecko (секунды)
+    REQUEST_TIMEOUT = 10.0
+    
+    def __init__(self, config, http: HttpClient = None):
         self.config = config
         self.crypto_config = config.crypto
         
+        # Общий пул соединений (main.py); без него - собственный клиент
+        self._owns_http = http is None
+        self.http = http or HttpClient(getattr(config, 'http', None))
+        
         # Кэш для курсов
         self.price_cache = TTLCache(maxsize=1000, ttl=300)  # 5 минут
         
@@ -117,46 +125,45 @@ class CryptoService:
             url = f"{self.base_url}/search/trending"
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, timeout=10) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        trending_coins = data.get('coins', [])[:limit]
-                        
-                        # Получаем подробную информацию о трендовых монетах
-                        detailed_coins = []
-                        for coin_info in trending_coins:
-                            coin_id = coin_info['item']['id']
-                            coin_data = await self._fetch_coin_data(coin_id)
-                            
-                            if coin_data:
-                                detailed_coins.append({
-                                    'name': coin_data['name'],
-                                    'symbol': coin_data['symbol'].upper(),
-                                    'price': self._format_price(coin_data['current_price']),
-                                    'change_24h': self._format_change(coin_data.get('price_change_percentage_24h', 0)),
-                                    'market_cap_rank': coin_data.get('market_cap_rank', 'N/A'),
-                                    'market_cap': self._format_market_cap(coin_data.get('market_cap', 0))
-                                })
-                        
-                        result = {
-                            'error': False,
-                            'trending_coins': detailed_coins,
-                            'update_time': datetime.now().strftime('%H:%M'),
-                            'source': 'CoinGecko'
-                        }
-                        
-                        # Сохраняем в кэш
-                        self.price_cache[cache_key] = result
-                        return result
+            async with self.http.get(url, headers=headers, timeout=self.REQUEST_TIMEOUT) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    trending_coins = data.get('coins', [])[:limit]
                     
-                    else:
-                        logger.error(f"Ошибка API трендов: {resp.status}")
-                        return {
-                            'error': True,
-                            'message': 'Не удалось получить трендовые криптовалюты'
-                        }
+                    # Получаем подробную информацию о трендовых монетах
+                    detailed_coins = []
+                    for coin_info in trending_coins:
+                        coin_id = coin_info['item']['id']
+                        coin_data = await self._fetch_coin_data(coin_id)
                         
+                        if coin_data:
+                            detailed_coins.append({
+                                'name': coin_data['name'],
+                                'symbol': coin_data['symbol'].upper(),
+                                'price': self._format_price(coin_data['current_price']),
+                                'change_24h': self._format_change(coin_data.get('price_change_percentage_24h', 0)),
+                                'market_cap_rank': coin_data.get('market_cap_rank', 'N/A'),
+                                'market_cap': self._format_market_cap(coin_data.get('market_cap', 0))
+                            })
+                    
+                    result = {
+                        'error': False,
+                        'trending_coins': detailed_coins,
+                        'update_time': datetime.now().strftime('%H:%M'),
+                        'source': 'CoinGecko'
+                    }
+                    
+                    # Сохраняем в кэш
+                    self.price_cache[cache_key] = result
+                    return result
+                
+                else:
+                    logger.error(f"Ошибка API трендов: {resp.status}")
+                    return {
+                        'error': True,
+                        'message': 'Не удалось получить трендовые криптовалюты'
+                    }
+                    
         except Exception as e:
             logger.error(f"❌ Ошибка получения трендовых криптовалют: {e}")
             return {
@@ -180,38 +187,37 @@ class CryptoService:
             
             headers = self._get_headers()
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params, headers=headers, timeout=10) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        
-                        # Извлекаем нужные данные
-                        market_data = data.get('market_data', {})
-                        usd_data = market_data.get('current_price', {}).get('usd')
-                        
-                        if usd_data is None:
-                            return None
-                        
-                        return {
-                            'id': data.get('id'),
-                            'name': data.get('name'),
-                            'symbol': data.get('symbol'),
-                            'current_price': usd_data,
-                            'market_cap': market_data.get('market_cap', {}).get('usd'),
-                            'market_cap_rank': market_data.get('market_cap_rank'),
-                            'total_volume': market_data.get('total_volume', {}).get('usd'),
-                            'price_change_24h': market_data.get('price_change_24h'),
-                            'price_change_percentage_24h': market_data.get('price_change_percentage_24h'),
-                            'circulating_supply': market_data.get('circulating_supply'),
-                            'total_supply': market_data.get('total_supply'),
-                            'ath': market_data.get('ath', {}).get('usd'),
-                            'atl': market_data.get('atl', {}).get('usd'),
-                            'last_updated': market_data.get('last_updated')
-                        }
-                    else:
-                        logger.error(f"Ошибка API монеты: {resp.status}")
+            async with self.http.get(url, params=params, headers=headers, timeout=self.REQUEST_TIMEOUT) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    
+                    # Извлекаем нужные данные
+                    market_data = data.get('market_data', {})
+                    usd_data = market_data.get('current_price', {}).get('usd')
+                    
+                    if usd_data is None:
                         return None
-                        
+                    
+                    return {
+                        'id': data.get('id'),
+                        'name': data.get('name'),
+                        'symbol': data.get('symbol'),
+                        'current_price': usd_data,
+                        'market_cap': market_data.get('market_cap', {}).get('usd'),
+                        'market_cap_rank': market_data.get('market_cap_rank'),
+                        'total_volume': market_data.get('total_volume', {}).get('usd'),
+                        'price_change_24h': market_data.get('price_change_24h'),
+                        'price_change_percentage_24h': market_data.get('price_change_percentage_24h'),
+                        'circulating_supply': market_data.get('circulating_supply'),
+                        'total_supply': market_data.get('total_supply'),
+                        'ath': market_data.get('ath', {}).get('usd'),
+                        'atl': market_data.get('atl', {}).get('usd'),
+                        'last_updated': market_data.get('last_updated')
+                    }
+                else:
+                    logger.error(f"Ошибка API монеты: {resp.status}")
+                    return None
+                    
         except Exception as e:
             logger.error(f"❌ Ошибка получения данных монеты {coin_id}: {e}")
             return None
@@ -435,6 +441,9 @@ class CryptoService:
             # Очищаем кэш
             self.price_cache.clear()
             
+            if self._owns_http:
+                await self.http.close()
+            
             logger.info("₿ Crypto Service закрыт")
             
         except Exception as e:
@@ -447,7 +456,8 @@ class CryptoService:
             'cache_size': len(self.price_cache),
             'popular_coins_count': len(self.popular_coins),
             'api_key_configured': bool(self.crypto_config.coingecko_api_key),
-            'service_enabled': self.crypto_config.enabled
+            'service_enabled': self.crypto_config.enabled,
+            'http': self.http.get_stats()
         }
 
 
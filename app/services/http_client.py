@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+🌐 HTTP CLIENT - общий aiohttp-клиент для внешних API
+
+Раньше AI и крипто-сервисы открывали новую ClientSession на каждый
+запрос: каждый ответ AI и каждый курс начинался с DNS, TCP и TLS. Теперь
+одна сессия на процесс:
+
+• keep-alive пул соединений на хост (limit_per_host) и общий лимит;
+• кэш DNS (dns_ttl секунд);
+• таймаут по умолчанию на запрос и отдельный таймаут подключения,
+  вызов может передать свой timeout.
+
+Сессия создается при первом запросе (или start()) и закрывается в
+main.py при остановке. get_stats() показывает загрузку пула: занятые и
+свободные соединения, новые подключения против переиспользованных,
+ожидания свободного соединения и попадания в кэш DNS.
+
+iter_sse() читает потоковые ответы (Server-Sent Events) построчно - так
+приходят ответы AI API с stream=true.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """🌐 Общая aiohttp-сессия с пулом соединений и метриками"""
+
+    def __init__(self, config=None):
+        self.limit = getattr(config, 'pool_limit', 100)
+        self.limit_per_host = getattr(config, 'pool_per_host', 10)
+        self.dns_ttl = getattr(config, 'dns_ttl', 300)
+        self.keepalive_timeout = getattr(config, 'keepalive_timeout', 30.0)
+        self.connect_timeout = getattr(config, 'connect_timeout', 5.0)
+        self.default_timeout = getattr(config, 'default_timeout', 30.0)
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._lock = asyncio.Lock()
+
+        # Метрики (через TraceConfig aiohttp)
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'pool_waits': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0
+        }
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def start(self):
+        """▶️ Создание сессии и пула соединений"""
+        async with self._lock:
+            if self.started:
+                return
+
+            self._connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True
+            )
+            self._session = aiohttp.ClientSession(
+                connector=self._connector,
+                timeout=aiohttp.ClientTimeout(total=self.default_timeout, connect=self.connect_timeout),
+                trace_configs=[self._trace_config()]
+            )
+            logger.info(f"🌐 HTTP-клиент: пул {self.limit}, на хост {self.limit_per_host}, DNS-кэш {self.dns_ttl}с")
+
+    async def close(self):
+        """🔒 Закрытие сессии и всех соединений пула"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            self._connector = None
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        def counter(key: str):
+            async def handler(session, context, params):
+                self.stats[key] += 1
+            return handler
+
+        trace.on_request_start.append(counter('requests'))
+        trace.on_request_exception.append(counter('errors'))
+        trace.on_connection_create_end.append(counter('connections_created'))
+        trace.on_connection_reuseconn.append(counter('connections_reused'))
+        trace.on_connection_queued_start.append(counter('pool_waits'))
+        trace.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace
+
+    # =================== ЗАПРОСЫ ===================
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs):
+        """📡 Запрос через общий пул: async with client.request(...) as resp
+
+        timeout - полный таймаут запроса в секундах (по умолчанию default_timeout).
+        """
+        if not self.started:
+            await self.start()
+
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, self.connect_timeout))
+
+        try:
+            async with self._session.request(method, url, **kwargs) as response:
+                yield response
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    # =================== МЕТРИКИ ===================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Загрузка пула и счетчики запросов"""
+        stats = dict(self.stats)
+        stats.update({
+            'started': self.started,
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host
+        })
+
+        connector = self._connector
+        if connector is not None and not connector.closed:
+            # Внутренние структуры TCPConnector: занятые и свободные соединения
+            acquired = getattr(connector, '_acquired', ())
+            idle = getattr(connector, '_conns', {})
+            stats['in_use'] = len(acquired)
+            stats['idle'] = sum(len(connections) for connections in idle.values())
+            stats['hosts'] = len(idle) or len(getattr(connector, '_acquired_per_host', {}))
+            stats['utilization'] = round(len(acquired) / self.limit, 3) if self.limit else 0.0
+
+        created = stats['connections_created']
+        reused = stats['connections_reused']
+        stats['reuse_ratio'] = round(reused / (created + reused), 3) if created + reused else 0.0
+        return stats
+
+
+async def iter_sse(response: aiohttp.ClientResponse) -> AsyncIterator[Tuple[str, str]]:
+    """📨 События Server-Sent Events из ответа: (event, data) по мере прихода"""
+    event, data = 'message', []
+    async for raw in response.content:
+        line = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+
+        # Пустая строка завершает событие
+        if not line:
+            if data:
+                yield event, '\n'.join(data)
+            event, data = 'message', []
+            continue
+
+        if line.startswith(':'):
+            continue  # Комментарий / keep-alive
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+        if field == 'event':
+            event = value
+        elif field == 'data':
+            data.append(value)
+
+    if data:
+        yield event, '\n'.join(data)
+
+
+__all__ = ["HttpClient", "iter_sse"]
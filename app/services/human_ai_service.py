@@ -19,6 +19,8 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 
+from app.services.single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 
@@ -178,6 +180,9 @@ class HumanLikeAI:
         self.topic_classifier = TopicClassifier()
         self.response_generator = CasualResponseGenerator()
         
+        # Одинаковые одновременные запросы к OpenAI - один вызов
+        self.flights = SingleFlight("human_ai")
+        
         self._initialize_openai()
         logger.info("🧠 Human-like AI инициализирован")
     
@@ -325,18 +330,7 @@ class HumanLikeAI:
             
             final_prompt = f"{system_prompt}{emotion_context}{topic_context}\n\nОтвечай коротко (1-2 предложения), естественно, в характере персонажа."
             
-            response = await asyncio.to_thread(
-                self.openai_client.chat.completions.create,
-                model=self.config.ai.default_model,
-                messages=[
-                    {"role": "system", "content": final_prompt},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.9,
-                max_tokens=150
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._complete(final_prompt, message, temperature=0.9, max_tokens=150)
             
         except Exception as e:
             logger.error(f"❌ Ошибка OpenAI кастомного персонажа: {e}")
@@ -436,23 +430,31 @@ class HumanLikeAI:
 Тема разговора: {topic}
 Будь живым и эмоциональным, но не слишком навязчивым."""
             
-            response = await asyncio.to_thread(
-                self.openai_client.chat.completions.create,
-                model=self.config.ai.default_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                temperature=0.8,
-                max_tokens=100
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._complete(system_prompt, message, temperature=0.8, max_tokens=100)
             
         except Exception as e:
             logger.error(f"❌ Ошибка OpenAI: {e}")
             return None
     
+    async def _complete(self, system_prompt: str, message: str, temperature: float, max_tokens: int) -> str:
+        """📡 Запрос к OpenAI; одинаковые одновременные запросы ждут один ответ"""
+        key = (system_prompt, message, temperature, max_tokens)
+        return await self.flights.do(key, self._request_openai, system_prompt, message, temperature, max_tokens)
+    
+    async def _request_openai(self, system_prompt: str, message: str, temperature: float, max_tokens: int) -> str:
+        response = await asyncio.to_thread(
+            self.openai_client.chat.completions.create,
+            model=self.config.ai.default_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        
+        return response.choices[0].message.content.strip()
+    
     def _generate_error_response(self) -> str:
         """❌ Ответ при ошибке"""
         error_responses = [
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+🔀 PROVIDER ROUTER - выбор AI-провайдера по задержке и ошибкам
+
+Раньше AIService всегда начинал с OpenAI и переходил к Anthropic только
+после ошибки или полного таймаута (30 секунд): медленный или
+деградировавший провайдер добавлял весь таймаут к каждому ответу.
+Теперь по каждой паре провайдер/модель ведется скользящее окно задержек
+и ошибок, и маршрутизатор:
+
+• ставит первым провайдера с лучшей p95 задержкой с поправкой на долю
+  ошибок (провайдер без статистики идет первым, пока не наберет
+  несколько ответов, - иначе его задержку не узнать);
+• открывает предохранитель (circuit breaker) после N ошибок подряд или
+  высокой доли ошибок в окне: провайдер пропускается cooldown секунд,
+  затем один пробный запрос (half-open) решает, закрыть его или снова
+  открыть;
+• ошибка первого провайдера - сразу запрос к следующему, без ожидания;
+• hedging (по умолчанию выключен: медленный ответ обходится в два
+  запроса к API): если ответа нет дольше p95 задержки провайдера,
+  параллельно уходит запрос к следующему (единственный провайдер -
+  повторный запрос к нему же). Побеждает первый ответ, остальные запросы
+  отменяются.
+
+Запрос, проигравший гонку hedging, не считается ни успехом, ни ошибкой,
+но его время записывается как нижняя оценка задержки - иначе медленный
+провайдер, который всегда проигрывает, так и остался бы неизмеренным.
+Статистика стареет (window_seconds), и провайдер без свежих данных снова
+пробуется первым.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Deque, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHealth:
+    """📈 Скользящее окно задержек и ошибок + предохранитель"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: int = 50, window_seconds: float = 300.0, failure_threshold: int = 3,
+                 error_rate_threshold: float = 0.5, min_samples: int = 10, cooldown: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window_seconds = window_seconds
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.clock = clock
+
+        self._samples: Deque[Tuple[float, Optional[float], bool]] = deque(maxlen=window)  # (время, задержка, успех)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        # Метрики
+        self.requests = 0
+        self.failures = 0
+        self.opened = 0
+
+    def _recent(self) -> List[Tuple[float, float, bool]]:
+        horizon = self.clock() - self.window_seconds
+        return [sample for sample in self._samples if sample[0] >= horizon]
+
+    # =================== ПРЕДОХРАНИТЕЛЬ ===================
+
+    def available(self) -> bool:
+        """🚦 Можно ли отправить запрос (в half-open - только один пробный)"""
+        if self.state == self.OPEN:
+            if self.clock() - self._opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            return not self._probe_in_flight
+        return True
+
+    def acquire(self):
+        """▶️ Запрос отправлен (в half-open он становится пробным)"""
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def release(self):
+        """⏹️ Запрос отменен - пробный запрос можно отправить заново"""
+        self._probe_in_flight = False
+
+    def record_slow(self, latency: float):
+        """🐢 Запрос отменен после latency секунд: задержка не меньше этой"""
+        self.requests += 1
+        self._samples.append((self.clock(), latency, True))
+        self._probe_in_flight = False
+
+    def record(self, latency: Optional[float], ok: bool):
+        """📝 Результат запроса (latency=None - только для предохранителя)"""
+        self.requests += 1
+        self._samples.append((self.clock(), latency, ok))
+        self._probe_in_flight = False
+
+        if ok:
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.info("🔀 Предохранитель закрыт: провайдер снова отвечает")
+            self.state = self.CLOSED
+            return
+
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self._should_open():
+            self._open()
+
+    def _should_open(self) -> bool:
+        if self.state != self.CLOSED:
+            return False
+        if self.consecutive_failures >= self.failure_threshold:
+            return True
+        recent = self._recent()
+        return len(recent) >= self.min_samples and self.error_rate(recent) >= self.error_rate_threshold
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
+
+    # =================== СТАТИСТИКА ===================
+
+    def sample_count(self) -> int:
+        return len(self._recent())
+
+    def error_rate(self, recent: List[Tuple[float, float, bool]] = None) -> float:
+        recent = self._recent() if recent is None else recent
+        if not recent:
+            return 0.0
+        return sum(1 for _, _, ok in recent if not ok) / len(recent)
+
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        """⏱️ Квантиль задержки успешных запросов в окне (None - нет данных)"""
+        latencies = sorted(latency for _, latency, ok in self._recent() if ok and latency is not None)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(quantile * len(latencies)))
+        return latencies[index]
+
+    def score(self) -> Optional[float]:
+        """🏁 Чем меньше, тем лучше: p95 с поправкой на долю ошибок"""
+        p95 = self.latency_quantile(0.95)
+        if p95 is None:
+            return None
+        return p95 * (1.0 + 4.0 * self.error_rate())
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50 = self.latency_quantile(0.5)
+        p95 = self.latency_quantile(0.95)
+        return {
+            'state': self.state,
+            'requests': self.requests,
+            'failures': self.failures,
+            'error_rate': round(self.error_rate(), 3),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'opened': self.opened
+        }
+
+
+class Provider:
+    """🤖 Провайдер и модель: вызов + здоровье"""
+
+    def __init__(self, name: str, model: str, call: Callable[[str], Awaitable[Optional[str]]],
+                 health: ProviderHealth, stream: Callable = None):
+        self.name = name
+        self.model = model
+        self.call = call
+        self.stream = stream
+        self.health = health
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    def __repr__(self) -> str:
+        return f"Provider({self.key}, {self.health.state})"
+
+
+class ProviderRouter:
+    """🔀 Порядок провайдеров, предохранители, hedging и мгновенный failover"""
+
+    # Сколько свежих ответов нужно, чтобы задержка провайдера учитывалась
+    MIN_LATENCY_SAMPLES = 5
+
+    def __init__(self, providers: List[Provider], hedging: bool = False,
+                 hedge_min_delay: float = 1.0, hedge_max_delay: float = 10.0):
+        self.providers = providers
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+
+        # Метрики
+        self.stats = {
+            'requests': 0,
+            'failovers': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+            'rejected': 0,
+            'failed': 0
+        }
+
+    # =================== ВЫБОР ===================
+
+    def ranked(self) -> List[Provider]:
+        """🏁 Доступные провайдеры, лучший первым"""
+        available = [provider for provider in self.providers if provider.health.available()]
+
+        def rank(item):
+            position, provider = item
+            if provider.health.sample_count() < self.MIN_LATENCY_SAMPLES:
+                return (0.0, position)
+            score = provider.health.score()
+            return (score if score is not None else float('inf'), position)
+
+        ordered = sorted(enumerate(available), key=rank)
+        return [provider for _, provider in ordered]
+
+    def hedge_delay(self, provider: Provider) -> float:
+        """⏳ Сколько ждать ответа, прежде чем отправить hedge-запрос"""
+        p95 = provider.health.latency_quantile(0.95)
+        if p95 is None or provider.health.sample_count() < self.MIN_LATENCY_SAMPLES:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p95))
+
+    # =================== ЗАПРОСЫ ===================
+
+    async def call(self, prompt: str) -> Optional[str]:
+        """📡 Ответ первого успешного провайдера (None - все недоступны или ошиблись)"""
+        self.stats['requests'] += 1
+        candidates = self.ranked()
+        if not candidates:
+            self.stats['rejected'] += 1
+            logger.warning("🔀 Все AI-провайдеры отключены предохранителями")
+            return None
+
+        queue = list(candidates)
+        primary = queue.pop(0)
+        pending: Dict[asyncio.Task, Tuple[Provider, float, bool]] = {}
+        hedged = False
+        won = False
+        started = time.monotonic()
+
+        def launch(provider: Provider, hedge: bool = False):
+            provider.health.acquire()
+            task = asyncio.ensure_future(provider.call(prompt))
+            pending[task] = (provider, time.monotonic(), hedge)
+
+        launch(primary)
+        try:
+            while pending:
+                timeout = None
+                hedge_target = queue[0] if queue else (primary if len(candidates) == 1 else None)
+                if self.hedging and not hedged and hedge_target is not None and hedge_target.health.available():
+                    timeout = max(0.0, self.hedge_delay(primary) - (time.monotonic() - started))
+
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Первый провайдер отвечает дольше обычного - параллельный запрос
+                    hedged = True
+                    self.stats['hedges'] += 1
+                    launch(queue.pop(0) if queue else hedge_target, hedge=True)
+                    logger.debug(f"🔀 Hedge-запрос: {hedge_target.key} (ждем {primary.key})")
+                    continue
+
+                for task in done:
+                    provider, sent_at, hedge = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.error(f"❌ Ошибка провайдера {provider.key}: {e}")
+                        result = None
+                    provider.health.record(time.monotonic() - sent_at, bool(result))
+
+                    if result:
+                        won = True
+                        if hedge:
+                            self.stats['hedge_wins'] += 1
+                        return result
+
+                # Ошибка и ждать больше некого - сразу следующий провайдер
+                if not pending and queue:
+                    self.stats['failovers'] += 1
+                    launch(queue.pop(0))
+
+            self.stats['failed'] += 1
+            return None
+
+        finally:
+            now = time.monotonic()
+            for task, (provider, sent_at, _) in pending.items():
+                task.cancel()
+                if won:
+                    provider.health.record_slow(now - sent_at)
+                else:
+                    provider.health.release()
+            if pending:
+                # Дожидаемся отмены: соединения закрываются сразу, а ошибки
+                # отмененных запросов не всплывают как "never retrieved"
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Маршрутизация и здоровье провайдеров"""
+        stats = dict(self.stats)
+        stats['hedging'] = self.hedging
+        stats['providers'] = {provider.key: provider.health.get_stats() for provider in self.providers}
+        return stats
+
+
+__all__ = ["ProviderRouter", "Provider", "ProviderHealth"]
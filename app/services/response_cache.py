@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+🗃️ RESPONSE CACHE - кэш ответов AI по нормализованному промпту
+
+Раньше ключом были первые 100 символов промпта: два разных длинных
+вопроса с одинаковым началом получали один ответ, а "Привет!" и
+"привет 👋" - два разных запроса к API. Теперь:
+
+• ключ - sha256 всего нормализованного промпта (регистр, ё/е, эмодзи,
+  знаки препинания по краям слов не важны) вместе с контекстом: персонаж,
+  тип пользователя, история диалога и модель (namespace);
+• размер ограничен байтами (max_bytes), а не числом записей: первыми
+  вытесняются давно не использованные ответы, каждая запись живет ttl;
+• похожие запросы (similarity > 0): MinHash по символьным 3-граммам и
+  LSH-корзины находят кандидатов с тем же контекстом, точное сходство
+  Жаккара проверяется перед ответом из кэша;
+• persist: новые записи пачками пишутся в таблицу ai_response_cache
+  (migrations/0009), при запуске неистекшие загружаются обратно.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Эмодзи, модификаторы, служебные символы - не меняют смысл вопроса
+_DROP_CATEGORIES = {'So', 'Sk', 'Cf', 'Cc', 'Mn', 'Me'}
+# Знаки препинания по краям слов ("привет!!!", "«да»"); - и + остаются: "-5", "c++"
+_EDGE_PUNCTUATION = "!\"#$%&'(),./:;<=>?@[\\]^_`{|}~«»„“”‘’…—–¡¿"
+
+
+def normalize_prompt(text: str) -> str:
+    """🧽 Нормализация промпта для ключа кэша"""
+    text = unicodedata.normalize('NFKC', text).casefold().replace('ё', 'е')
+    text = ''.join(' ' if unicodedata.category(ch) in _DROP_CATEGORIES else ch for ch in text)
+    words = (word.strip(_EDGE_PUNCTUATION) for word in text.split())
+    return ' '.join(word for word in words if word)
+
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """🔢 MinHash-подпись множества 3-грамм и разбиение на LSH-корзины
+
+    Хеши детерминированы (crc32 и фиксированные коэффициенты), поэтому
+    подписи совпадают между процессами и перезапусками.
+    """
+
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, permutations: int = 32, bands: int = 8):
+        self.bands = bands
+        self.rows = permutations // bands
+        # Коэффициенты a*x + b из фиксированного генератора
+        state = 0x9E3779B97F4A7C15
+        self._coefficients = []
+        for _ in range(self.rows * bands):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = (state >> 3) % self.PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            b = (state >> 3) % self.PRIME
+            self._coefficients.append((a, b))
+
+    def signature(self, shingles: Set[str]) -> Tuple[int, ...]:
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+        prime = self.PRIME
+        return tuple(min((a * h + b) % prime for h in hashes) for a, b in self._coefficients)
+
+    def buckets(self, scope: str, signature: Tuple[int, ...]) -> List[Tuple]:
+        rows = self.rows
+        return [(scope, band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """🔑 Ключ записи: хеш промпта с контекстом, хеш контекста, нормализованный промпт"""
+    digest: str
+    scope: str
+    prompt: str
+
+
+@dataclass
+class _Entry:
+    key: CacheKey
+    response: str
+    expires_at: float
+    size: int
+    buckets: Optional[List[Tuple]] = None
+
+
+class ResponseCache:
+    """🗃️ Кэш ответов AI: нормализованные ключи, лимит по байтам, похожие запросы"""
+
+    # Учет памяти записи сверх текста ответа и промпта (объекты, индекс)
+    ENTRY_OVERHEAD = 256
+    # Сброс новых записей в БД: по таймеру или при накоплении
+    FLUSH_INTERVAL = 30.0
+    FLUSH_THRESHOLD = 100
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, ttl: float = 3600.0,
+                 similarity: float = 0.0, namespace: str = ""):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self.namespace = namespace
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+
+        # LSH-индекс похожих промптов (только при similarity > 0)
+        self._hasher = MinHasher() if similarity > 0 else None
+        self._buckets: Dict[Tuple, Set[str]] = {}
+
+        # Сохранение в БД
+        self.db = None
+        self._pending: Dict[str, _Entry] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Метрики
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # =================== КЛЮЧИ ===================
+
+    def key(self, prompt: str, context: Dict = None) -> CacheKey:
+        """🔑 Ключ для промпта и контекста"""
+        normalized = normalize_prompt(prompt)
+        scope_source = json.dumps(
+            [self.namespace, context or {}], sort_keys=True, ensure_ascii=False, default=str
+        )
+        scope = hashlib.sha256(scope_source.encode('utf-8')).hexdigest()[:32]
+        digest = hashlib.sha256(f"{scope}\x1f{normalized}".encode('utf-8')).hexdigest()
+        return CacheKey(digest, scope, normalized)
+
+    # =================== ЧТЕНИЕ И ЗАПИСЬ ===================
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """📋 Ответ из кэша: точное совпадение, затем похожий промпт"""
+        now = time.time()
+
+        entry = self._live(key.digest, now)
+        if entry is not None:
+            self.hits += 1
+            return entry.response
+
+        if self._hasher is not None and key.prompt:
+            entry = self._nearest(key, now)
+            if entry is not None:
+                self.near_hits += 1
+                return entry.response
+
+        self.misses += 1
+        return None
+
+    def put(self, key: CacheKey, response: str, expires_at: float = None, persist: bool = True):
+        """💾 Запись ответа; старые записи вытесняются до лимита по байтам"""
+        size = len(key.prompt.encode('utf-8')) + len(response.encode('utf-8')) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        self._remove(key.digest)
+
+        entry = _Entry(key, response, expires_at or time.time() + self.ttl, size)
+        if self._hasher is not None and key.prompt:
+            entry.buckets = self._hasher.buckets(key.scope, self._hasher.signature(_shingles(key.prompt)))
+            for bucket in entry.buckets:
+                self._buckets.setdefault(bucket, set()).add(key.digest)
+
+        self._entries[key.digest] = entry
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            digest = next(iter(self._entries))
+            self._remove(digest)
+            self.evictions += 1
+
+        if persist and self.db is not None:
+            self._pending[key.digest] = entry
+            if len(self._pending) >= self.FLUSH_THRESHOLD:
+                asyncio.ensure_future(self.flush())
+
+    def _live(self, digest: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._remove(digest)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(digest)
+        return entry
+
+    def _nearest(self, key: CacheKey, now: float) -> Optional[_Entry]:
+        """🔍 Самый похожий промпт с тем же контекстом не ниже порога similarity"""
+        candidates = set()
+        for bucket in self._hasher.buckets(key.scope, self._hasher.signature(_shingles(key.prompt))):
+            candidates |= self._buckets.get(bucket, set())
+        if not candidates:
+            return None
+
+        shingles = _shingles(key.prompt)
+        best, best_score = None, self.similarity
+        for digest in candidates:
+            entry = self._entries.get(digest)
+            if entry is None:
+                continue
+            score = _jaccard(shingles, _shingles(entry.key.prompt))
+            if score >= best_score:
+                best, best_score = digest, score
+
+        return self._live(best, now) if best else None
+
+    def _remove(self, digest: str):
+        entry = self._entries.pop(digest, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for bucket in entry.buckets or ():
+            digests = self._buckets.get(bucket)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._buckets[bucket]
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+
+    # =================== СОХРАНЕНИЕ В БД ===================
+
+    async def start(self, db_service):
+        """▶️ Загрузка сохраненных записей и периодический сброс новых"""
+        self.db = db_service
+        await self._load()
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """🛑 Остановка сброса и запись накопленного"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self.db is not None:
+            await self.flush()
+
+    async def _load(self):
+        """📥 Неистекшие записи, свежие первыми, пока помещаются в max_bytes"""
+        try:
+            now = time.time()
+            await self.db.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (now,))
+            rows = await self.db.fetch_all(
+                "SELECT cache_key, scope, prompt, response, expires_at FROM ai_response_cache "
+                "ORDER BY expires_at DESC"
+            )
+
+            loaded = 0
+            # Вставка от старых к свежим: свежие оказываются в конце очереди вытеснения
+            for row in reversed(rows):
+                key = CacheKey(row['cache_key'], row['scope'], row['prompt'])
+                self.put(key, row['response'], expires_at=row['expires_at'], persist=False)
+                loaded += 1
+
+            if loaded:
+                logger.info(f"🗃️ Кэш ответов AI: загружено {len(self)} из {loaded} записей")
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки кэша ответов AI: {e}")
+
+    async def _flush_loop(self):
+        """🔁 Периодический сброс новых записей"""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """💾 Запись новых ответов одной транзакцией"""
+        async with self._flush_lock:
+            if not self._pending or self.db is None:
+                return 0
+
+            pending, self._pending = self._pending, {}
+            rows = [
+                (entry.key.digest, entry.key.scope, entry.key.prompt, entry.response, entry.expires_at)
+                for entry in pending.values()
+            ]
+
+            try:
+                async with self.db.transaction():
+                    await self.db.execute_many("""
+                        INSERT OR REPLACE INTO ai_response_cache
+                        (cache_key, scope, prompt, response, expires_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, rows)
+                    await self.db.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (time.time(),))
+                return len(rows)
+
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения кэша ответов AI: {e}")
+                for digest, entry in pending.items():
+                    self._pending.setdefault(digest, entry)
+                return 0
+
+    # =================== МЕТРИКИ ===================
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Заполнение и попадания"""
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'near_hits': self.near_hits,
+            'misses': self.misses,
+            'hit_ratio': round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'pending_writes': len(self._pending),
+            'persistent': self.db is not None
+        }
+
+
+__all__ = ["ResponseCache", "CacheKey", "normalize_prompt"]
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+🧩 SHARDING - несколько процессов-воркеров с привязкой чатов
+
+WORKER_PROCESSES > 1 запускает бота так:
+
+• процесс-маршрутизатор получает обновления (polling или webhook) и
+  отправляет каждое в воркер по chat_id - все обновления чата всегда
+  попадают в один и тот же процесс;
+• каждый воркер - полный набор модулей (AI, триггеры, карма, персонажи)
+  со своим Dispatcher, обновления подаются в него через feed_raw_update;
+• общие данные лежат в БД. Кэши, привязанные к чату (карма, персонажи,
+  очереди чатов), согласованы сами - чат живет в одном процессе.
+  Глобальные данные (пользовательские триггеры, медиа) после изменения
+  объявляются через InvalidationBus: маршрутизатор рассылает сообщение
+  остальным воркерам, и они перечитывают запись из БД.
+
+Фоновые задачи в единственном экземпляре (резервные копии, архив,
+обслуживание БД, уведомление админов) выполняет воркер 0. Упавший
+воркер перезапускается с новой очередью: старая могла остаться
+заблокированной умершим процессом, обновления из нее теряются.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(key, shards: int) -> int:
+    """🎯 Номер воркера для чата (одинаковый во всех процессах и после перезапуска)"""
+    if key is None:
+        return 0
+    return int(key) % shards
+
+
+class InvalidationBus:
+    """📣 Сообщения "данные изменились" между воркерами
+
+    Модуль после записи вызывает publish(тема, ключ); в остальных
+    воркерах вызываются подписчики темы: callback(ключ). В одном
+    процессе publish ничего не делает - кэш уже актуален.
+    """
+
+    def __init__(self, send: Optional[Callable[[str, Any], None]] = None):
+        self._send = send
+        self._subscribers: Dict[str, List[Callable[[Any], Awaitable]]] = {}
+        self.published = 0
+        self.received = 0
+
+    def subscribe(self, topic: str, callback: Callable[[Any], Awaitable]):
+        self._subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic: str, key: Any = None):
+        """📤 Объявление изменения остальным воркерам"""
+        if self._send is None:
+            return
+        self._send(topic, key)
+        self.published += 1
+
+    async def deliver(self, topic: str, key: Any = None):
+        """📥 Изменение из другого воркера"""
+        self.received += 1
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                await callback(key)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обновления кэша {topic}/{key}: {e}")
+
+
+# =================== МАРШРУТИЗАТОР ===================
+
+class ShardRouter:
+    """🧩 Процессы-воркеры и доставка обновлений по chat_id"""
+
+    MONITOR_INTERVAL = 5.0
+
+    def __init__(self, workers: int, target: Callable, max_queue: int = 1000, put_timeout: float = 1.0):
+        """target(index, count, inbox, outbox) - точка входа процесса-воркера"""
+        self.workers = max(1, workers)
+        self.target = target
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+
+        # spawn: воркер стартует с чистого интерпретатора на всех ОС
+        self._ctx = multiprocessing.get_context('spawn')
+        self._inboxes = [self._ctx.Queue(maxsize=max_queue) for _ in range(self.workers)]
+        self._outbox = self._ctx.Queue()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * self.workers
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: List[asyncio.Event] = []
+        self._reader: Optional[threading.Thread] = None
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.update_types: set = set()
+        self._worker_stats: Dict[int, Dict[str, Any]] = {}
+
+        # Метрики
+        self.routed = [0] * self.workers
+        self.dropped = 0
+        self.broadcasts = 0
+        self.restarts = 0
+
+    def start(self):
+        """▶️ Запуск воркеров"""
+        self._loop = asyncio.get_running_loop()
+        self._ready = [asyncio.Event() for _ in range(self.workers)]
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        self._reader = threading.Thread(target=self._read_outbox, name="shard-outbox", daemon=True)
+        self._reader.start()
+        self._monitor_task = asyncio.create_task(self._monitor())
+        logger.info(f"🧩 Запущено воркеров: {self.workers}")
+
+    def _spawn(self, index: int):
+        process = self._ctx.Process(
+            target=self.target,
+            args=(index, self.workers, self._inboxes[index], self._outbox),
+            name=f"bot-shard-{index}"
+        )
+        process.start()
+        self._processes[index] = process
+
+    async def wait_ready(self, timeout: float = 120.0) -> List[str]:
+        """⏳ Ожидание инициализации воркеров; возвращает нужные им типы обновлений"""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(event.wait() for event in self._ready)), timeout)
+        except asyncio.TimeoutError:
+            ready = sum(event.is_set() for event in self._ready)
+            logger.warning(f"⚠️ Готово воркеров: {ready}/{self.workers} за {timeout}с")
+        return sorted(self.update_types)
+
+    # =================== ДОСТАВКА ===================
+
+    async def route(self, key, raw: Dict[str, Any]) -> bool:
+        """📨 Обновление в воркер чата; False - очередь воркера переполнена"""
+        index = shard_of(key, self.workers)
+        if await self._put(index, ('update', raw)):
+            self.routed[index] += 1
+            return True
+
+        self.dropped += 1
+        logger.warning(f"⚠️ Воркер {index} не успевает, обновление отброшено (всего: {self.dropped})")
+        return False
+
+    async def _put(self, index: int, item) -> bool:
+        inbox = self._inboxes[index]
+        try:
+            inbox.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        # Обратное давление: ждем место в очереди в потоке, не блокируя цикл
+        try:
+            await asyncio.to_thread(inbox.put, item, True, self.put_timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def _read_outbox(self):
+        """🧵 Сообщения воркеров (в отдельном потоке: Queue.get блокирующий)"""
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                break
+            self._loop.call_soon_threadsafe(self._on_message, *message)
+
+    def _on_message(self, kind: str, index: int, payload):
+        if kind == 'ready':
+            self.update_types.update(payload)
+            self._ready[index].set()
+            logger.info(f"🧩 Воркер {index} готов")
+        elif kind == 'invalidate':
+            # Остальным воркерам: перечитать измененные данные
+            self.broadcasts += 1
+            for other in range(self.workers):
+                if other != index:
+                    asyncio.create_task(self._put(other, ('invalidate', payload)))
+        elif kind == 'stats':
+            self._worker_stats[index] = payload
+
+    async def _monitor(self):
+        """🩺 Перезапуск упавших воркеров"""
+        while not self._stopping:
+            await asyncio.sleep(self.MONITOR_INTERVAL)
+            for index, process in enumerate(self._processes):
+                if self._stopping or process is None or process.is_alive():
+                    continue
+                self.restarts += 1
+                logger.error(f"💥 Воркер {index} завершился (код {process.exitcode}), перезапуск")
+                self._ready[index].clear()
+                self._inboxes[index] = self._ctx.Queue(maxsize=self.max_queue)
+                self._spawn(index)
+
+    # =================== ОСТАНОВКА ===================
+
+    async def stop(self, timeout: float = 30.0):
+        """⏹️ Остановка: воркеры дорабатывают принятые обновления и закрывают БД"""
+        if self._stopping:
+            return
+        self._stopping = True
+
+        if self._monitor_task:
+            self._monitor_task.cancel()
+
+        for index in range(self.workers):
+            if not await self._put(index, ('stop', None)):
+                logger.warning(f"⚠️ Воркер {index} не принял команду остановки")
+
+        deadline = time.monotonic() + timeout
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"⚠️ Воркер {index} не остановился за {timeout}с - завершаем")
+                process.terminate()
+                await asyncio.to_thread(process.join, 5.0)
+
+        self._outbox.put(None)
+        logger.info("🧩 Воркеры остановлены")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Состояние воркеров"""
+        return {
+            'workers': self.workers,
+            'alive': sum(1 for process in self._processes if process is not None and process.is_alive()),
+            'ready': sum(event.is_set() for event in self._ready),
+            'routed': list(self.routed),
+            'dropped': self.dropped,
+            'broadcasts': self.broadcasts,
+            'restarts': self.restarts,
+            'shards': {index: self._worker_stats.get(index, {}) for index in range(self.workers)}
+        }
+
+
+class ShardRoutingMiddleware(BaseMiddleware):
+    """🧩 Middleware маршрутизатора: обновление уходит в воркер своего чата
+
+    Обработчиков в Dispatcher маршрутизатора нет - обработку выполняет
+    воркер, поэтому handler не вызывается.
+    """
+
+    def __init__(self, router: ShardRouter):
+        self.router = router
+
+    async def __call__(self, handler, event: Update, data: Dict[str, Any]):
+        chat = data.get('event_chat')
+        user = data.get('event_from_user')
+        key = chat.id if chat else (user.id if user else None)
+        await self.router.route(key, event.model_dump(mode='json', by_alias=True, exclude_none=True))
+
+
+# =================== ВОРКЕР ===================
+
+class ShardWorker:
+    """🧩 Сторона воркера: очередь обновлений от маршрутизатора -> Dispatcher"""
+
+    STATS_INTERVAL = 10.0
+
+    def __init__(self, index: int, count: int, inbox, outbox):
+        self.index = index
+        self.count = count
+        self._inbox = inbox
+        self._outbox = outbox
+        self.bus = InvalidationBus(self._publish)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._tasks: set = set()
+        self._dp: Optional[Dispatcher] = None
+        self._bot: Optional[Bot] = None
+        self._modules: Dict[str, Any] = {}
+
+        # Метрики
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def primary(self) -> bool:
+        """👑 Воркер фоновых задач в единственном экземпляре"""
+        return self.index == 0
+
+    def _publish(self, topic: str, key: Any):
+        self._outbox.put(('invalidate', self.index, (topic, key)))
+
+    async def run(self, dp: Dispatcher, bot: Bot, modules: Dict[str, Any] = None, drain_timeout: float = 30.0):
+        """▶️ Обработка обновлений до команды остановки"""
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._dp = dp
+        self._bot = bot
+        self._modules = modules or {}
+
+        reader = threading.Thread(target=self._read_inbox, name=f"shard-{self.index}-inbox", daemon=True)
+        reader.start()
+        self._outbox.put(('ready', self.index, dp.resolve_used_update_types()))
+        stats_task = asyncio.create_task(self._report_stats())
+
+        try:
+            await self._stopped.wait()
+        finally:
+            stats_task.cancel()
+            if self._tasks:
+                logger.info(f"⏳ Воркер {self.index}: ожидание {len(self._tasks)} обновлений...")
+                await asyncio.wait(self._tasks, timeout=drain_timeout)
+
+    def _read_inbox(self):
+        """🧵 Очередь от маршрутизатора (в отдельном потоке)"""
+        parent = multiprocessing.parent_process()
+        while True:
+            try:
+                item = self._inbox.get(timeout=1.0)
+            except queue.Empty:
+                if parent is None or parent.is_alive():
+                    continue
+                # Маршрутизатор умер - останавливаемся сами
+                item = ('stop', None)
+
+            self._loop.call_soon_threadsafe(self._on_message, *item)
+            if item[0] == 'stop':
+                break
+
+    def _on_message(self, kind: str, payload):
+        if kind == 'update':
+            task = asyncio.create_task(self._feed(payload))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif kind == 'invalidate':
+            asyncio.create_task(self.bus.deliver(*payload))
+        elif kind == 'stop':
+            self._stopped.set()
+
+    async def _feed(self, raw: Dict[str, Any]):
+        try:
+            await self._dp.feed_raw_update(self._bot, raw)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Воркер {self.index}: ошибка обработки обновления: {e}")
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self.STATS_INTERVAL)
+            self._outbox.put(('stats', self.index, self.get_stats()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Метрики воркера"""
+        stats = {
+            'processed': self.processed,
+            'failed': self.failed,
+            'in_flight': len(self._tasks),
+            'invalidations_sent': self.bus.published,
+            'invalidations_received': self.bus.received
+        }
+
+        scheduler = self._modules.get('chat_scheduler')
+        if scheduler:
+            stats['scheduler'] = {
+                key: value for key, value in scheduler.get_stats(top=0).items() if key != 'chats'
+            }
+        return stats
+
+
+__all__ = ["ShardRouter", "ShardRoutingMiddleware", "ShardWorker", "InvalidationBus", "shard_of"]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+🛬 SINGLE FLIGHT - один запрос к API на одинаковые одновременные вызовы
+
+Когда мем разлетается по группе, десятки людей за секунды пишут один и
+тот же текст: все промахиваются мимо кэша ответов и каждый отправляет
+свой одинаковый запрос к AI. SingleFlight объединяет такие вызовы:
+
+• do(key, func, ...) - первый вызов с ключом запускает func, остальные,
+  пришедшие до ее завершения, ждут тот же результат (или ту же ошибку);
+• stream(key, factory, ...) - то же для потоковых ответов: поток
+  читается один раз, каждый подписчик получает все части с начала и
+  дальше по мере прихода.
+
+Запрос выполняется отдельной задачей: отмена одного ожидающего (например,
+обработчика сообщения) не отменяет его для остальных, а результат
+успевает попасть в кэш. После завершения ключ освобождается - следующий
+вызов идет уже в кэш или новым запросом.
+"""
+
+import asyncio
+import logging
+from typing import Dict, Any, Hashable, Callable, Awaitable, AsyncIterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Broadcast:
+    """📡 Части одного потока для нескольких подписчиков"""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def pump(self, source: AsyncIterator[Any]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._wake()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._wake()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class SingleFlight:
+    """🛬 Объединение одновременных вызовов с одинаковым ключом"""
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+
+        # Метрики
+        self.calls = 0       # Запросы, выполненные на самом деле
+        self.coalesced = 0   # Вызовы, получившие чужой результат
+
+    def __len__(self) -> int:
+        return len(self._calls) + len(self._streams)
+
+    def _track(self, registry: Dict[Hashable, Any], key: Hashable, value: Any, task: asyncio.Task):
+        registry[key] = value
+        self.calls += 1
+
+        def release(_):
+            if registry.get(key) is value:
+                del registry[key]
+
+        task.add_done_callback(release)
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """🎯 Результат func(*args, **kwargs), общий для одновременных вызовов с key"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._track(self._calls, key, task, task)
+        else:
+            self.coalesced += 1
+            logger.debug(f"🛬 {self.name}: вызов присоединен к выполняющемуся запросу")
+
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, factory: Callable[..., AsyncIterator[Any]],
+                     *args, **kwargs) -> AsyncIterator[Any]:
+        """🌊 Части потока factory(*args, **kwargs), общего для одновременных подписчиков"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            task = asyncio.ensure_future(broadcast.pump(factory(*args, **kwargs)))
+            self._track(self._streams, key, broadcast, task)
+        else:
+            self.coalesced += 1
+            logger.debug(f"🛬 {self.name}: подписка на выполняющийся поток")
+
+        async for chunk in broadcast.follow():
+            yield chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Сколько вызовов объединено"""
+        total = self.calls + self.coalesced
+        return {
+            'in_flight': len(self),
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'coalesce_ratio': round(self.coalesced / total, 3) if total else 0.0
+        }
+
+
+__all__ = ["SingleFlight"]
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+🌐 WEBHOOK SERVICE - прием обновлений Telegram через aiohttp
+
+Режим BOT_MODE=webhook вместо long polling. Поднимает aiohttp-приложение:
+
+• POST {WEBHOOK_PATH} - обновления Telegram (обработчик aiogram);
+• GET /health - состояние для балансировщика (503 во время остановки).
+
+Обновление обрабатывается внутри HTTP-запроса: Telegram получает ответ
+после обработчика, а незавершенные запросы видны серверу, поэтому при
+остановке он перестает принимать новые обновления, ждет текущие (не
+дольше drain_timeout) и только потом закрывается. Недоставленное
+Telegram повторит - в том числе на другой воркер за балансировщиком.
+
+Локальная проверка без Telegram (WEBHOOK_URL пустой):
+    curl -X POST http://localhost:8080/webhook \\
+         -H 'Content-Type: application/json' \\
+         -H 'X-Telegram-Bot-Api-Secret-Token: <WEBHOOK_SECRET>' \\
+         -d @update.json
+"""
+
+import asyncio
+import logging
+import signal
+import time
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """🌐 aiohttp-сервер для webhook aiogram с проверкой здоровья и мягкой остановкой"""
+
+    def __init__(self, config, dispatcher: Dispatcher, bot: Bot, modules: Dict[str, Any] = None,
+                 allowed_updates: Optional[List[str]] = None):
+        self.config = config
+        self.dp = dispatcher
+        self.bot = bot
+        self.modules = modules or {}
+        # По умолчанию - типы обновлений, на которые есть обработчики
+        self.allowed_updates = allowed_updates
+
+        self.app: Optional[web.Application] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._stopped = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        self._started_at = time.monotonic()
+
+        # Метрики
+        self.in_flight = 0
+        self.handled = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    # =================== ПРИЛОЖЕНИЕ ===================
+
+    def build_app(self) -> web.Application:
+        """🏗️ aiohttp-приложение: webhook + /health"""
+        app = web.Application(middlewares=[self._track_requests])
+
+        # Обработчик aiogram закрывает сессию бота при остановке приложения -
+        # это делает main.py, поэтому маршрут добавляется без register()
+        handler = SimpleRequestHandler(
+            dispatcher=self.dp,
+            bot=self.bot,
+            handle_in_background=False,
+            secret_token=self.config.secret_token or None
+        )
+        app.router.add_post(self.config.path, handler.handle)
+        app.router.add_get('/health', self.health)
+
+        self.app = app
+        return app
+
+    @web.middleware
+    async def _track_requests(self, request: web.Request, handler):
+        """🧮 Учет запросов webhook: нужен для мягкой остановки"""
+        if request.path != self.config.path:
+            return await handler(request)
+
+        if self._draining:
+            # Telegram повторит обновление позже (или на другом воркере)
+            self.rejected += 1
+            return web.json_response({'status': 'draining'}, status=503)
+
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            response = await handler(request)
+            if response.status < 400:
+                self.handled += 1
+            else:
+                self.failed += 1
+            return response
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            if not self.in_flight:
+                self._idle.set()
+
+    async def health(self, request: web.Request) -> web.Response:
+        """🩺 Состояние воркера"""
+        payload = {
+            'status': 'draining' if self._draining else 'ok',
+            'mode': 'webhook',
+            'uptime_seconds': round(time.monotonic() - self._started_at, 1),
+            'in_flight': self.in_flight,
+            'handled': self.handled,
+            'failed': self.failed,
+            'rejected': self.rejected
+        }
+
+        scheduler = self.modules.get('chat_scheduler')
+        if scheduler:
+            stats = scheduler.get_stats(top=0)
+            payload['scheduler'] = {key: value for key, value in stats.items() if key != 'chats'}
+
+        pipeline = self.modules.get('update_pipeline')
+        if pipeline:
+            payload['background'] = pipeline.get_stats()
+
+        http = self.modules.get('http')
+        if http:
+            payload['http'] = http.get_stats()
+
+        router = self.modules.get('shard_router')
+        if router:
+            payload['workers'] = router.get_stats()
+
+        return web.json_response(payload, status=503 if self._draining else 200)
+
+    # =================== ЗАПУСК И ОСТАНОВКА ===================
+
+    async def start(self):
+        """▶️ Запуск HTTP-сервера и регистрация webhook в Telegram"""
+        if self.app is None:
+            self.build_app()
+
+        self._runner = web.AppRunner(self.app, handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.config.host, self.config.port)
+        await site.start()
+        logger.info(f"🌐 Webhook сервер слушает {self.config.host}:{self.config.port}{self.config.path}")
+
+        if self.config.url:
+            await self.bot.set_webhook(
+                url=self.config.url.rstrip('/') + self.config.path,
+                secret_token=self.config.secret_token or None,
+                max_connections=self.config.max_connections,
+                allowed_updates=self.allowed_updates or self.dp.resolve_used_update_types(),
+                drop_pending_updates=True
+            )
+            logger.info(f"🌐 Webhook зарегистрирован: {self.config.url}")
+        else:
+            logger.info("🌐 WEBHOOK_URL не задан - webhook в Telegram не регистрируется (локальный режим)")
+
+    def request_stop(self):
+        """🛑 Сигнал остановки (из обработчика SIGTERM/SIGINT)"""
+        self._stopped.set()
+
+    async def wait(self):
+        """⏳ Работа до SIGTERM/SIGINT (или request_stop())"""
+        loop = asyncio.get_running_loop()
+        installed = []
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+                installed.append(sig)
+            except (NotImplementedError, RuntimeError):
+                # Windows: остается KeyboardInterrupt
+                pass
+        try:
+            await self._stopped.wait()
+        finally:
+            for sig in installed:
+                loop.remove_signal_handler(sig)
+
+    async def stop(self):
+        """⏹️ Мягкая остановка: новые обновления - 503, текущие дорабатывают"""
+        if self._runner is None:
+            return
+
+        self._draining = True
+        self._stopped.set()
+
+        if self.in_flight:
+            logger.info(f"⏳ Ожидание {self.in_flight} обновлений (до {self.config.drain_timeout}с)...")
+            try:
+                await asyncio.wait_for(self._idle.wait(), self.config.drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Не дождались {self.in_flight} обновлений - Telegram пришлет их повторно")
+
+        await self._runner.cleanup()
+        self._runner = None
+        logger.info("🌐 Webhook сервер остановлен")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Метрики сервера"""
+        return {
+            'draining': self._draining,
+            'in_flight': self.in_flight,
+            'handled': self.handled,
+            'failed': self.failed,
+            'rejected': self.rejected
+        }
+
+
+__all__ = ["WebhookServer"]
@@ -31,16 +31,68 @@ class BotConfig:
     smart_responses: bool = True
     mention_responses: bool = True
     reply_responses: bool = True
+    max_in_flight_updates: int = 8  # Обработчиков одновременно (все чаты вместе)
+    worker_processes: int = 1       # >1 - процессы-воркеры с привязкой чатов
 
 
 @dataclass
 class DatabaseConfig:
     """💾 Конфигурация базы данных"""
     path: str = "data/bot.db"
+    backend: str = "sqlite"              # sqlite или postgres
+    dsn: str = ""                        # Строка подключения PostgreSQL
+    pool_min_size: int = 2               # Пул соединений PostgreSQL
+    pool_max_size: int = 10
     backup_enabled: bool = True
     backup_interval_hours: int = 24
     max_backups: int = 7
+    backup_dir: str = "data/backups"
+    backup_step_pages: int = 256         # Страниц за шаг online backup (между шагами пишет бот)
     wal_mode: bool = True
+    read_pool_size: int = 4              # Соединений только для чтения (0 - читать через писателя)
+    # Отложенная запись логов сообщений (write-behind)
+    write_batch_size: int = 200          # Сброс при накоплении N строк
+    write_flush_interval: float = 1.0    # Сброс не реже чем раз в N секунд
+    write_queue_max_size: int = 10000    # Сверх лимита строки отбрасываются
+    # Помесячный архив chat_logs/messages
+    archive_dir: str = ""                # Пусто - <папка БД>/archive
+    archive_after_days: int = 30         # Полные месяцы старше N дней уходят в архив
+    archive_retention_days: int = 365    # Архивные файлы старше N дней удаляются
+    archive_interval_hours: float = 24.0 # Как часто архивировать (задача обслуживания)
+    # Обслуживание SQLite в тихие минуты
+    maintenance_enabled: bool = True
+    maintenance_check_seconds: float = 60.0   # Как часто замерять поток сообщений
+    maintenance_quiet_rate: float = 10.0      # Тихо, если сообщений в минуту не больше N
+    checkpoint_interval_minutes: float = 30.0 # wal_checkpoint(TRUNCATE)
+    optimize_interval_hours: float = 6.0      # PRAGMA optimize
+    vacuum_interval_hours: float = 24.0       # PRAGMA incremental_vacuum
+    vacuum_step_pages: int = 500              # Страниц за один захват писателя
+    vacuum_min_free_ratio: float = 0.1        # Доля свободных страниц для разового полного VACUUM
+    wal_checkpoint_mb: float = 64.0           # PASSIVE-чекпойнт под нагрузкой, если WAL больше
+
+
+@dataclass
+class WebhookConfig:
+    """🌐 Прием обновлений через webhook (вместо long polling)"""
+    enabled: bool = False                # BOT_MODE=webhook
+    url: str = ""                        # Публичный адрес; пусто - setWebhook не вызывается
+    path: str = "/webhook"
+    host: str = "0.0.0.0"
+    port: int = 8080
+    secret_token: str = ""               # Заголовок X-Telegram-Bot-Api-Secret-Token
+    max_connections: int = 40            # Параллельных запросов от Telegram
+    drain_timeout: float = 30.0          # Сколько ждать текущие запросы при остановке
+
+
+@dataclass
+class HttpConfig:
+    """📡 Общий HTTP-клиент для внешних API (AI, CoinGecko)"""
+    pool_limit: int = 100               # Соединений всего
+    pool_per_host: int = 10             # Соединений на один хост
+    dns_ttl: int = 300                  # Кэш DNS, секунд
+    keepalive_timeout: float = 30.0     # Сколько держать простаивающее соединение
+    connect_timeout: float = 5.0
+    default_timeout: float = 30.0       # Полный таймаут запроса по умолчанию
 
 
 @dataclass
@@ -55,6 +107,23 @@ class AIConfig:
     max_tokens: int = 1024    # Короткие ответы
     context_memory: bool = True
     adaptive_responses: bool = True
+    # Потоковые ответы: первое сообщение сразу, дальше правки не чаще интервала
+    streaming: bool = True
+    stream_edit_interval: float = 1.0        # Личные чаты (лимит Telegram ~1/с)
+    stream_group_edit_interval: float = 3.0  # Группы (лимит Telegram ~20/мин)
+    # Кэш ответов
+    cache_max_mb: float = 8.0        # Лимит памяти кэша
+    cache_ttl: int = 3600            # Секунд жизни ответа
+    cache_similarity: float = 0.0    # Порог сходства похожих запросов (0 - только точные)
+    cache_persist: bool = False      # Хранить кэш в БД между перезапусками
+    # Провайдеры: адреса API (прокси, локальные заглушки), hedging, предохранители
+    openai_url: str = "https://api.openai.com/v1/chat/completions"
+    anthropic_url: str = "https://api.anthropic.com/v1/messages"
+    hedging: bool = False            # Параллельный запрос, если ответа нет дольше p95 (цена - два ответа)
+    hedge_min_delay: float = 1.0     # Не раньше (секунды)
+    hedge_max_delay: float = 10.0    # Не позже; пока задержка провайдера неизвестна
+    breaker_failures: int = 3        # Ошибок подряд до отключения провайдера
+    breaker_cooldown: float = 30.0   # Секунд до пробного запроса
 
 
 @dataclass
@@ -150,6 +219,8 @@ class Config:
     """⚙️ Главная конфигурация v3.0"""
     bot: BotConfig = field(default_factory=BotConfig)
     database: DatabaseConfig = field(default_factory=DatabaseConfig)
+    webhook: WebhookConfig = field(default_factory=WebhookConfig)
+    http: HttpConfig = field(default_factory=HttpConfig)
     ai: AIConfig = field(default_factory=AIConfig)
     crypto: CryptoConfig = field(default_factory=CryptoConfig)
     moderation: ModerationConfig = field(default_factory=ModerationConfig)
@@ -197,11 +268,56 @@ def load_config() -> Config:
     config.bot.smart_responses = os.getenv("SMART_RESPONSES", "true").lower() == "true"
     config.bot.mention_responses = os.getenv("MENTION_RESPONSES", "true").lower() == "true"
     config.bot.reply_responses = os.getenv("REPLY_RESPONSES", "true").lower() == "true"
+    config.bot.max_in_flight_updates = int(os.getenv("MAX_IN_FLIGHT_UPDATES", "8"))
+    config.bot.worker_processes = max(1, int(os.getenv("WORKER_PROCESSES", "1")))
+    
+    # =================== WEBHOOK CONFIG ===================
+    config.webhook.enabled = os.getenv("BOT_MODE", "polling").lower() == "webhook"
+    config.webhook.url = os.getenv("WEBHOOK_URL", "")
+    config.webhook.path = os.getenv("WEBHOOK_PATH", "/webhook")
+    config.webhook.host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    config.webhook.port = int(os.getenv("WEBHOOK_PORT", "8080"))
+    config.webhook.secret_token = os.getenv("WEBHOOK_SECRET", "")
+    config.webhook.max_connections = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    config.webhook.drain_timeout = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+    
+    # =================== HTTP CONFIG ===================
+    config.http.pool_limit = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    config.http.pool_per_host = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+    config.http.dns_ttl = int(os.getenv("HTTP_DNS_TTL", "300"))
+    config.http.keepalive_timeout = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+    config.http.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    config.http.default_timeout = float(os.getenv("HTTP_TIMEOUT", "30"))
     
     # =================== DATABASE CONFIG ===================
     config.database.path = os.getenv("DATABASE_PATH", "data/bot.db")
+    config.database.backend = os.getenv("DB_BACKEND", "sqlite").lower()
+    config.database.dsn = os.getenv("DATABASE_URL", "")
+    config.database.pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    config.database.pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
     config.database.backup_enabled = os.getenv("DB_BACKUP_ENABLED", "true").lower() == "true"
+    config.database.backup_interval_hours = int(os.getenv("DB_BACKUP_INTERVAL_HOURS", "24"))
+    config.database.max_backups = int(os.getenv("DB_MAX_BACKUPS", "7"))
+    config.database.backup_dir = os.getenv("DB_BACKUP_DIR", "data/backups")
+    config.database.backup_step_pages = int(os.getenv("DB_BACKUP_STEP_PAGES", "256"))
     config.database.wal_mode = os.getenv("DB_WAL_MODE", "true").lower() == "true"
+    config.database.read_pool_size = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    config.database.write_batch_size = int(os.getenv("DB_WRITE_BATCH_SIZE", "200"))
+    config.database.write_flush_interval = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "1.0"))
+    config.database.write_queue_max_size = int(os.getenv("DB_WRITE_QUEUE_MAX_SIZE", "10000"))
+    config.database.archive_dir = os.getenv("DB_ARCHIVE_DIR", "")
+    config.database.archive_after_days = int(os.getenv("DB_ARCHIVE_AFTER_DAYS", "30"))
+    config.database.archive_retention_days = int(os.getenv("DB_ARCHIVE_RETENTION_DAYS", "365"))
+    config.database.archive_interval_hours = float(os.getenv("DB_ARCHIVE_INTERVAL_HOURS", "24"))
+    config.database.maintenance_enabled = os.getenv("DB_MAINTENANCE_ENABLED", "true").lower() == "true"
+    config.database.maintenance_check_seconds = float(os.getenv("DB_MAINTENANCE_CHECK_SECONDS", "60"))
+    config.database.maintenance_quiet_rate = float(os.getenv("DB_MAINTENANCE_QUIET_RATE", "10"))
+    config.database.checkpoint_interval_minutes = float(os.getenv("DB_CHECKPOINT_INTERVAL_MINUTES", "30"))
+    config.database.optimize_interval_hours = float(os.getenv("DB_OPTIMIZE_INTERVAL_HOURS", "6"))
+    config.database.vacuum_interval_hours = float(os.getenv("DB_VACUUM_INTERVAL_HOURS", "24"))
+    config.database.vacuum_step_pages = int(os.getenv("DB_VACUUM_STEP_PAGES", "500"))
+    config.database.vacuum_min_free_ratio = float(os.getenv("DB_VACUUM_MIN_FREE_RATIO", "0.1"))
+    config.database.wal_checkpoint_mb = float(os.getenv("DB_WAL_CHECKPOINT_MB", "64"))
     
     # =================== AI CONFIG ===================
     config.ai.openai_api_key = os.getenv("OPENAI_API_KEY", "")
@@ -213,6 +329,20 @@ def load_config() -> Config:
     config.ai.max_tokens = int(os.getenv("AI_MAX_TOKENS", "1024"))
     config.ai.context_memory = os.getenv("AI_CONTEXT_MEMORY", "true").lower() == "true"
     config.ai.adaptive_responses = os.getenv("AI_ADAPTIVE_RESPONSES", "true").lower() == "true"
+    config.ai.streaming = os.getenv("AI_STREAMING", "true").lower() == "true"
+    config.ai.stream_edit_interval = float(os.getenv("AI_STREAM_EDIT_INTERVAL", "1.0"))
+    config.ai.stream_group_edit_interval = float(os.getenv("AI_STREAM_GROUP_EDIT_INTERVAL", "3.0"))
+    config.ai.cache_max_mb = float(os.getenv("AI_CACHE_MAX_MB", "8"))
+    config.ai.cache_ttl = int(os.getenv("AI_CACHE_TTL", "3600"))
+    config.ai.cache_similarity = float(os.getenv("AI_CACHE_SIMILARITY", "0"))
+    config.ai.cache_persist = os.getenv("AI_CACHE_PERSIST", "false").lower() == "true"
+    config.ai.openai_url = os.getenv("AI_OPENAI_URL", config.ai.openai_url)
+    config.ai.anthropic_url = os.getenv("AI_ANTHROPIC_URL", config.ai.anthropic_url)
+    config.ai.hedging = os.getenv("AI_HEDGING", "false").lower() == "true"
+    config.ai.hedge_min_delay = float(os.getenv("AI_HEDGE_MIN_DELAY", "1.0"))
+    config.ai.hedge_max_delay = float(os.getenv("AI_HEDGE_MAX_DELAY", "10.0"))
+    config.ai.breaker_failures = int(os.getenv("AI_BREAKER_FAILURES", "3"))
+    config.ai.breaker_cooldown = float(os.getenv("AI_BREAKER_COOLDOWN", "30"))
     
     # =================== ОСТАЛЬНЫЕ НАСТРОЙКИ ===================
     config.crypto.enabled = os.getenv("CRYPTO_ENABLED", "true").lower() == "true"
@@ -13,49 +13,856 @@
 
 import asyncio
 import logging
-import sqlite3
+import re
+import time
 import aiosqlite
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from collections import deque
+from urllib.parse import quote
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Any, Optional, AsyncIterator, Union
 from pathlib import Path
 import json
 
+from migrations import run_migrations
+from storage import create_backend
+from storage.base import RowShape, row_converter
+
 logger = logging.getLogger(__name__)
 
+# Запросы горячих путей: одинаковый текст SQL = повторное использование
+# скомпилированного выражения из кэша соединения
+NAMED_QUERIES = {
+    'chat_logs.user_stats': """
+        SELECT COUNT(*) as total_messages, MIN(timestamp) as first_seen, MAX(timestamp) as last_seen
+        FROM chat_logs WHERE user_id = ?
+    """,
+    'chat_logs.recent': """
+        SELECT chat_id, user_id, username, full_name, text, message_type, timestamp
+        FROM chat_logs ORDER BY timestamp DESC LIMIT ?
+    """,
+    'memory_contexts.get': """
+        SELECT context_value FROM memory_contexts
+        WHERE user_id = ? AND chat_id = ? AND context_key = ?
+        AND (expires_at IS NULL OR expires_at > ?)
+    """,
+    'system_settings.get': "SELECT value FROM system_settings WHERE key = ?",
+}
+
+
+# Строковые литералы SQL вырезаются перед подсчетом плейсхолдеров
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+# "SCAN t" / "SCAN TABLE t" без USING ... INDEX - полный проход по таблице
+_FULL_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\S+)(.*)$")
+
+
+def _has_where(query: str) -> bool:
+    """🔎 Есть ли в запросе фильтр (полный проход без WHERE - ожидаем)"""
+    return re.search(r"\bWHERE\b", _SQL_LITERAL_RE.sub("''", query), re.IGNORECASE) is not None
+
+
+async def explain_queries(connection, queries: Dict[str, str]) -> List[Dict[str, Any]]:
+    """🔬 EXPLAIN QUERY PLAN для набора запросов с поиском полных проходов
+    
+    queries: {источник: SQL}. Плейсхолдеры '?' связываются с NULL,
+    план от значений параметров не зависит.
+    """
+    report = []
+    
+    for source, query in queries.items():
+        entry = {
+            'source': source,
+            'query': " ".join(query.split()),
+            'plan': [],
+            'full_scans': [],
+            'has_where': _has_where(query),
+            'error': None
+        }
+        
+        placeholders = _SQL_LITERAL_RE.sub("''", query).count('?')
+        try:
+            async with connection.execute(
+                f"EXPLAIN QUERY PLAN {query}", (None,) * placeholders
+            ) as cursor:
+                rows = await cursor.fetchall()
+        except Exception as e:
+            entry['error'] = str(e)
+            report.append(entry)
+            continue
+        
+        for row in rows:
+            detail = row[-1]
+            entry['plan'].append(detail)
+            
+            match = _FULL_SCAN_RE.match(detail)
+            if match and 'USING' not in match.group(2):
+                entry['full_scans'].append(match.group(1))
+        
+        report.append(entry)
+    
+    return report
+
+
+class WriteBehindQueue:
+    """📥 Очередь отложенной записи (write-behind)
+    
+    Копит INSERT-ы в памяти и сбрасывает их пачкой через executemany
+    в одной транзакции: по размеру пачки или по таймеру.
+    """
+    
+    def __init__(self, db_service, batch_size: int = 200, flush_interval: float = 1.0,
+                 max_size: int = 10000):
+        self.db = db_service
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.05, flush_interval)
+        self.max_size = max(self.batch_size, max_size)
+        
+        self._pending: deque = deque()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        
+        # Метрики
+        self.enqueued_rows = 0
+        self.flushed_rows = 0
+        self.dropped_rows = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+    
+    async def start(self):
+        """▶️ Запуск фонового сброса"""
+        if self._running:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(
+            f"📥 Write-behind очередь запущена (пачка {self.batch_size}, "
+            f"интервал {self.flush_interval}с)"
+        )
+    
+    async def stop(self):
+        """⏹️ Остановка с финальным сбросом"""
+        self._running = False
+        self._wakeup.set()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def enqueue(self, query: str, params: tuple) -> bool:
+        """➕ Постановка строки в очередь"""
+        if len(self._pending) >= self.max_size:
+            self.dropped_rows += 1
+            return False
+        
+        self._pending.append((query, params))
+        self.enqueued_rows += 1
+        
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+    
+    @property
+    def depth(self) -> int:
+        """📏 Текущая глубина очереди"""
+        return len(self._pending)
+    
+    async def flush(self) -> int:
+        """💾 Сброс накопленных строк одной транзакцией"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            
+            batch = []
+            while self._pending and len(batch) < self.max_size:
+                batch.append(self._pending.popleft())
+            
+            # Группируем по запросу, сохраняя порядок первого появления
+            grouped: Dict[str, List[tuple]] = {}
+            for query, params in batch:
+                grouped.setdefault(query, []).append(params)
+            
+            started = time.perf_counter()
+            try:
+                await self.db.backend.execute_batch(list(grouped.items()))
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"❌ Ошибка сброса очереди записи ({len(batch)} строк): {e}")
+                
+                # Временные ошибки (блокировка БД) - возвращаем строки в начало
+                # очереди; битые данные повторять бессмысленно - отбрасываем
+                if self.db.backend.is_transient_error(e):
+                    room = self.max_size - len(self._pending)
+                    requeue = batch[:max(0, room)]
+                else:
+                    requeue = []
+                self.dropped_rows += len(batch) - len(requeue)
+                self._pending.extendleft(reversed(requeue))
+                return 0
+            
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.flushed_rows += len(batch)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+            
+            logger.debug(f"💾 Сброшено {len(batch)} строк за {elapsed_ms:.1f} мс")
+            return len(batch)
+    
+    async def _flush_loop(self):
+        """🔄 Фоновый цикл сброса по размеру или таймеру"""
+        while self._running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Ошибка фонового сброса очереди: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Метрики очереди"""
+        return {
+            'queue_depth': len(self._pending),
+            'enqueued_rows': self.enqueued_rows,
+            'flushed_rows': self.flushed_rows,
+            'dropped_rows': self.dropped_rows,
+            'flush_count': self.flush_count,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self._total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0
+        }
+
+
+# Таблицы, которые уходят в помесячный архив
+ARCHIVED_TABLES = ('chat_logs', 'messages')
+
+
+def _month_start(value: datetime) -> date:
+    """📅 Первое число месяца"""
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    """📅 Первое число следующего месяца"""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _sql_timestamp(value: Union[datetime, date, str]) -> str:
+    """🕐 Граница периода в формате, в котором sqlite3 хранит datetime"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return f"{value.isoformat()} 00:00:00"
+    return value
+
+
+class MonthlyArchive:
+    """🗄️ Помесячный архив логов в отдельных файлах SQLite
+    
+    Старые строки chat_logs и messages переносятся в archive_YYYY_MM.db:
+    файл подключается через ATTACH, перенос и удаление идут пачками,
+    каждая пачка - одна транзакция. Срок хранения соблюдается удалением
+    целых файлов вместо DELETE по основной таблице.
+    """
+    
+    FILE_PREFIX = 'archive_'
+    
+    def __init__(self, db_service, archive_dir: Union[str, Path], archive_after_days: int = 30,
+                 retention_days: int = 365, batch_size: int = 5000):
+        self.db = db_service
+        self.archive_dir = Path(archive_dir)
+        self.archive_after_days = max(1, archive_after_days)
+        self.retention_days = max(self.archive_after_days, retention_days)
+        self.batch_size = max(1, batch_size)
+        
+        self._run_lock = asyncio.Lock()
+        self._stopping = False
+        
+        # Метрики
+        self.archived_rows = 0
+        self.dropped_files = 0
+        self.last_run: Optional[datetime] = None
+        self.last_run_ms = 0.0
+    
+    def month_path(self, month: date) -> Path:
+        """📁 Файл архива за месяц"""
+        return self.archive_dir / f"{self.FILE_PREFIX}{month.year:04d}_{month.month:02d}.db"
+    
+    def list_months(self) -> List[date]:
+        """📋 Месяцы, по которым есть архивные файлы (по возрастанию)"""
+        if not self.archive_dir.exists():
+            return []
+        
+        months = []
+        for path in self.archive_dir.glob(f"{self.FILE_PREFIX}*.db"):
+            try:
+                year, month = path.stem[len(self.FILE_PREFIX):].split('_')
+                months.append(date(int(year), int(month), 1))
+            except ValueError:
+                logger.warning(f"⚠️ Непонятный файл в архиве: {path.name}")
+        return sorted(months)
+    
+    def stop(self):
+        """⏹️ Прервать перенос после текущей пачки"""
+        self._stopping = True
+    
+    # =================== ПЕРЕНОС В АРХИВ ===================
+    
+    async def archive_old_rows(self, now: datetime = None) -> Dict[str, int]:
+        """🗄️ Перенос в архив всех полных месяцев старше archive_after_days"""
+        now = now or datetime.now()
+        cutoff = _month_start(now - timedelta(days=self.archive_after_days))
+        moved = {table: 0 for table in ARCHIVED_TABLES}
+        
+        async with self._run_lock:
+            started = time.perf_counter()
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            
+            for table in ARCHIVED_TABLES:
+                since = date.min
+                while not self._stopping:
+                    # Следующий месяц, в котором есть строки: пустые месяцы
+                    # пропускаются, для них не создаются архивные файлы
+                    oldest = await self.db.fetch_one(
+                        f"SELECT MIN(timestamp) AS oldest FROM {table} WHERE timestamp >= ? AND timestamp < ?",
+                        (_sql_timestamp(since), _sql_timestamp(cutoff))
+                    )
+                    if not oldest or not oldest['oldest']:
+                        break
+                    
+                    month = date(int(oldest['oldest'][:4]), int(oldest['oldest'][5:7]), 1)
+                    moved[table] += await self._archive_month(table, month)
+                    since = _next_month(month)
+            
+            self.last_run = now
+            self.last_run_ms = (time.perf_counter() - started) * 1000
+        
+        total = sum(moved.values())
+        self.archived_rows += total
+        if total:
+            logger.info(f"🗄️ В архив перенесено строк: {moved} за {self.last_run_ms:.0f} мс")
+        return moved
+    
+    async def _archive_month(self, table: str, month: date) -> int:
+        """📦 Перенос одного месяца одной таблицы пачками"""
+        conn = self.db.backend.connection
+        period = (_sql_timestamp(month), _sql_timestamp(_next_month(month)))
+        moved = 0
+        
+        # ATTACH/DETACH нельзя выполнять внутри транзакции - только под блокировкой писателя
+        async with self.db.backend.write_lock:
+            await conn.execute("ATTACH DATABASE ? AS archive", (str(self.month_path(month)),))
+            try:
+                await conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS archive.{table} AS SELECT * FROM main.{table} WHERE 0"
+                )
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_timestamp ON {table}(timestamp)"
+                )
+                await conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+                await conn.commit()
+                
+                # Колонки берем из архива: в старых файлах их может быть меньше
+                async with conn.execute(f"PRAGMA archive.table_info({table})") as cursor:
+                    columns = ", ".join(row[1] for row in await cursor.fetchall())
+            except Exception:
+                await conn.rollback()
+                await conn.execute("DETACH DATABASE archive")
+                raise
+        
+        try:
+            while not self._stopping:
+                async with self.db.backend.write_lock:
+                    try:
+                        await conn.execute("DELETE FROM temp.archive_batch")
+                        cursor = await conn.execute(f"""
+                            INSERT INTO temp.archive_batch (id)
+                            SELECT id FROM main.{table}
+                            WHERE timestamp >= ? AND timestamp < ?
+                            ORDER BY timestamp LIMIT ?
+                        """, (*period, self.batch_size))
+                        batch = cursor.rowcount
+                        
+                        if batch > 0:
+                            await conn.execute(f"""
+                                INSERT INTO archive.{table} ({columns})
+                                SELECT {columns} FROM main.{table}
+                                WHERE id IN (SELECT id FROM temp.archive_batch)
+                            """)
+                            await conn.execute(
+                                f"DELETE FROM main.{table} WHERE id IN (SELECT id FROM temp.archive_batch)"
+                            )
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+                
+                moved += max(0, batch)
+                if batch < self.batch_size:
+                    break
+                
+                # Даем поработать остальным писателям между пачками
+                await asyncio.sleep(0)
+        finally:
+            async with self.db.backend.write_lock:
+                await conn.execute("DETACH DATABASE archive")
+        
+        if moved:
+            logger.info(f"📦 {table} за {month:%Y-%m}: {moved} строк -> {self.month_path(month).name}")
+        return moved
+    
+    # =================== СРОК ХРАНЕНИЯ ===================
+    
+    def drop_expired(self, now: datetime = None) -> int:
+        """🗑️ Удаление архивных файлов старше retention_days"""
+        now = now or datetime.now()
+        horizon = (now - timedelta(days=self.retention_days)).date()
+        dropped = 0
+        
+        for month in self.list_months():
+            if _next_month(month) > horizon:
+                break
+            
+            path = self.month_path(month)
+            try:
+                path.unlink()
+                dropped += 1
+                logger.info(f"🗑️ Удален архив {path.name}")
+            except OSError as e:
+                # На Windows файл может быть занят читателем - удалим в следующий раз
+                logger.warning(f"⚠️ Не удалось удалить архив {path.name}: {e}")
+        
+        self.dropped_files += dropped
+        return dropped
+    
+    # =================== ЧТЕНИЕ ПО ПЕРИОДУ ===================
+    
+    async def iterate_range(self, table: str, start: Union[datetime, date, str],
+                            end: Union[datetime, date, str], where: str = "", params: tuple = (),
+                            columns: str = "*", row_shape: RowShape = 'dict',
+                            batch_size: int = 500) -> AsyncIterator[Any]:
+        """🌊 Строки за период [start, end) из архивов и основной БД по порядку времени"""
+        if table not in ARCHIVED_TABLES:
+            raise ValueError(f"Таблица {table} не архивируется")
+        
+        start, end = _sql_timestamp(start), _sql_timestamp(end)
+        query = f"SELECT {columns} FROM {table} WHERE timestamp >= ? AND timestamp < ?"
+        if where:
+            query += f" AND ({where})"
+        query += " ORDER BY timestamp"
+        query_params = (start, end, *params)
+        
+        async for archive in self._open_months(table, start, end):
+            async with archive.execute(query, query_params) as cursor:
+                convert = row_converter(row_shape, [column[0] for column in cursor.description])
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield convert(row) if convert else row
+        
+        async for row in self.db.iterate(query, query_params, row_shape=row_shape, batch_size=batch_size):
+            yield row
+    
+    async def fetch_each(self, table: str, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """📚 Одна строка запроса из каждого архивного файла (агрегаты за всю историю)"""
+        if table not in ARCHIVED_TABLES:
+            raise ValueError(f"Таблица {table} не архивируется")
+        
+        results = []
+        async for archive in self._open_months(table):
+            async with archive.execute(query, params) as cursor:
+                row = await cursor.fetchone()
+                if row is not None:
+                    results.append(dict(zip([column[0] for column in cursor.description], row)))
+        return results
+    
+    async def _open_months(self, table: str, start: str = None, end: str = None) -> AsyncIterator[Any]:
+        """📂 Соединения только для чтения к архивам с таблицей table, пересекающим [start, end)"""
+        for month in self.list_months():
+            month_from, month_to = _sql_timestamp(month), _sql_timestamp(_next_month(month))
+            if (start is not None and month_to <= start) or (end is not None and month_from >= end):
+                continue
+            
+            uri = f"file:{quote(self.month_path(month).resolve().as_posix())}?mode=ro"
+            async with aiosqlite.connect(uri, uri=True) as archive:
+                # Файл мог быть создан, а таблица этого типа в нем - нет
+                async with archive.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+                ) as cursor:
+                    if await cursor.fetchone() is None:
+                        continue
+                yield archive
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Метрики архива"""
+        months = self.list_months()
+        return {
+            'archive_files': len(months),
+            'archive_bytes': sum(self.month_path(month).stat().st_size for month in months),
+            'oldest_month': months[0].strftime('%Y-%m') if months else None,
+            'newest_month': months[-1].strftime('%Y-%m') if months else None,
+            'archived_rows': self.archived_rows,
+            'dropped_files': self.dropped_files,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_run_ms': round(self.last_run_ms, 2)
+        }
+
+
+class DatabaseMaintenance:
+    """🧽 Планировщик обслуживания SQLite
+    
+    Раз в check_interval замеряет поток сообщений (строки очереди записи)
+    и в тихие минуты выполняет:
+    • PRAGMA wal_checkpoint(TRUNCATE) - WAL сбрасывается и обрезается до нуля
+    • PRAGMA optimize - обновление статистики планировщика
+    • PRAGMA incremental_vacuum - возврат свободных страниц файловой системе
+    • перенос старых логов в помесячный архив и удаление просроченных
+      архивных файлов (если архив включен)
+    
+    Под нагрузкой выполняется только PASSIVE-чекпойнт, если WAL вырос
+    больше wal_checkpoint_mb: он не ждет читателей и не блокирует запись.
+    optimize и архивация под нагрузкой запускаются, только если просрочены
+    вдвое, - иначе у постоянно занятого бота они не выполнились бы никогда.
+    """
+    
+    # Архивация первой: освобожденные ею страницы возвращает VACUUM
+    TASKS = ('archive', 'checkpoint', 'optimize', 'vacuum')
+    
+    def __init__(self, db_service, check_interval: float = 60.0, quiet_rate: float = 10.0,
+                 checkpoint_interval_minutes: float = 30.0, optimize_interval_hours: float = 6.0,
+                 vacuum_interval_hours: float = 24.0, vacuum_step_pages: int = 500,
+                 vacuum_min_free_ratio: float = 0.1, wal_checkpoint_mb: float = 64.0,
+                 archive_interval_hours: float = 24.0):
+        self.db = db_service
+        self.db_path = Path(db_service.db_path)
+        self.wal_path = Path(f"{db_service.db_path}-wal")
+        self.check_interval = max(1.0, check_interval)
+        self.quiet_rate = max(0.0, quiet_rate)
+        self.intervals = {
+            'checkpoint': max(1.0, checkpoint_interval_minutes * 60),
+            'optimize': max(60.0, optimize_interval_hours * 3600),
+            'vacuum': max(60.0, vacuum_interval_hours * 3600),
+            'archive': max(60.0, archive_interval_hours * 3600)
+        }
+        self.vacuum_step_pages = max(1, vacuum_step_pages)
+        self.vacuum_min_free_ratio = max(0.0, vacuum_min_free_ratio)
+        self.wal_checkpoint_bytes = int(max(1.0, wal_checkpoint_mb) * 1024 * 1024)
+        
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event = asyncio.Event()
+        self._last_rows = 0
+        self._last_sample = time.monotonic()
+        # Первый запуск задач - через полный интервал после старта
+        self._last_run = {task: time.monotonic() for task in self.TASKS}
+        
+        # Метрики
+        self.message_rate = 0.0
+        self.runs = {task: 0 for task in self.TASKS}
+        self.passive_checkpoints = 0
+        self.reports: Dict[str, Dict[str, Any]] = {}
+        self.last_error: Optional[str] = None
+    
+    async def start(self):
+        """▶️ Запуск планировщика"""
+        if self._task:
+            return
+        self._last_rows = self._written_rows()
+        self._last_sample = time.monotonic()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(
+            f"🧽 Обслуживание БД: проверка каждые {self.check_interval:g}с, "
+            f"тихо при <= {self.quiet_rate:g} сообщ./мин"
+        )
+    
+    async def stop(self):
+        """⏹️ Остановка после текущей операции"""
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+    
+    async def _loop(self):
+        """🔄 Замер нагрузки и обслуживание по расписанию"""
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.check_interval)
+                break
+            except asyncio.TimeoutError:
+                pass
+            
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"❌ Ошибка обслуживания БД: {e}")
+    
+    # =================== НАГРУЗКА ===================
+    
+    def _written_rows(self) -> int:
+        """📥 Сколько строк логов поставлено в очередь записи с запуска"""
+        queue = self.db.write_queue
+        return queue.enqueued_rows if queue else 0
+    
+    def _sample_rate(self) -> float:
+        """📈 Сообщений в минуту с прошлого замера"""
+        now = time.monotonic()
+        rows = self._written_rows()
+        elapsed = max(now - self._last_sample, 1e-6)
+        self.message_rate = (rows - self._last_rows) / elapsed * 60
+        self._last_rows, self._last_sample = rows, now
+        return self.message_rate
+    
+    def _due(self, task: str, now: float, quiet: bool) -> bool:
+        """⏰ Пора ли запускать задачу (optimize и архивация - при двойной просрочке и под нагрузкой)"""
+        elapsed = now - self._last_run[task]
+        if elapsed < self.intervals[task]:
+            return False
+        return quiet or (task in ('optimize', 'archive') and elapsed >= 2 * self.intervals[task])
+    
+    # =================== ЗАПУСК ===================
+    
+    async def run_once(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """🧽 Одна проверка: задачи, которым пора (force - все сразу)"""
+        quiet = self._sample_rate() <= self.quiet_rate
+        now = time.monotonic()
+        done = {}
+        
+        for task in self.TASKS:
+            if self._stop_event.is_set():
+                break
+            if not (force or self._due(task, now, quiet)):
+                continue
+            
+            done[task] = await self._run_task(task)
+            self._last_run[task] = time.monotonic()
+        
+        # Под нагрузкой WAL может расти, если автоматический чекпойнт не успевает
+        if 'checkpoint' not in done and self._file_size(self.wal_path) > self.wal_checkpoint_bytes:
+            done['checkpoint_passive'] = await self._run_task('checkpoint_passive')
+            self.passive_checkpoints += 1
+        
+        return done
+    
+    async def _run_task(self, task: str) -> Dict[str, Any]:
+        """📏 Выполнение задачи с замером размеров файлов до и после"""
+        before = await self._sizes()
+        started = time.perf_counter()
+        
+        if task == 'checkpoint':
+            details = await self._checkpoint('TRUNCATE')
+        elif task == 'checkpoint_passive':
+            details = await self._checkpoint('PASSIVE')
+        elif task == 'optimize':
+            details = await self._optimize()
+        elif task == 'archive':
+            details = await self._archive()
+        else:
+            details = await self._vacuum()
+        
+        after = await self._sizes()
+        report = {
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'message_rate_per_min': round(self.message_rate, 2),
+            **{f"{key}_before": value for key, value in before.items()},
+            **{f"{key}_after": value for key, value in after.items()},
+            **details
+        }
+        
+        self.reports[task] = report
+        if task in self.runs:
+            self.runs[task] += 1
+        self.last_error = None
+        
+        logger.info(
+            f"🧽 {task}: БД {before['db_bytes'] / 1024:.0f} -> {after['db_bytes'] / 1024:.0f} КБ, "
+            f"WAL {before['wal_bytes'] / 1024:.0f} -> {after['wal_bytes'] / 1024:.0f} КБ "
+            f"за {report['duration_ms']:.0f} мс"
+        )
+        return report
+    
+    # =================== ЗАДАЧИ ===================
+    
+    async def _pragma(self, sql: str) -> list:
+        """⚡ PRAGMA через писателя (под его блокировкой)"""
+        async with self.db.backend.writer() as conn:
+            async with conn.execute(sql) as cursor:
+                return await cursor.fetchall()
+    
+    async def _checkpoint(self, mode: str) -> Dict[str, Any]:
+        """📜 Перенос WAL в основной файл"""
+        busy, log_pages, checkpointed = (await self._pragma(f"PRAGMA wal_checkpoint({mode})"))[0]
+        return {'mode': mode, 'busy': bool(busy), 'wal_pages': log_pages, 'checkpointed_pages': checkpointed}
+    
+    async def _optimize(self) -> Dict[str, Any]:
+        """📊 ANALYZE только там, где статистика устарела"""
+        await self._pragma("PRAGMA optimize")
+        return {}
+    
+    async def _archive(self) -> Dict[str, Any]:
+        """🗄️ Перенос старых месяцев в архив и удаление просроченных файлов"""
+        archive = self.db.archive
+        if not archive:
+            return {'mode': 'skipped'}
+        
+        dropped_before = archive.dropped_files
+        moved = await self.db.archive_logs()
+        return {'archived_rows': sum(moved.values()), 'dropped_files': archive.dropped_files - dropped_before}
+    
+    async def _vacuum(self) -> Dict[str, Any]:
+        """🗜️ Возврат свободных страниц пачками по vacuum_step_pages
+        
+        Старые БД созданы без auto_vacuum=INCREMENTAL: их один раз переводим
+        полным VACUUM, и только если свободных страниц много.
+        """
+        auto_vacuum, = (await self._pragma("PRAGMA auto_vacuum"))[0]
+        page_count, freelist = await self._page_counts()
+        
+        if auto_vacuum != 2:
+            if page_count and freelist / page_count >= self.vacuum_min_free_ratio:
+                logger.info("🗜️ Полный VACUUM: перевод БД на auto_vacuum=INCREMENTAL")
+                await self._pragma("PRAGMA auto_vacuum=INCREMENTAL")
+                await self._pragma("VACUUM")
+                return {'mode': 'full', 'freed_pages': freelist, **await self._shrink_wal()}
+            return {'mode': 'skipped', 'freed_pages': 0}
+        
+        freed = 0
+        while freelist > 0 and not self._stop_event.is_set():
+            # Каждая пачка - отдельный захват писателя: запись идет между пачками
+            await self._pragma(f"PRAGMA incremental_vacuum({self.vacuum_step_pages})")
+            _, remaining = await self._page_counts()
+            if remaining >= freelist:
+                break
+            freed += freelist - remaining
+            freelist = remaining
+            await asyncio.sleep(0)
+        
+        return {'mode': 'incremental', 'freed_pages': freed, **(await self._shrink_wal() if freed else {})}
+    
+    async def _shrink_wal(self) -> Dict[str, Any]:
+        """📜 В WAL-режиме файл БД уменьшается только после чекпойнта"""
+        checkpoint = await self._checkpoint('TRUNCATE')
+        return {'checkpoint_busy': checkpoint['busy']}
+    
+    async def _page_counts(self) -> tuple:
+        """📄 Всего страниц и свободных страниц"""
+        page_count, = (await self._pragma("PRAGMA page_count"))[0]
+        freelist, = (await self._pragma("PRAGMA freelist_count"))[0]
+        return page_count, freelist
+    
+    # =================== МЕТРИКИ ===================
+    
+    @staticmethod
+    def _file_size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0
+    
+    async def _sizes(self) -> Dict[str, int]:
+        """📏 Размеры файла БД, WAL и свободных страниц"""
+        _, freelist = await self._page_counts()
+        return {
+            'db_bytes': self._file_size(self.db_path),
+            'wal_bytes': self._file_size(self.wal_path),
+            'freelist_pages': freelist
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """📊 Метрики обслуживания и отчеты последних запусков"""
+        return {
+            'db_size_bytes': self._file_size(self.db_path),
+            'wal_size_bytes': self._file_size(self.wal_path),
+            'message_rate_per_min': round(self.message_rate, 2),
+            'runs': dict(self.runs),
+            'passive_checkpoints': self.passive_checkpoints,
+            'last_runs': {task: dict(report) for task, report in self.reports.items()},
+            'last_error': self.last_error
+        }
+
 
 class DatabaseService:
-    """💾 Сервис работы с базой данных"""
+    """💾 Сервис работы с базой данных
+    
+    Соединения, транзакции и диалект SQL - забота бэкенда хранилища
+    (storage.create_backend): SQLite по умолчанию или PostgreSQL.
+    """
     
     def __init__(self, config):
         self.config = config
         self.db_path = config.path
-        self.connection = None
-        logger.info("💾 DatabaseService инициализирован")
+        self.backend = create_backend(config)
+        self.write_queue: Optional[WriteBehindQueue] = None
+        self.archive: Optional[MonthlyArchive] = None
+        self.maintenance: Optional[DatabaseMaintenance] = None
+        
+        # Реестр именованных запросов
+        self.named_queries: Dict[str, str] = dict(NAMED_QUERIES)
+        logger.info(f"💾 DatabaseService инициализирован (бэкенд: {self.backend.dialect})")
+    
+    @property
+    def connection(self):
+        """🔌 Соединение-писатель SQLite (у других бэкендов - None)"""
+        return getattr(self.backend, 'connection', None)
     
     async def initialize(self):
         """🚀 Инициализация базы данных"""
         try:
-            # Создаем директорию если не существует
-            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-            
             # Подключение к базе
-            self.connection = await aiosqlite.connect(
-                self.db_path,
-                timeout=30.0
-            )
+            await self.backend.connect()
             
-            # Включаем WAL режим если настроено
-            if self.config.wal_mode:
-                await self.connection.execute("PRAGMA journal_mode=WAL")
+            # Схема: таблицы и индексы создаются миграциями
+            await self._migrate()
             
-            # Настройки производительности
-            await self.connection.execute("PRAGMA foreign_keys=ON")
-            await self.connection.execute("PRAGMA cache_size=-2000")
-            await self.connection.execute("PRAGMA synchronous=NORMAL")
+            # Отложенная запись логов сообщений
+            self.write_queue = WriteBehindQueue(
+                self,
+                batch_size=getattr(self.config, 'write_batch_size', 200),
+                flush_interval=getattr(self.config, 'write_flush_interval', 1.0),
+                max_size=getattr(self.config, 'write_queue_max_size', 10000)
+            )
+            await self.write_queue.start()
             
-            # Создаем таблицы
-            await self._create_tables()
-            await self._create_indexes()
+            # Помесячный архив логов (файлы SQLite; для БД в памяти не нужен)
+            if self.backend.supports_archive and self.db_path != ':memory:':
+                archive_dir = getattr(self.config, 'archive_dir', '') or Path(self.db_path).parent / 'archive'
+                self.archive = MonthlyArchive(
+                    self,
+                    archive_dir,
+                    archive_after_days=getattr(self.config, 'archive_after_days', 30),
+                    retention_days=getattr(self.config, 'archive_retention_days', 365)
+                )
+            
+            # VACUUM, optimize и чекпойнты WAL в тихие минуты
+            if (self.backend.supports_maintenance and self.db_path != ':memory:'
+                    and getattr(self.config, 'maintenance_enabled', True)):
+                self.maintenance = DatabaseMaintenance(
+                    self,
+                    check_interval=getattr(self.config, 'maintenance_check_seconds', 60.0),
+                    quiet_rate=getattr(self.config, 'maintenance_quiet_rate', 10.0),
+                    checkpoint_interval_minutes=getattr(self.config, 'checkpoint_interval_minutes', 30.0),
+                    optimize_interval_hours=getattr(self.config, 'optimize_interval_hours', 6.0),
+                    vacuum_interval_hours=getattr(self.config, 'vacuum_interval_hours', 24.0),
+                    vacuum_step_pages=getattr(self.config, 'vacuum_step_pages', 500),
+                    vacuum_min_free_ratio=getattr(self.config, 'vacuum_min_free_ratio', 0.1),
+                    wal_checkpoint_mb=getattr(self.config, 'wal_checkpoint_mb', 64.0),
+                    archive_interval_hours=getattr(self.config, 'archive_interval_hours', 24.0)
+                )
+                await self.maintenance.start()
             
             logger.info("🚀 База данных инициализирована")
             
@@ -66,293 +873,140 @@ class DatabaseService:
     async def close(self):
         """🔒 Закрытие соединения"""
         try:
-            if self.connection:
-                await self.connection.close()
-                logger.info("🔒 База данных закрыта")
+            if self.archive:
+                self.archive.stop()
+            
+            if self.maintenance:
+                await self.maintenance.stop()
+            
+            if self.write_queue:
+                await self.write_queue.stop()
+            
+            await self.backend.close()
+            logger.info("🔒 База данных закрыта")
         except Exception as e:
             logger.error(f"❌ Ошибка закрытия БД: {e}")
     
-    async def _create_tables(self):
-        """📋 Создание всех таблиц"""
-        tables = [
-            # Пользователи
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                full_name TEXT,
-                language_code TEXT,
-                is_premium BOOLEAN DEFAULT FALSE,
-                is_bot BOOLEAN DEFAULT FALSE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            # Чаты
-            """
-            CREATE TABLE IF NOT EXISTS chats (
-                id INTEGER PRIMARY KEY,
-                type TEXT NOT NULL,
-                title TEXT,
-                username TEXT,
-                description TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            # ЛОГИРОВАНИЕ СООБЩЕНИЙ (НОВАЯ ТАБЛИЦА)
-            """
-            CREATE TABLE IF NOT EXISTS chat_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                username TEXT,
-                full_name TEXT,
-                text TEXT,
-                message_type TEXT DEFAULT 'text',
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            # Сообщения
-            """
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                message_id INTEGER,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                text TEXT,
-                message_type TEXT DEFAULT 'text',
-                reply_to_message_id INTEGER,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id)
-            )
-            """,
-            
-            # Действия пользователей
-            """
-            CREATE TABLE IF NOT EXISTS user_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER,
-                action TEXT NOT NULL,
-                details TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id)
-            )
-            """,
-            
-            # Системные настройки
-            """
-            CREATE TABLE IF NOT EXISTS system_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_by INTEGER,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            
-            # AI взаимодействия
-            """
-            CREATE TABLE IF NOT EXISTS ai_interactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER,
-                prompt TEXT NOT NULL,
-                response TEXT,
-                model_used TEXT,
-                tokens_used INTEGER,
-                response_time REAL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id)
-            )
-            """,
-            
-            # Память диалогов
-            """
-            CREATE TABLE IF NOT EXISTS memory_contexts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER,
-                context_key TEXT NOT NULL,
-                context_value TEXT NOT NULL,
-                expires_at DATETIME,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id)
-            )
-            """,
-            
-            # Триггеры
-            """
-            CREATE TABLE IF NOT EXISTS triggers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chat_id INTEGER,
-                user_id INTEGER NOT NULL,
-                trigger_text TEXT NOT NULL,
-                response_text TEXT NOT NULL,
-                is_regex BOOLEAN DEFAULT FALSE,
-                is_global BOOLEAN DEFAULT FALSE,
-                is_active BOOLEAN DEFAULT TRUE,
-                usage_count INTEGER DEFAULT 0,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id)
-            )
-            """,
-            
-            # Модерация - баны
-            """
-            CREATE TABLE IF NOT EXISTS bans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER,
-                admin_id INTEGER NOT NULL,
-                reason TEXT,
-                ban_type TEXT DEFAULT 'permanent',
-                expires_at DATETIME,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id),
-                FOREIGN KEY (admin_id) REFERENCES users (id)
-            )
-            """,
-            
-            # Модерация - предупреждения
-            """
-            CREATE TABLE IF NOT EXISTS warnings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                chat_id INTEGER NOT NULL,
-                admin_id INTEGER NOT NULL,
-                reason TEXT,
-                severity_level INTEGER DEFAULT 1,
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (chat_id) REFERENCES chats (id),
-                FOREIGN KEY (admin_id) REFERENCES users (id)
-            )
-            """,
-            
-            # Аналитика поведения
-            """
-            CREATE TABLE IF NOT EXISTS behavior_patterns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                pattern_type TEXT NOT NULL,
-                pattern_data TEXT NOT NULL,
-                confidence REAL DEFAULT 0.0,
-                last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-            """
-        ]
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """📊 Статистика пула соединений"""
+        return self.backend.get_pool_stats()
+    
+    async def migrate(self):
+        """🧬 Только миграции, без фоновых задач (маршрутизатор воркеров)"""
+        await self.backend.connect()
+        try:
+            await self._migrate()
+        finally:
+            await self.backend.close()
+    
+    async def _migrate(self):
+        """🧬 Применение миграций схемы (без изменений - один запрос)"""
+        applied = await run_migrations(self.backend)
+        if applied:
+            logger.info(f"🧬 Применены миграции: {applied}")
+    
+    async def analyze_queries(self, queries: Dict[str, str]) -> List[Dict[str, Any]]:
+        """🔬 Советник по индексам: планы запросов через читателя (только SQLite)"""
+        if not self.backend.supports_explain:
+            logger.info(f"🔬 EXPLAIN QUERY PLAN недоступен для бэкенда {self.backend.dialect}")
+            return []
         
-        for table_sql in tables:
-            try:
-                await self.connection.execute(table_sql)
-            except Exception as e:
-                logger.error(f"❌ Ошибка создания таблицы: {e}")
-        
-        await self.connection.commit()
-        logger.info("📋 Все таблицы созданы")
-    
-    async def _create_indexes(self):
-        """🚀 Создание индексов"""
-        indexes = [
-            # Индексы для логирования
-            "CREATE INDEX IF NOT EXISTS idx_chat_logs_user ON chat_logs(user_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_chat_logs_chat ON chat_logs(chat_id, timestamp)",
-            
-            # Основные индексы
-            "CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages(chat_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_user_actions_user ON user_actions(user_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_ai_interactions_user ON ai_interactions(user_id, timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_memory_contexts_user ON memory_contexts(user_id, chat_id)",
-            "CREATE INDEX IF NOT EXISTS idx_triggers_active ON triggers(is_active, chat_id)",
-            "CREATE INDEX IF NOT EXISTS idx_bans_active ON bans(is_active, user_id, chat_id)",
-            "CREATE INDEX IF NOT EXISTS idx_warnings_active ON warnings(is_active, user_id, chat_id)",
-            "CREATE INDEX IF NOT EXISTS idx_behavior_user ON behavior_patterns(user_id, pattern_type)"
-        ]
-        
-        for index_sql in indexes:
-            try:
-                await self.connection.execute(index_sql)
-            except Exception as e:
-                logger.error(f"❌ Ошибка создания индекса: {e}")
+        async with self.backend.read_connection() as conn:
+            return await explain_queries(conn, queries)
+    
+    # =================== ТРАНЗАКЦИИ ===================
+    
+    def _in_transaction(self) -> bool:
+        """🔎 Выполняется ли текущая задача внутри transaction()"""
+        return self.backend.in_transaction()
+    
+    def transaction(self):
+        """🔐 Единица работы: все записи внутри блока - один коммит
+        
+        Использование:
+            async with db.transaction():
+                await db.execute(...)
+                await db.save_user(...)
         
-        await self.connection.commit()
-        logger.info("🚀 Индексы созданы")
+        Вложенные блоки оформляются точками сохранения (SAVEPOINT):
+        исключение во вложенном блоке откатывает только его.
+        """
+        return self.backend.transaction()
     
     # =================== ОСНОВНЫЕ CRUD ОПЕРАЦИИ ===================
     
-    async def execute(self, query: str, params: tuple = None):
-        """⚡ Выполнение запроса"""
+    async def execute(self, query: str, params: tuple = None) -> int:
+        """⚡ Выполнение запроса (всегда через писателя), возвращает число строк"""
         try:
-            if params:
-                await self.connection.execute(query, params)
-            else:
-                await self.connection.execute(query)
-            await self.connection.commit()
+            return await self.backend.execute(query, params or ())
         except Exception as e:
             logger.error(f"❌ Ошибка выполнения запроса: {e}")
             raise
     
-    async def fetch_one(self, query: str, params: tuple = None):
-        """📝 Получение одной записи"""
+    async def execute_many(self, query: str, params_list: List[tuple]):
+        """⚡ Пакетное выполнение запроса одним коммитом"""
+        if not params_list:
+            return
+        
         try:
-            if params:
-                cursor = await self.connection.execute(query, params)
-            else:
-                cursor = await self.connection.execute(query)
-            
-            row = await cursor.fetchone()
-            if row:
-                # Преобразуем в словарь
-                columns = [description[0] for description in cursor.description]
-                return dict(zip(columns, row))
-            return None
-            
+            await self.backend.execute_many(query, params_list)
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного выполнения запроса: {e}")
+            raise
+    
+    def register_query(self, name: str, query: str):
+        """📌 Регистрация именованного запроса
+        
+        Имя можно передавать в fetch_one/fetch_all/iterate вместо SQL.
+        """
+        existing = self.named_queries.get(name)
+        if existing is not None and existing != query:
+            logger.warning(f"⚠️ Именованный запрос {name} переопределен")
+        self.named_queries[name] = query
+    
+    def register_queries(self, queries: Dict[str, str]):
+        """📌 Регистрация набора именованных запросов"""
+        for name, query in queries.items():
+            self.register_query(name, query)
+    
+    def _resolve_query(self, query: str) -> str:
+        """🔎 Имя запроса -> SQL (обычный SQL возвращается как есть)"""
+        return self.named_queries.get(query, query)
+    
+    async def fetch_one(self, query: str, params: tuple = None, row_shape: RowShape = 'dict'):
+        """📝 Получение одной записи (через пул читателей)
+        
+        row_shape: 'dict' (по умолчанию), 'tuple' или класс-наследник Record.
+        """
+        try:
+            return await self.backend.fetch_one(self._resolve_query(query), params or (), row_shape)
         except Exception as e:
             logger.error(f"❌ Ошибка получения записи: {e}")
             return None
     
-    async def fetch_all(self, query: str, params: tuple = None):
-        """📋 Получение всех записей"""
+    async def fetch_all(self, query: str, params: tuple = None, row_shape: RowShape = 'dict'):
+        """📋 Получение всех записей (через пул читателей)"""
         try:
-            if params:
-                cursor = await self.connection.execute(query, params)
-            else:
-                cursor = await self.connection.execute(query)
-            
-            rows = await cursor.fetchall()
-            if rows:
-                columns = [description[0] for description in cursor.description]
-                return [dict(zip(columns, row)) for row in rows]
-            return []
-            
+            return await self.backend.fetch_all(self._resolve_query(query), params or (), row_shape)
         except Exception as e:
             logger.error(f"❌ Ошибка получения записей: {e}")
             return []
     
+    def iterate(self, query: str, params: tuple = None, row_shape: RowShape = 'dict',
+                batch_size: int = 500) -> AsyncIterator[Any]:
+        """🌊 Потоковое чтение пачками без загрузки всего результата в память
+        
+        Соединение занято, пока итерация не закончится; при раннем выходе
+        из цикла оборачивайте вызов в contextlib.aclosing().
+        """
+        return self.backend.iterate(self._resolve_query(query), params or (), row_shape, batch_size)
+    
     # =================== ПОЛЬЗОВАТЕЛИ ===================
     
     async def save_user(self, user_data: Dict[str, Any]) -> bool:
         """👤 Сохранение пользователя"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT OR REPLACE INTO users 
                 (id, username, first_name, last_name, full_name, language_code, is_premium, is_bot, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -367,8 +1021,6 @@ class DatabaseService:
                 user_data.get('is_bot', False),
                 datetime.now()
             ))
-            
-            await self.connection.commit()
             return True
             
         except Exception as e:
@@ -378,7 +1030,7 @@ class DatabaseService:
     async def save_chat(self, chat_data: Dict[str, Any]) -> bool:
         """💬 Сохранение чата"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT OR REPLACE INTO chats 
                 (id, type, title, username, description, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -390,8 +1042,6 @@ class DatabaseService:
                 chat_data.get('description'),
                 datetime.now()
             ))
-            
-            await self.connection.commit()
             return True
             
         except Exception as e:
@@ -407,33 +1057,67 @@ class DatabaseService:
             timestamp = datetime.now()
         
         try:
-            await self.connection.execute("""
+            await self._queue_insert("""
                 INSERT INTO chat_logs (chat_id, user_id, username, full_name, text, message_type, timestamp)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (chat_id, user_id, username, full_name, text, message_type, timestamp))
             
-            await self.connection.commit()
-            
         except Exception as e:
             logger.error(f"❌ Ошибка логирования сообщения: {e}")
     
+    async def save_message(self, message_id: int, user_id: int, chat_id: int, text: str,
+                           message_type: str = 'text', reply_to_message_id: int = None,
+                           timestamp=None):
+        """✉️ Сохранение сообщения в таблицу messages"""
+        if timestamp is None:
+            timestamp = datetime.now()
+        
+        try:
+            await self._queue_insert("""
+                INSERT INTO messages (message_id, user_id, chat_id, text, message_type, reply_to_message_id, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (message_id, user_id, chat_id, text, message_type, reply_to_message_id, timestamp))
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения сообщения: {e}")
+    
+    async def _queue_insert(self, query: str, params: tuple):
+        """📥 Запись через очередь, либо напрямую если очередь не запущена"""
+        if self.write_queue:
+            if not self.write_queue.enqueue(query, params):
+                logger.warning("⚠️ Очередь записи переполнена, строка отброшена")
+            return
+        
+        await self.backend.execute(query, params)
+    
+    async def flush_writes(self) -> int:
+        """💾 Принудительный сброс очереди записи"""
+        if not self.write_queue:
+            return 0
+        return await self.write_queue.flush()
+    
+    def get_write_queue_stats(self) -> Dict[str, Any]:
+        """📊 Метрики очереди отложенной записи"""
+        if not self.write_queue:
+            return {}
+        return self.write_queue.get_stats()
+    
     async def get_user_stats(self, user_id: int) -> dict:
-        """📊 Получение статистики пользователя"""
+        """📊 Получение статистики пользователя (вместе с архивными месяцами)"""
         try:
-            result = await self.fetch_one("""
-                SELECT 
-                    COUNT(*) as total_messages,
-                    MIN(timestamp) as first_seen,
-                    MAX(timestamp) as last_seen
-                FROM chat_logs 
-                WHERE user_id = ?
-            """, (user_id,))
-            
-            if result:
+            result = await self.fetch_one('chat_logs.user_stats', (user_id,))
+            parts = [result] if result else []
+            if self.archive:
+                parts += await self.archive.fetch_each(
+                    'chat_logs', self._resolve_query('chat_logs.user_stats'), (user_id,)
+                )
+            parts = [part for part in parts if part['total_messages']]
+            
+            if parts:
                 return {
-                    'total_messages': result['total_messages'],
-                    'first_seen': result['first_seen'],
-                    'last_seen': result['last_seen']
+                    'total_messages': sum(part['total_messages'] for part in parts),
+                    'first_seen': min(part['first_seen'] for part in parts),
+                    'last_seen': max(part['last_seen'] for part in parts)
                 }
             else:
                 return {'total_messages': 0, 'first_seen': 'неизвестно', 'last_seen': 'никогда'}
@@ -445,25 +1129,61 @@ class DatabaseService:
     async def export_recent_logs(self, limit: int = 1000) -> list:
         """📤 Экспорт последних логов"""
         try:
-            results = await self.fetch_all("""
-                SELECT chat_id, user_id, username, full_name, text, message_type, timestamp
-                FROM chat_logs 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (limit,))
-            
-            return results if results else []
+            return [row async for row in self.iter_recent_logs(limit)]
             
         except Exception as e:
             logger.error(f"❌ Ошибка экспорта логов: {e}")
             return []
     
+    def iter_recent_logs(self, limit: int = 1000, row_shape: RowShape = 'dict') -> AsyncIterator[Any]:
+        """🌊 Потоковый экспорт последних логов (память не растет с limit)"""
+        return self.iterate('chat_logs.recent', (limit,), row_shape=row_shape)
+    
+    def iterate_logs_range(self, table: str, start: Union[datetime, date, str],
+                           end: Union[datetime, date, str], where: str = "", params: tuple = (),
+                           columns: str = "*", row_shape: RowShape = 'dict') -> AsyncIterator[Any]:
+        """🗓️ Логи за период: архивные месяцы подключаются автоматически
+        
+        Пример:
+            async for row in db.iterate_logs_range('chat_logs', since, until, "chat_id = ?", (chat_id,)):
+                ...
+        """
+        if self.archive:
+            return self.archive.iterate_range(table, start, end, where, params, columns, row_shape)
+        
+        query = f"SELECT {columns} FROM {table} WHERE timestamp >= ? AND timestamp < ?"
+        if where:
+            query += f" AND ({where})"
+        query += " ORDER BY timestamp"
+        return self.iterate(query, (_sql_timestamp(start), _sql_timestamp(end), *params), row_shape=row_shape)
+    
+    async def archive_logs(self) -> Dict[str, int]:
+        """🗄️ Перенос старых логов в архив и удаление просроченных архивов"""
+        if not self.archive:
+            return {}
+        
+        try:
+            # Перед переносом дописываем отложенные строки
+            await self.flush_writes()
+            moved = await self.archive.archive_old_rows()
+            self.archive.drop_expired()
+            return moved
+        except Exception as e:
+            logger.error(f"❌ Ошибка архивации логов: {e}")
+            return {}
+    
+    def get_archive_stats(self) -> Dict[str, Any]:
+        """📊 Метрики архива логов"""
+        if not self.archive:
+            return {}
+        return self.archive.get_stats()
+    
     # =================== AI ВЗАИМОДЕЙСТВИЯ ===================
     
     async def save_ai_interaction(self, interaction_data: Dict[str, Any]) -> bool:
         """🧠 Сохранение AI взаимодействия"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT INTO ai_interactions 
                 (user_id, chat_id, prompt, response, model_used, tokens_used, response_time)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
@@ -476,8 +1196,6 @@ class DatabaseService:
                 interaction_data.get('tokens_used'),
                 interaction_data.get('response_time')
             ))
-            
-            await self.connection.commit()
             return True
             
         except Exception as e:
@@ -490,13 +1208,11 @@ class DatabaseService:
                                   context_value: str, expires_at: datetime = None) -> bool:
         """🧠 Сохранение контекста в памяти"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT OR REPLACE INTO memory_contexts 
                 (user_id, chat_id, context_key, context_value, expires_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (user_id, chat_id, context_key, context_value, expires_at, datetime.now()))
-            
-            await self.connection.commit()
             return True
             
         except Exception as e:
@@ -506,11 +1222,9 @@ class DatabaseService:
     async def get_memory_context(self, user_id: int, chat_id: int, context_key: str) -> str:
         """🧠 Получение контекста из памяти"""
         try:
-            result = await self.fetch_one("""
-                SELECT context_value FROM memory_contexts 
-                WHERE user_id = ? AND chat_id = ? AND context_key = ?
-                AND (expires_at IS NULL OR expires_at > ?)
-            """, (user_id, chat_id, context_key, datetime.now()))
+            result = await self.fetch_one(
+                'memory_contexts.get', (user_id, chat_id, context_key, datetime.now())
+            )
             
             return result['context_value'] if result else None
             
@@ -523,13 +1237,11 @@ class DatabaseService:
     async def track_user_action(self, user_id: int, chat_id: int, action: str, details: Dict = None):
         """📊 Трекинг действия пользователя"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT INTO user_actions (user_id, chat_id, action, details)
                 VALUES (?, ?, ?, ?)
             """, (user_id, chat_id, action, json.dumps(details) if details else None))
             
-            await self.connection.commit()
-            
         except Exception as e:
             logger.error(f"❌ Ошибка трекинга действия: {e}")
     
@@ -538,7 +1250,7 @@ class DatabaseService:
     async def get_setting(self, key: str) -> str:
         """⚙️ Получение системной настройки"""
         try:
-            result = await self.fetch_one("SELECT value FROM system_settings WHERE key = ?", (key,))
+            result = await self.fetch_one('system_settings.get', (key,))
             return result['value'] if result else None
         except Exception as e:
             logger.error(f"❌ Ошибка получения настройки {key}: {e}")
@@ -547,12 +1259,10 @@ class DatabaseService:
     async def set_setting(self, key: str, value: str, updated_by: int = None) -> bool:
         """⚙️ Установка системной настройки"""
         try:
-            await self.connection.execute("""
+            await self.backend.execute("""
                 INSERT OR REPLACE INTO system_settings (key, value, updated_by, updated_at)
                 VALUES (?, ?, ?, ?)
             """, (key, value, updated_by, datetime.now()))
-            
-            await self.connection.commit()
             return True
             
         except Exception as e:
@@ -565,24 +1275,29 @@ class DatabaseService:
         """🧹 Очистка устаревших данных"""
         try:
             # Удаляем устаревшие контексты
-            await self.connection.execute("""
+            await self.backend.execute("""
                 DELETE FROM memory_contexts 
                 WHERE expires_at IS NOT NULL AND expires_at < ?
             """, (datetime.now(),))
             
-            # Удаляем старые логи (старше 30 дней)
-            await self.connection.execute("""
-                DELETE FROM chat_logs 
-                WHERE timestamp < ?
-            """, (datetime.now() - timedelta(days=30),))
+            # Старые логи не удаляем, а переносим в помесячные архивы
+            await self.archive_logs()
             
-            await self.connection.commit()
             logger.info("🧹 Очистка устаревших данных завершена")
             
         except Exception as e:
             logger.error(f"❌ Ошибка очистки данных: {e}")
     
-    async def get_database_stats(self) -> Dict[str, int]:
+    async def run_maintenance(self) -> Dict[str, Dict[str, Any]]:
+        """🧽 Внеплановое обслуживание: архивация, чекпойнт, optimize и VACUUM сразу"""
+        if not self.maintenance:
+            return {}
+        
+        # Сначала дописываем очередь, чтобы чекпойнт захватил и ее
+        await self.flush_writes()
+        return await self.maintenance.run_once(force=True)
+    
+    async def get_database_stats(self) -> Dict[str, Any]:
         """📊 Статистика базы данных"""
         try:
             stats = {}
@@ -594,6 +1309,12 @@ class DatabaseService:
                 result = await self.fetch_one(f"SELECT COUNT(*) as count FROM {table}")
                 stats[table] = result['count'] if result else 0
             
+            if self.archive:
+                stats['archive_files'] = len(self.archive.list_months())
+            
+            if self.maintenance:
+                stats['maintenance'] = self.maintenance.get_stats()
+            
             return stats
             
         except Exception as e:
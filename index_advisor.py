@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+🔬 СОВЕТНИК ПО ИНДЕКСАМ
+Прогоняет EXPLAIN QUERY PLAN по всем SQL-запросам модулей и сообщает
+о полных проходах по таблицам (SCAN без индекса).
+
+Использование:
+    python index_advisor.py              # чистая схема во временной БД (для CI)
+    python index_advisor.py --db data/bot.db   # рабочая БД (только чтение)
+    python index_advisor.py --verbose    # показать планы всех запросов
+
+Код возврата 1, если найден полный проход в запросе с WHERE.
+"""
+
+import argparse
+import ast
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+import aiosqlite
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import DatabaseConfig
+from database import DatabaseService, explain_queries
+
+ROOT = Path(__file__).parent
+SOURCES = [ROOT / "database.py", *sorted((ROOT / "app").rglob("*.py"))]
+SQL_PREFIXES = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# Маленькие таблицы-справочники (читаются целиком при старте) и системный
+# каталог: индекс не нужен
+SMALL_TABLES = {"custom_triggers", "custom_personalities", "media_triggers", "media_content",
+                "media_trigger_cooldowns", "sqlite_master"}
+
+
+def collect_queries() -> Dict[str, str]:
+    """📥 Сбор SQL-строк из исходников модулей"""
+    queries = {}
+    seen = set()
+
+    for path in SOURCES:
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+        except (SyntaxError, UnicodeDecodeError) as e:
+            print(f"⚠️ Пропущен {path}: {e}")
+            continue
+
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+                continue
+
+            query = node.value.strip()
+            if not query.upper().startswith(SQL_PREFIXES):
+                continue
+
+            normalized = " ".join(query.split())
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+
+            queries[f"{path.relative_to(ROOT)}:{node.lineno}"] = query
+
+    return queries
+
+
+async def build_schema(db_path: str) -> DatabaseService:
+    """📋 Создание полной схемы во временной БД (все миграции)"""
+    db = DatabaseService(DatabaseConfig(path=db_path))
+    await db.initialize()
+    return db
+
+
+def print_report(report, verbose: bool) -> int:
+    """🖨️ Вывод отчета, возвращает число предупреждений"""
+    warnings = 0
+    expected = 0
+    errors = 0
+
+    for entry in report:
+        if entry['error']:
+            errors += 1
+            if verbose:
+                print(f"❔ {entry['source']}: {entry['error']}")
+            continue
+
+        big_scans = [table for table in entry['full_scans'] if table not in SMALL_TABLES]
+
+        if big_scans and entry['has_where']:
+            warnings += 1
+            print(f"\n🐢 ПОЛНЫЙ ПРОХОД: {', '.join(big_scans)}")
+            print(f"   📍 {entry['source']}")
+            print(f"   📝 {entry['query'][:200]}")
+            for detail in entry['plan']:
+                print(f"      • {detail}")
+        elif entry['full_scans']:
+            expected += 1
+            if verbose:
+                print(f"\nℹ️ Проход без фильтра: {entry['source']}")
+                print(f"   📝 {entry['query'][:200]}")
+        elif verbose:
+            print(f"\n✅ {entry['source']}")
+            for detail in entry['plan']:
+                print(f"      • {detail}")
+
+    print("\n" + "=" * 60)
+    print(f"📊 Запросов: {len(report)}")
+    print(f"🐢 Полных проходов с WHERE: {warnings}")
+    print(f"ℹ️ Проходов без фильтра (ожидаемо): {expected}")
+    print(f"❔ Не разобрано (нет таблицы и т.п.): {errors}")
+
+    return warnings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Советник по индексам SQLite")
+    parser.add_argument("--db", help="Путь к рабочей БД (открывается только на чтение)")
+    parser.add_argument("--verbose", action="store_true", help="Показать планы всех запросов")
+    args = parser.parse_args()
+
+    queries = collect_queries()
+    print(f"🔬 Найдено SQL-запросов: {len(queries)}")
+
+    if args.db:
+        uri = f"file:{Path(args.db).resolve().as_posix()}?mode=ro"
+        async with aiosqlite.connect(uri, uri=True) as connection:
+            report = await explain_queries(connection, queries)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = await build_schema(str(Path(tmp) / "advisor.db"))
+            try:
+                report = await db.analyze_queries(queries)
+            finally:
+                await db.close()
+
+    warnings = print_report(report, args.verbose)
+    sys.exit(1 if warnings else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
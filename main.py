@@ -13,6 +13,7 @@
 
 import asyncio
 import logging
+import signal
 import sys
 import os
 from pathlib import Path
@@ -81,11 +82,36 @@ try:
     from app.services.ai_service import AIService
     from app.services.analytics_service import AnalyticsService 
     from app.services.crypto_service import CryptoService
+    from app.services.http_client import HttpClient
     SERVICES_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Сервис {e.name} не найден")
     SERVICES_AVAILABLE = False
 
+# WEBHOOK
+try:
+    from app.services.webhook_service import WebhookServer
+    WEBHOOK_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Сервис {e.name} не найден")
+    WEBHOOK_AVAILABLE = False
+
+# НЕСКОЛЬКО ПРОЦЕССОВ
+try:
+    from app.services.sharding import ShardRouter, ShardRoutingMiddleware, ShardWorker
+    SHARDING_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Сервис {e.name} не найден")
+    SHARDING_AVAILABLE = False
+
+# РЕЗЕРВНОЕ КОПИРОВАНИЕ
+try:
+    from app.services.backup_service import BackupService
+    BACKUP_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Сервис {e.name} не найден")
+    BACKUP_AVAILABLE = False
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -111,8 +137,101 @@ async def setup_bot_commands(bot: Bot):
     await bot.set_my_commands(commands)
     logger.info("⚙️ Команды настроены")
 
-async def main():
-    """🚀 Основная функция запуска бота"""
+async def setup_modules(config, db_service, bot: Bot, primary: bool = True) -> dict:
+    """🧩 Создание и инициализация модулей (main, воркеры, replay_bench.py)
+    
+    primary=False - без задач в единственном экземпляре (резервные копии).
+    """
+    
+    modules = {
+        'config': config,
+        'db': db_service,
+        'bot': bot
+    }
+    
+    if BACKUP_AVAILABLE and primary:
+        print("💾 Запуск резервного копирования...")
+        modules['backup_service'] = BackupService(config, db_service)
+        await modules['backup_service'].start()
+    
+    # БАЗОВЫЕ СЕРВИСЫ
+    if SERVICES_AVAILABLE:
+        # Один пул соединений на процесс для всех внешних API
+        modules['http'] = HttpClient(config.http)
+        
+        print("🧠 Инициализация AI сервиса...")
+        if config.ai.openai_api_key or config.ai.anthropic_api_key:
+            modules['ai'] = AIService(config, modules['http'])
+            if config.ai.cache_persist:
+                await modules['ai'].response_cache.start(db_service)
+            print("  ✅ AI сервис активирован")
+        else:
+            print("  ⚠️ AI сервис отключен (нет ключей)")
+        
+        print("📊 Инициализация аналитики...")
+        modules['analytics_service'] = AnalyticsService(db_service)
+        
+        print("₿ Инициализация крипто...")
+        if config.crypto.enabled:
+            modules['crypto_service'] = CryptoService(config, modules['http'])
+            print("  ✅ Крипто активировано")
+    
+    # AI МОДУЛИ (ЧЕЛОВЕКОПОДОБНЫЙ AI)
+    if AI_MODULES_AVAILABLE:
+        print("🚀 Инициализация человекоподобного AI...")
+        
+        try:
+            # Human-like AI
+            modules['human_ai'] = HumanLikeAI(config)
+            print("  ✅ Human-like AI активирован")
+            
+            # Память диалогов
+            modules['conversation_memory'] = ConversationMemoryModule(db_service)
+            await modules['conversation_memory'].initialize()
+            print("  ✅ Память диалогов активирована")
+            
+            # Расширенные триггеры
+            modules['advanced_triggers'] = AdvancedTriggersModule(
+                db_service, config, modules.get('ai')
+            )
+            await modules['advanced_triggers'].initialize()
+            print("  ✅ Расширенные триггеры активированы")
+            
+            # Медиа триггеры
+            modules['media_triggers'] = MediaTriggersModule(
+                db_service, config, bot
+            )
+            await modules['media_triggers'].initialize()
+            print("  ✅ Медиа триггеры активированы")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка AI модулей: {e}")
+            print(f"⚠️ AI модули частично недоступны: {e}")
+    
+    # НОВЫЕ СИСТЕМЫ (ПЕРСОНАЖИ И КАРМА)
+    if PERSONA_KARMA_AVAILABLE:
+        print("🎭 Инициализация системы персонажей...")
+        try:
+            modules['custom_personality_manager'] = CustomPersonalityManager(
+                db_service, config, modules.get('ai')
+            )
+            await modules['custom_personality_manager'].initialize()
+            print("  ✅ Система персонажей активирована")
+        except Exception as e:
+            logger.error(f"❌ Ошибка персонажей: {e}")
+        
+        print("⚖️ Инициализация системы кармы...")
+        try:
+            modules['karma_manager'] = KarmaManager(db_service, config)
+            await modules['karma_manager'].initialize()
+            print("  ✅ Система кармы активирована")
+        except Exception as e:
+            logger.error(f"❌ Ошибка кармы: {e}")
+    
+    return modules
+
+async def main(shard: "ShardWorker" = None):
+    """🚀 Основная функция запуска бота (shard - процесс-воркер, см. run_sharded)"""
     
     print("🎭 ENHANCED TELEGRAM BOT v3.0 - ПЕРСОНАЖИ И КАРМА")
     print("🧠 С поддержкой произвольных персонажей и системой кармы")
@@ -149,6 +268,18 @@ async def main():
             input("Нажми Enter для выхода...")
             return
         
+        # НЕСКОЛЬКО ПРОЦЕССОВ: этот процесс только распределяет обновления
+        if shard is None and config.bot.worker_processes > 1:
+            if SHARDING_AVAILABLE:
+                await run_sharded(config)
+                return
+            print("⚠️ WORKER_PROCESSES > 1, но шардирование недоступно - запуск в одном процессе")
+        
+        # Резервные копии, архив, обслуживание БД и уведомления - в одном экземпляре
+        primary = shard is None or shard.primary
+        if not primary:
+            config.database.maintenance_enabled = False
+        
         bot = Bot(
             token=config.bot.token,
             default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
@@ -160,81 +291,22 @@ async def main():
         db_service = DatabaseService(config.database)
         await db_service.initialize()
         
-        # МОДУЛИ
-        modules = {
-            'config': config,
-            'db': db_service,
-            'bot': bot
-        }
-        
-        # БАЗОВЫЕ СЕРВИСЫ
-        if SERVICES_AVAILABLE:
-            print("🧠 Инициализация AI сервиса...")
-            if config.ai.openai_api_key or config.ai.anthropic_api_key:
-                modules['ai'] = AIService(config)
-                print("  ✅ AI сервис активирован")
-            else:
-                print("  ⚠️ AI сервис отключен (нет ключей)")
-            
-            print("📊 Инициализация аналитики...")
-            modules['analytics_service'] = AnalyticsService(db_service)
-            
-            print("₿ Инициализация крипто...")
-            if config.crypto.enabled:
-                modules['crypto_service'] = CryptoService(config)
-                print("  ✅ Крипто активировано")
+        # Перенос старых логов в архив - в фоне, чтобы не задерживать запуск
+        cleanup_task = None
+        if primary:
+            cleanup_task = asyncio.create_task(db_service.cleanup_expired_data())
         
-        # AI МОДУЛИ (ЧЕЛОВЕКОПОДОБНЫЙ AI)
-        if AI_MODULES_AVAILABLE:
-            print("🚀 Инициализация человекоподобного AI...")
-            
-            try:
-                # Human-like AI
-                modules['human_ai'] = HumanLikeAI(config)
-                print("  ✅ Human-like AI активирован")
-                
-                # Память диалогов
-                modules['conversation_memory'] = ConversationMemoryModule(db_service)
-                await modules['conversation_memory'].initialize()
-                print("  ✅ Память диалогов активирована")
-                
-                # Расширенные триггеры
-                modules['advanced_triggers'] = AdvancedTriggersModule(
-                    db_service, config, modules.get('ai')
-                )
-                await modules['advanced_triggers'].initialize()
-                print("  ✅ Расширенные триггеры активированы")
-                
-                # Медиа триггеры
-                modules['media_triggers'] = MediaTriggersModule(
-                    db_service, config, bot
-                )
-                await modules['media_triggers'].initialize()
-                print("  ✅ Медиа триггеры активированы")
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка AI модулей: {e}")
-                print(f"⚠️ AI модули частично недоступны: {e}")
+        # МОДУЛИ
+        modules = await setup_modules(config, db_service, bot, primary)
         
-        # НОВЫЕ СИСТЕМЫ (ПЕРСОНАЖИ И КАРМА)
-        if PERSONA_KARMA_AVAILABLE:
-            print("🎭 Инициализация системы персонажей...")
-            try:
-                modules['custom_personality_manager'] = CustomPersonalityManager(
-                    db_service, config, modules.get('ai')
-                )
-                await modules['custom_personality_manager'].initialize()
-                print("  ✅ Система персонажей активирована")
-            except Exception as e:
-                logger.error(f"❌ Ошибка персонажей: {e}")
-            
-            print("⚖️ Инициализация системы кармы...")
-            try:
-                modules['karma_manager'] = KarmaManager(db_service, config)
-                await modules['karma_manager'].initialize()
-                print("  ✅ Система кармы активирована")
-            except Exception as e:
-                logger.error(f"❌ Ошибка кармы: {e}")
+        # ИНВАЛИДАЦИЯ КЭШЕЙ: глобальные данные, измененные другим воркером
+        if shard:
+            if modules.get('advanced_triggers'):
+                modules['advanced_triggers'].invalidation = shard.bus
+                shard.bus.subscribe('custom_triggers', modules['advanced_triggers'].refresh_trigger)
+            if modules.get('media_triggers'):
+                modules['media_triggers'].invalidation = shard.bus
+                shard.bus.subscribe('media_content', modules['media_triggers'].refresh_media)
         
         # РЕГИСТРАЦИЯ ОБРАБОТЧИКОВ
         print("🎛️ Регистрация обработчиков...")
@@ -259,10 +331,11 @@ async def main():
             return
         
         # Настройка команд
-        await setup_bot_commands(bot)
+        if primary:
+            await setup_bot_commands(bot)
         
         # УВЕДОМЛЕНИЯ АДМИНОВ
-        if config.bot.admin_ids:
+        if config.bot.admin_ids and primary:
             features = []
             
             if AI_MODULES_AVAILABLE:
@@ -322,17 +395,58 @@ async def main():
         
         print("\n💡 Для остановки: Ctrl+C")
         
+        webhook_server = None
+        if shard is None and config.webhook.enabled and not WEBHOOK_AVAILABLE:
+            print("⚠️ BOT_MODE=webhook, но aiohttp-сервер недоступен - запуск в режиме polling")
+        
         try:
-            await dp.start_polling(bot, skip_updates=True)
+            if shard:
+                print(f"\n🧩 РЕЖИМ: ВОРКЕР {shard.index + 1}/{shard.count}")
+                await shard.run(dp, bot, modules)
+            elif config.webhook.enabled and WEBHOOK_AVAILABLE:
+                print(f"\n🌐 РЕЖИМ: WEBHOOK ({config.webhook.host}:{config.webhook.port}{config.webhook.path})")
+                webhook_server = WebhookServer(config.webhook, dp, bot, modules)
+                modules['webhook_server'] = webhook_server
+                await webhook_server.start()
+                await webhook_server.wait()
+            else:
+                await dp.start_polling(bot, skip_updates=True)
         except KeyboardInterrupt:
             print("\n⏸️ Остановка...")
         finally:
             print("🛑 Остановка бота...")
             
+            if webhook_server:
+                # Новые обновления - 503, принятые дорабатывают до закрытия БД
+                await webhook_server.stop()
+            
             # Закрытие сервисов
             if modules.get('crypto_service'):
                 await modules['crypto_service'].close()
+            if modules.get('backup_service'):
+                await modules['backup_service'].close()
+            if modules.get('ai'):
+                # Несохраненные записи кэша ответов - до закрытия БД
+                await modules['ai'].close()
+            if modules.get('http'):
+                # Соединения с внешними API - после сервисов, которые ими пользуются
+                await modules['http'].close()
+            if modules.get('media_triggers'):
+                # Счетчики и кулдауны медиа триггеров копятся в памяти
+                await modules['media_triggers'].close()
+            if cleanup_task and not cleanup_task.done():
+                # Архивация прерывается после текущей пачки
+                if db_service.archive:
+                    db_service.archive.stop()
+                await cleanup_task
+            if modules.get('update_pipeline'):
+                # Фоновое логирование сообщений, принятых до остановки
+                await modules['update_pipeline'].stop()
             if modules.get('db'):
+                # Дописываем накопленные логи сообщений до закрытия БД
+                flushed = await modules['db'].flush_writes()
+                if flushed:
+                    print(f"💾 Сохранено отложенных записей: {flushed}")
                 await modules['db'].close()
             await bot.session.close()
             
@@ -347,6 +461,57 @@ async def main():
         print("  3. Наличие файлов модулей")
         input("\nНажми Enter для выхода...")
 
+async def run_sharded(config):
+    """🧩 Маршрутизатор: обновления распределяются по процессам-воркерам по id чата"""
+    
+    workers = config.bot.worker_processes
+    print(f"🧩 РЕЖИМ: {workers} ВОРКЕРОВ")
+    
+    # Миграции - до запуска воркеров, чтобы они не применяли их одновременно
+    print("💾 Миграции базы данных...")
+    await DatabaseService(config.database).migrate()
+    
+    bot = Bot(
+        token=config.bot.token,
+        default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
+    )
+    
+    router = ShardRouter(workers, run_shard)
+    dp = Dispatcher()
+    dp.update.outer_middleware(ShardRoutingMiddleware(router))
+    
+    router.start()
+    print("⏳ Ожидание воркеров...")
+    allowed_updates = await router.wait_ready()
+    
+    webhook_server = None
+    try:
+        if config.webhook.enabled and WEBHOOK_AVAILABLE:
+            print(f"🌐 WEBHOOK: {config.webhook.host}:{config.webhook.port}{config.webhook.path}")
+            webhook_server = WebhookServer(
+                config.webhook, dp, bot, {'shard_router': router}, allowed_updates=allowed_updates
+            )
+            await webhook_server.start()
+            await webhook_server.wait()
+        else:
+            print("\n💡 Для остановки: Ctrl+C")
+            await dp.start_polling(bot, skip_updates=True, allowed_updates=allowed_updates)
+    except KeyboardInterrupt:
+        print("\n⏸️ Остановка...")
+    finally:
+        print("🛑 Остановка воркеров...")
+        if webhook_server:
+            await webhook_server.stop()
+        await router.stop(timeout=config.webhook.drain_timeout + 30)
+        await bot.session.close()
+        print("✅ Бот остановлен")
+
+def run_shard(index: int, count: int, inbox, outbox):
+    """🧩 Точка входа процесса-воркера"""
+    # Ctrl+C получает вся группа процессов - воркер останавливает маршрутизатор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(main(ShardWorker(index, count, inbox, outbox)))
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
@@ -0,0 +1,214 @@
+"""
+💾 0001 - Схема ядра: пользователи, чаты, логи, настройки, модерация
+"""
+
+TABLES = [
+    # Пользователи
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        username TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        full_name TEXT,
+        language_code TEXT,
+        is_premium BOOLEAN DEFAULT FALSE,
+        is_bot BOOLEAN DEFAULT FALSE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    # Чаты
+    """
+    CREATE TABLE IF NOT EXISTS chats (
+        id INTEGER PRIMARY KEY,
+        type TEXT NOT NULL,
+        title TEXT,
+        username TEXT,
+        description TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    # ЛОГИРОВАНИЕ СООБЩЕНИЙ (НОВАЯ ТАБЛИЦА)
+    """
+    CREATE TABLE IF NOT EXISTS chat_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        username TEXT,
+        full_name TEXT,
+        text TEXT,
+        message_type TEXT DEFAULT 'text',
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    # Сообщения
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_id INTEGER,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        text TEXT,
+        message_type TEXT DEFAULT 'text',
+        reply_to_message_id INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id)
+    )
+    """,
+    
+    # Действия пользователей
+    """
+    CREATE TABLE IF NOT EXISTS user_actions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER,
+        action TEXT NOT NULL,
+        details TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id)
+    )
+    """,
+    
+    # Системные настройки
+    """
+    CREATE TABLE IF NOT EXISTS system_settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_by INTEGER,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    # AI взаимодействия
+    """
+    CREATE TABLE IF NOT EXISTS ai_interactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER,
+        prompt TEXT NOT NULL,
+        response TEXT,
+        model_used TEXT,
+        tokens_used INTEGER,
+        response_time REAL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id)
+    )
+    """,
+    
+    # Память диалогов
+    """
+    CREATE TABLE IF NOT EXISTS memory_contexts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER,
+        context_key TEXT NOT NULL,
+        context_value TEXT NOT NULL,
+        expires_at DATETIME,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id)
+    )
+    """,
+    
+    # Триггеры
+    """
+    CREATE TABLE IF NOT EXISTS triggers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER,
+        user_id INTEGER NOT NULL,
+        trigger_text TEXT NOT NULL,
+        response_text TEXT NOT NULL,
+        is_regex BOOLEAN DEFAULT FALSE,
+        is_global BOOLEAN DEFAULT FALSE,
+        is_active BOOLEAN DEFAULT TRUE,
+        usage_count INTEGER DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id)
+    )
+    """,
+    
+    # Модерация - баны
+    """
+    CREATE TABLE IF NOT EXISTS bans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER,
+        admin_id INTEGER NOT NULL,
+        reason TEXT,
+        ban_type TEXT DEFAULT 'permanent',
+        expires_at DATETIME,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id),
+        FOREIGN KEY (admin_id) REFERENCES users (id)
+    )
+    """,
+    
+    # Модерация - предупреждения
+    """
+    CREATE TABLE IF NOT EXISTS warnings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        admin_id INTEGER NOT NULL,
+        reason TEXT,
+        severity_level INTEGER DEFAULT 1,
+        is_active BOOLEAN DEFAULT TRUE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (chat_id) REFERENCES chats (id),
+        FOREIGN KEY (admin_id) REFERENCES users (id)
+    )
+    """,
+    
+    # Аналитика поведения
+    """
+    CREATE TABLE IF NOT EXISTS behavior_patterns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        pattern_type TEXT NOT NULL,
+        pattern_data TEXT NOT NULL,
+        confidence REAL DEFAULT 0.0,
+        last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """
+]
+
+INDEXES = [
+    # Индексы для логирования
+    "CREATE INDEX IF NOT EXISTS idx_chat_logs_user ON chat_logs(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_logs_chat ON chat_logs(chat_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_logs_timestamp ON chat_logs(timestamp)",
+    
+    # Основные индексы
+    "CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages(chat_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_user_actions_user ON user_actions(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_interactions_user ON ai_interactions(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_memory_contexts_user ON memory_contexts(user_id, chat_id)",
+    "CREATE INDEX IF NOT EXISTS idx_memory_contexts_key ON memory_contexts(user_id, chat_id, context_key)",
+    "CREATE INDEX IF NOT EXISTS idx_memory_contexts_expires ON memory_contexts(expires_at)",
+    "CREATE INDEX IF NOT EXISTS idx_triggers_active ON triggers(is_active, chat_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bans_active ON bans(is_active, user_id, chat_id)",
+    "CREATE INDEX IF NOT EXISTS idx_warnings_active ON warnings(is_active, user_id, chat_id)",
+    "CREATE INDEX IF NOT EXISTS idx_behavior_user ON behavior_patterns(user_id, pattern_type)"
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
+    await m.execute_all(INDEXES)
@@ -0,0 +1,68 @@
+"""
+⚖️ 0002 - Карма: баланс, история, настройки, достижения
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS user_karma (
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        karma INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        total_positive INTEGER DEFAULT 0,
+        total_negative INTEGER DEFAULT 0,
+        message_count INTEGER DEFAULT 0,
+        last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, chat_id)
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS karma_actions (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        action_type TEXT NOT NULL,
+        karma_change INTEGER NOT NULL,
+        reason TEXT,
+        moderator_id INTEGER,
+        message_id INTEGER,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS karma_settings (
+        chat_id INTEGER PRIMARY KEY,
+        settings_json TEXT NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS karma_achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        achievement_type TEXT NOT NULL,
+        achieved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        karma_bonus INTEGER DEFAULT 0
+    )
+    """
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_karma_user_chat ON user_karma (user_id, chat_id)",
+    "CREATE INDEX IF NOT EXISTS idx_karma_actions_user ON karma_actions (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_karma_actions_chat ON karma_actions (chat_id, timestamp)",
+    # Топ и статистика по чату
+    "CREATE INDEX IF NOT EXISTS idx_karma_chat_karma ON user_karma (chat_id, karma)",
+    # Проверка достижений при каждом начислении
+    "CREATE INDEX IF NOT EXISTS idx_karma_achievements_user ON karma_achievements (user_id, chat_id, achievement_type)"
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
+    await m.execute_all(INDEXES)
@@ -0,0 +1,55 @@
+"""
+⚡ 0003 - Расширенные триггеры и журнал срабатываний
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS custom_triggers (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        trigger_type TEXT NOT NULL,
+        trigger_pattern TEXT NOT NULL,
+        actions TEXT NOT NULL,  -- JSON
+        probability REAL DEFAULT 1.0,
+        cooldown REAL DEFAULT 0.0,
+        allowed_chats TEXT,  -- JSON
+        allowed_users TEXT,  -- JSON
+        is_active BOOLEAN DEFAULT TRUE,
+        created_by INTEGER DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        usage_count INTEGER DEFAULT 0,
+        success_rate REAL DEFAULT 0.0,
+        last_used DATETIME
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS trigger_usage_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        trigger_id TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        message_text TEXT,
+        success BOOLEAN DEFAULT FALSE,
+        response_text TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (trigger_id) REFERENCES custom_triggers (id)
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS trigger_stats_daily (
+        date DATE PRIMARY KEY,
+        total_activations INTEGER DEFAULT 0,
+        successful_activations INTEGER DEFAULT 0,
+        unique_users INTEGER DEFAULT 0,
+        unique_chats INTEGER DEFAULT 0,
+        stats_data TEXT  -- JSON
+    )
+    """
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
@@ -0,0 +1,56 @@
+"""
+🎭 0004 - Медиа-контент и медиа-триггеры
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS media_content (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,  -- sticker, gif, emoji, audio, voice
+        content TEXT NOT NULL,  -- file_id или путь
+        description TEXT,
+        tags TEXT,  -- JSON
+        emotion TEXT DEFAULT 'neutral',
+        context TEXT DEFAULT 'general',
+        usage_count INTEGER DEFAULT 0,
+        success_rate REAL DEFAULT 0.0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS media_triggers (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        trigger_type TEXT NOT NULL,  -- emotion, keyword, context, time
+        trigger_pattern TEXT NOT NULL,
+        media_type TEXT NOT NULL,
+        media_content TEXT NOT NULL,
+        probability REAL DEFAULT 1.0,
+        cooldown REAL DEFAULT 0.0,
+        allowed_chats TEXT,  -- JSON
+        allowed_users TEXT,  -- JSON
+        is_active BOOLEAN DEFAULT TRUE,
+        usage_count INTEGER DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS sticker_responses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        input_sticker_id TEXT,
+        input_emotion TEXT,
+        response_type TEXT,  -- sticker, gif, emoji
+        response_content TEXT,
+        confidence REAL DEFAULT 0.8,
+        usage_count INTEGER DEFAULT 0,
+        success_rate REAL DEFAULT 0.0
+    )
+    """
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
@@ -0,0 +1,80 @@
+"""
+💭 0005 - Память диалогов: профили, воспоминания, факты, связи
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id INTEGER PRIMARY KEY,
+        name TEXT,
+        interests TEXT,  -- JSON
+        personality_traits TEXT,  -- JSON
+        preferred_topics TEXT,  -- JSON
+        communication_style TEXT,
+        relationship_level TEXT,
+        last_interaction DATETIME,
+        total_messages INTEGER DEFAULT 0,
+        favorite_emojis TEXT,  -- JSON
+        time_zone TEXT,
+        language_preference TEXT DEFAULT 'ru',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS conversation_memories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        chat_id INTEGER,
+        topic TEXT,
+        summary TEXT,
+        key_facts TEXT,  -- JSON
+        emotional_tone TEXT,
+        importance_score REAL,
+        related_users TEXT,  -- JSON
+        timestamp DATETIME,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS personal_facts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        category TEXT,
+        fact TEXT,
+        confidence REAL,
+        source TEXT,
+        relevance_score REAL DEFAULT 1.0,
+        timestamp DATETIME,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    """,
+    
+    """
+    CREATE TABLE IF NOT EXISTS user_relationships (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user1_id INTEGER,
+        user2_id INTEGER,
+        relationship_type TEXT,
+        strength REAL DEFAULT 0.5,
+        context TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user1_id) REFERENCES users (id),
+        FOREIGN KEY (user2_id) REFERENCES users (id)
+    )
+    """
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_conversation_memories_user ON conversation_memories(user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_conversation_memories_timestamp ON conversation_memories(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_personal_facts_user ON personal_facts(user_id, category)",
+    "CREATE INDEX IF NOT EXISTS idx_user_relationships ON user_relationships(user1_id, user2_id)"
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
+    await m.execute_all(INDEXES)
@@ -0,0 +1,29 @@
+"""
+🎭 0006 - Пользовательские персонажи (v3.2, только группы)
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS custom_personalities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        admin_id INTEGER NOT NULL,
+        personality_name TEXT NOT NULL,
+        personality_description TEXT NOT NULL,
+        system_prompt TEXT NOT NULL,
+        is_active BOOLEAN DEFAULT FALSE,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """
+]
+
+# Индекс по admin_id - в 0007: в старых БД этой колонки еще нет
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_personalities_chat_active ON custom_personalities(chat_id, is_active)"
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
+    await m.execute_all(INDEXES)
@@ -0,0 +1,46 @@
+"""
+🔧 0007 - Колонки v3.2 для custom_personalities из старых версий
+
+Заменяет скрипты migrate_database.py, migrate_v3_2_1.py и add_updated_at.py
+(is_group_personality не переносится: признак вычисляется из chat_id).
+На новой схеме ничего не делает: все колонки уже есть, дозаполнять нечего.
+"""
+
+# ADD COLUMN не принимает DEFAULT CURRENT_TIMESTAMP - updated_at дозаполняется ниже
+LEGACY_COLUMNS = [
+    ('admin_id', 'INTEGER DEFAULT 0'),
+    ('personality_name', "TEXT DEFAULT ''"),
+    ('personality_description', "TEXT DEFAULT ''"),
+    ('updated_at', 'DATETIME'),
+]
+
+
+async def upgrade(m):
+    for column, definition in LEGACY_COLUMNS:
+        await m.add_column('custom_personalities', column, definition)
+    
+    columns = await m.columns('custom_personalities')
+    
+    # До v3.2 персонажа создавал пользователь, а не админ
+    if 'user_id' in columns:
+        await m.backfill(
+            'custom_personalities',
+            "admin_id = user_id",
+            "admin_id = 0 OR admin_id IS NULL"
+        )
+    
+    # До v3.2 было одно поле description
+    if 'description' in columns:
+        await m.backfill(
+            'custom_personalities',
+            "personality_name = SUBSTR(description, 1, 50), personality_description = description",
+            "personality_name = '' OR personality_name IS NULL"
+        )
+    
+    await m.backfill(
+        'custom_personalities',
+        "updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
+        "updated_at IS NULL"
+    )
+    
+    await m.execute("CREATE INDEX IF NOT EXISTS idx_personalities_admin ON custom_personalities(admin_id, chat_id)")
@@ -0,0 +1,22 @@
+"""
+🎭 0008 - Состояние медиа-триггеров: время последнего срабатывания и кулдауны
+
+Счетчики и кулдауны живут в памяти MediaTriggersModule и сбрасываются
+сюда пачками, чтобы кулдауны переживали перезапуск бота.
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS media_trigger_cooldowns (
+        trigger_id TEXT NOT NULL,
+        chat_id INTEGER NOT NULL,
+        expires_at REAL NOT NULL,  -- unix time
+        PRIMARY KEY (trigger_id, chat_id)
+    )
+    """
+]
+
+
+async def upgrade(m):
+    await m.add_column('media_triggers', 'last_used', 'DATETIME')
+    await m.execute_all(TABLES)
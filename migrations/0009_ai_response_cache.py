@@ -0,0 +1,27 @@
+"""
+🧠 0009 - Кэш ответов AI между перезапусками
+
+ResponseCache держит ответы в памяти и сбрасывает новые записи сюда
+пачками (AI_CACHE_PERSIST=true); при запуске подгружает неистекшие.
+"""
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS ai_response_cache (
+        cache_key TEXT PRIMARY KEY,  -- sha256 нормализованного промпта и контекста
+        scope TEXT NOT NULL,         -- хеш контекста (персонаж, модель, история)
+        prompt TEXT NOT NULL,        -- нормализованный промпт (для похожих запросов)
+        response TEXT NOT NULL,
+        expires_at REAL NOT NULL     -- unix time
+    )
+    """
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_ai_response_cache_expires ON ai_response_cache(expires_at)"
+]
+
+
+async def upgrade(m):
+    await m.execute_all(TABLES)
+    await m.execute_all(INDEXES)
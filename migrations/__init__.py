@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+🧬 МИГРАЦИИ СХЕМЫ БАЗЫ ДАННЫХ
+
+Каждая миграция - файл NNNN_описание.py в этой папке с функцией
+async def upgrade(m: MigrationContext). Номер из имени файла - версия схемы.
+Примененные версии записываются в таблицу schema_version.
+
+Правила:
+• Примененные файлы не редактируются - изменения схемы только новым файлом
+• Миграции идемпотентны (IF NOT EXISTS, add_column с проверкой): миграция
+  с backfill коммитит каждую пачку и после сбоя просто перезапускается
+• Большие UPDATE - только через m.backfill(): пачки выполняются после
+  фиксации DDL миграции
+• SQL пишется в диалекте SQLite, бэкенд хранилища переводит его
+
+При запуске без изменений проверка стоит один запрос (MAX(version)).
+"""
+
+import importlib
+import logging
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent
+_FILE_RE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+# Размер пачки для backfill: короткие транзакции не блокируют БД надолго
+BACKFILL_BATCH_SIZE = 1000
+
+
+@dataclass
+class Migration:
+    """📄 Файл миграции"""
+    version: int
+    name: str
+
+    @property
+    def module_name(self) -> str:
+        return f"{__name__}.{self.version:04d}_{self.name}"
+
+    def load(self):
+        """📥 Импорт модуля миграции"""
+        module = importlib.import_module(self.module_name)
+        if not hasattr(module, 'upgrade'):
+            raise RuntimeError(f"В миграции {self.module_name} нет функции upgrade()")
+        return module
+
+
+def discover_migrations() -> List[Migration]:
+    """🔎 Список миграций по возрастанию версии"""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.py"):
+        match = _FILE_RE.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2)))
+
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Повторяющиеся номера миграций: {versions}")
+    return migrations
+
+
+class MigrationContext:
+    """🛠️ Помощники для кода миграций (SQL пишется в диалекте SQLite)"""
+    
+    def __init__(self, backend, batch_size: int = BACKFILL_BATCH_SIZE):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.backfilled_rows = 0
+        self._backfills: List[Tuple[str, str, str, tuple, int]] = []
+
+    async def execute(self, sql: str, params: tuple = ()):
+        """⚡ Выполнение одного выражения"""
+        await self.backend.execute(sql, params)
+
+    async def execute_all(self, statements: Iterable[str]):
+        """⚡ Выполнение списка выражений (DDL)"""
+        for sql in statements:
+            await self.backend.execute(sql)
+
+    async def table_exists(self, table: str) -> bool:
+        """🔎 Есть ли таблица"""
+        return await self.backend.table_exists(table)
+
+    async def columns(self, table: str) -> List[str]:
+        """📋 Колонки таблицы"""
+        return await self.backend.table_columns(table)
+
+    async def add_column(self, table: str, column: str, definition: str) -> bool:
+        """➕ Добавление колонки, если ее еще нет
+
+        SQLite не разрешает ADD COLUMN с неконстантным DEFAULT
+        (например CURRENT_TIMESTAMP) - такие значения заполняйте через backfill().
+        """
+        if column in await self.columns(table):
+            return False
+        await self.backend.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"➕ {table}.{column} добавлена")
+        return True
+
+    async def backfill(self, table: str, assignments: str, where: str,
+                       params: tuple = (), batch_size: int = None):
+        """🔁 UPDATE пачками, каждая пачка - своя транзакция
+
+        Выполняется после фиксации DDL миграции, в порядке вызовов.
+        """
+        self._backfills.append((table, assignments, where, params, batch_size or self.batch_size))
+
+    async def run_backfills(self) -> int:
+        """🔁 Выполнение отложенных backfill()"""
+        while self._backfills:
+            table, assignments, where, params, batch_size = self._backfills.pop(0)
+            updated = await self.backend.backfill(table, assignments, where, params, batch_size)
+            self.backfilled_rows += updated
+            if updated:
+                logger.info(f"🔁 {table}: дозаполнено строк {updated}")
+        return self.backfilled_rows
+
+
+async def get_schema_version(backend) -> int:
+    """🔢 Текущая версия схемы (0 - миграции еще не применялись)"""
+    try:
+        row = await backend.fetch_one("SELECT MAX(version) FROM schema_version", row_shape='tuple')
+        return (row[0] if row else 0) or 0
+    except Exception:
+        # Таблицы schema_version еще нет
+        return 0
+
+
+async def _applied_versions(backend) -> set:
+    """📋 Все примененные версии"""
+    await backend.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    """)
+
+    rows = await backend.fetch_all("SELECT version FROM schema_version", row_shape='tuple')
+    return {row[0] for row in rows}
+
+
+async def pending_migrations(backend) -> Tuple[int, List[Migration]]:
+    """📋 Текущая версия и список непримененных миграций"""
+    migrations = discover_migrations()
+    if not migrations:
+        return 0, []
+
+    # Быстрый путь: схема актуальна - один запрос
+    current = await get_schema_version(backend)
+    if current >= migrations[-1].version:
+        return current, []
+
+    applied = await _applied_versions(backend)
+    return current, [migration for migration in migrations if migration.version not in applied]
+
+
+async def run_migrations(backend) -> List[int]:
+    """🧬 Применение всех непримененных миграций, возвращает их версии
+
+    backend - StorageBackend (storage.create_backend).
+    """
+    current, pending = await pending_migrations(backend)
+    if not pending:
+        logger.info(f"🧬 Схема актуальна (версия {current})")
+        return []
+
+    applied = []
+    for migration in pending:
+        module = migration.load()
+        context = MigrationContext(backend)
+        started = time.perf_counter()
+
+        logger.info(f"🧬 Миграция {migration.version:04d}_{migration.name}...")
+        try:
+            async with backend.transaction():
+                await module.upgrade(context)
+
+            # Версия записывается только после дозаполнения: при сбое
+            # миграция перезапустится и продолжит с недозаполненных строк
+            await context.run_backfills()
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            await backend.execute(
+                "INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                (migration.version, migration.name, round(elapsed_ms, 2))
+            )
+        except Exception as e:
+            logger.error(f"❌ Миграция {migration.version:04d}_{migration.name} не применена: {e}")
+            raise
+
+        applied.append(migration.version)
+        logger.info(f"✅ Миграция {migration.version:04d} применена за {elapsed_ms:.0f} мс")
+
+    return applied
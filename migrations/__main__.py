@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+🧬 Применение миграций вручную
+
+Использование:
+    python -m migrations                  # применить к data/bot.db
+    python -m migrations --db path/to.db  # другая БД
+    python -m migrations --status         # только показать версию и очередь
+    python -m migrations --backend postgres --dsn postgresql://...
+"""
+
+import argparse
+import asyncio
+import logging
+
+from config import DatabaseConfig
+from migrations import pending_migrations, run_migrations
+from storage import create_backend
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument("--db", default="data/bot.db", help="Путь к БД")
+    parser.add_argument("--backend", default="sqlite", help="Бэкенд: sqlite или postgres")
+    parser.add_argument("--dsn", default="", help="Строка подключения PostgreSQL")
+    parser.add_argument("--status", action="store_true", help="Только показать состояние")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    backend = create_backend(DatabaseConfig(
+        path=args.db, backend=args.backend, dsn=args.dsn, read_pool_size=0, pool_min_size=1
+    ))
+    await backend.connect()
+    try:
+        current, pending = await pending_migrations(backend)
+        print(f"🔢 Версия схемы: {current}")
+
+        if not pending:
+            print("✅ Непримененных миграций нет")
+            return
+
+        print("📋 Ожидают применения:")
+        for migration in pending:
+            print(f"  • {migration.version:04d}_{migration.name}")
+
+        if args.status:
+            return
+
+        applied = await run_migrations(backend)
+        print(f"✅ Применено миграций: {len(applied)}")
+    finally:
+        await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+🏎️ REPLAY BENCH - прогон обновлений через настоящий Dispatcher без сети
+
+Поднимает полный набор модулей (как main.py) на временной БД, подменяет
+сессию Bot заглушкой (ответы Telegram API создаются на месте, запросы
+считаются) и подает обновления в Dispatcher. AI-ключи и крипто
+отключаются - внешних запросов нет.
+
+Источник обновлений:
+    --updates FILE.jsonl    записанные обновления: одна строка - один Update
+                            в JSON (как их присылает Telegram в getUpdates
+                            или webhook)
+    --synthetic N           N сгенерированных обновлений: текст, команды,
+                            упоминания, стикеры в --chats чатах
+
+Режимы нагрузки:
+    (по умолчанию)          максимальная пропускная способность, не больше
+                            --concurrency обновлений одновременно
+    --rate R                фиксированный темп R обновлений/с; задержка
+                            считается от запланированного момента подачи
+
+Отчет: p50/p95/p99 обработки обновления, обновлений/с, коммиты БД, пик
+памяти, разбивка по обработчикам и по методам модулей (время методов
+модулей - включающее: вложенные вызовы учитываются и у вызывающего).
+
+Использование:
+    python replay_bench.py --synthetic 2000
+    python replay_bench.py --updates data/updates.jsonl --rate 50
+    python replay_bench.py --synthetic 2000 --json bench.json
+    python replay_bench.py --synthetic 2000 --baseline bench.json   # код 1 при регрессии
+"""
+
+import argparse
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.types import Message, User
+
+from config import load_config
+from database import DatabaseService
+from main import setup_modules, register_all_handlers
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BOT_ID = 100500
+BOT_USERNAME = "bench_bot"
+
+# Модули, методы которых не замеряются
+SKIP_MODULES = {"config", "bot", "http"}
+
+
+# =================== ЗАГЛУШКА TELEGRAM API ===================
+
+class ReplaySession(BaseSession):
+    """🧪 Сессия Bot без сети: ответы API создаются на месте"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._message_id = 0
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        returning = method.__returning__
+        if returning is bool:
+            return True
+        if returning is User:
+            return User(id=BOT_ID, is_bot=True, first_name="Bench", username=BOT_USERNAME)
+        if returning is Message:
+            self._message_id += 1
+            chat_id = getattr(method, 'chat_id', 0)
+            return Message.model_validate({
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id if isinstance(chat_id, int) else 0, 'type': 'private'},
+                'from': {'id': BOT_ID, 'is_bot': True, 'first_name': 'Bench'},
+                'text': getattr(method, 'text', None)
+            }, context={'bot': bot})
+        return None
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+# =================== ЗАМЕРЫ ===================
+
+class Timings:
+    """⏱️ Длительности по ключам (мс)"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def add(self, key: str, elapsed_ms: float):
+        self.samples[key].append(elapsed_ms)
+
+    def summary(self, key: str) -> Dict[str, Any]:
+        return summarize(self.samples[key], self.errors.get(key, 0))
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(values: List[float], errors: int = 0) -> Dict[str, Any]:
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'errors': errors,
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'max_ms': round(ordered[-1], 3) if ordered else 0.0,
+        'total_ms': round(sum(ordered), 3)
+    }
+
+
+class HandlerTimer(BaseMiddleware):
+    """⏱️ Время каждого обработчика (внутренний middleware Dispatcher)"""
+
+    def __init__(self, timings: Timings):
+        self.timings = timings
+
+    async def __call__(self, handler, event, data: Dict[str, Any]):
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.timings.errors[name] += 1
+            raise
+        finally:
+            self.timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+def instrument_modules(modules: Dict[str, Any], timings: Timings) -> int:
+    """🔧 Замер публичных async-методов модулей; возвращает число методов"""
+    wrapped = 0
+    for module_name, module in modules.items():
+        if module_name in SKIP_MODULES or module is None:
+            continue
+        for attr in dir(type(module)):
+            if attr.startswith('_'):
+                continue
+            if not inspect.iscoroutinefunction(getattr(type(module), attr, None)):
+                continue
+            try:
+                setattr(module, attr, _timed(f"{module_name}.{attr}", getattr(module, attr), timings))
+                wrapped += 1
+            except (AttributeError, TypeError):
+                # __slots__ или свойство только для чтения
+                pass
+    return wrapped
+
+
+def _timed(key: str, method, timings: Timings):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            timings.errors[key] += 1
+            raise
+        finally:
+            timings.add(key, (time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def peak_rss_mb() -> Optional[float]:
+    """📈 Пиковый RSS процесса (Linux - КБ, macOS - байты)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+# =================== ОБНОВЛЕНИЯ ===================
+
+SYNTHETIC_TEXTS = [
+    "привет всем", "как дела?", "спасибо большое", "помоги с кодом на python",
+    "это просто обычное сообщение без триггеров", "круто, ура!", "пока, до завтра",
+    "мне сегодня грустно", "бот, что думаешь?", "кто-нибудь видел новости",
+    "утро доброе", "лол", "ну такое", "а есть документация?", "отлично получилось"
+]
+SYNTHETIC_COMMANDS = ["/start", "/help", "/karma", "/current_persona"]
+SYNTHETIC_STICKERS = ["😂", "😢", "😡", "❤️", "👍", "🔥"]
+
+
+def synthetic_updates(count: int, chats: int, users: int, seed: int) -> List[Dict[str, Any]]:
+    """🎲 Смесь обновлений: текст, упоминания, команды, стикеры"""
+    rng = random.Random(seed)
+    chat_ids = [-(1000000000000 + index) for index in range(max(1, chats // 2))]
+    user_ids = [10_000 + index for index in range(max(1, users))]
+    updates = []
+
+    for update_id in range(1, count + 1):
+        user_id = rng.choice(user_ids)
+        # Половина чатов - группы, остальное - личные сообщения
+        if rng.random() < 0.5 and chats > 1:
+            chat = {'id': user_id, 'type': 'private', 'first_name': f'user{user_id}'}
+        else:
+            chat = {'id': rng.choice(chat_ids), 'type': 'supergroup', 'title': 'bench'}
+
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': chat,
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}', 'language_code': 'ru'}
+        }
+
+        roll = rng.random()
+        if roll < 0.08:
+            message['text'] = rng.choice(SYNTHETIC_COMMANDS)
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(message['text'])}]
+        elif roll < 0.16:
+            message['sticker'] = {
+                'file_id': f'sticker{update_id}', 'file_unique_id': f'u{update_id}', 'type': 'regular',
+                'width': 512, 'height': 512, 'is_animated': False, 'is_video': False,
+                'emoji': rng.choice(SYNTHETIC_STICKERS)
+            }
+        elif roll < 0.24:
+            message['text'] = f"@{BOT_USERNAME} {rng.choice(SYNTHETIC_TEXTS)}"
+        else:
+            message['text'] = rng.choice(SYNTHETIC_TEXTS)
+
+        updates.append({'update_id': update_id, 'message': message})
+
+    return updates
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    """📥 Записанные обновления (JSONL); строки без update_id пропускаются"""
+    updates = []
+    skipped = 0
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if isinstance(data, dict) and 'update_id' in data:
+                updates.append(data)
+            else:
+                skipped += 1
+
+    if skipped:
+        print(f"⚠️ Пропущено строк без update_id: {skipped}")
+    return updates
+
+
+# =================== ПРОГОН ===================
+
+async def build_bot(args, db_path: str):
+    """🏗️ Модули и Dispatcher как в main.py, но без сети и на временной БД"""
+    config = load_config()
+    config.bot.token = "123456:BENCH"
+    config.bot.admin_ids = config.bot.admin_ids or [1]
+    config.bot.allowed_chat_ids = []
+    config.ai.openai_api_key = ""
+    config.ai.anthropic_api_key = ""
+    config.crypto.enabled = False
+    config.database.path = db_path
+    config.database.maintenance_enabled = False
+
+    session = ReplaySession(latency=args.api_latency_ms / 1000)
+    bot = Bot(token=config.bot.token, session=session,
+              default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN))
+    dp = Dispatcher()
+
+    db_service = DatabaseService(config.database)
+    await db_service.initialize()
+
+    modules = await setup_modules(config, db_service, bot, primary=False)
+    return config, bot, dp, session, modules
+
+
+async def replay(dp: Dispatcher, bot: Bot, updates: List[Dict[str, Any]], rate: float,
+                 concurrency: int, timings: Timings) -> float:
+    """▶️ Подача обновлений; возвращает длительность прогона (с)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    async def feed(raw: Dict[str, Any], planned: float):
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception:
+            timings.errors['update'] += 1
+        finally:
+            timings.add('update', (time.perf_counter() - planned) * 1000)
+            semaphore.release()
+
+    started = time.perf_counter()
+    for index, raw in enumerate(updates):
+        if rate:
+            # Открытый цикл: момент подачи не зависит от скорости обработки
+            planned = started + index / rate
+            delay = planned - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            planned = time.perf_counter()
+        await semaphore.acquire()
+        if not rate:
+            planned = time.perf_counter()
+        tasks.append(asyncio.create_task(feed(raw, planned)))
+
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - started
+
+
+def commit_count(db_service: DatabaseService) -> int:
+    stats = db_service.get_pool_stats().get('transactions', {})
+    return stats.get('committed', 0) + stats.get('autocommitted', 0)
+
+
+async def run(args) -> Dict[str, Any]:
+    if args.updates:
+        updates = load_updates(args.updates)
+    else:
+        updates = synthetic_updates(args.synthetic, args.chats, args.users, args.seed)
+    if not updates:
+        raise SystemExit("❌ Нет обновлений для прогона (нужен JSONL с объектами Update)")
+
+    with tempfile.TemporaryDirectory(prefix="replay_bench_") as tmp:
+        config, bot, dp, session, modules = await build_bot(args, str(Path(tmp) / "bench.db"))
+
+        module_timings = Timings()
+        handler_timings = Timings()
+        wrapped = instrument_modules(modules, module_timings)
+        dp.message.middleware(HandlerTimer(handler_timings))
+        register_all_handlers(dp, modules)
+
+        # Разогрев: get_me в обработчиках, компиляция регулярных выражений
+        await asyncio.sleep(0.1)
+        db_service = modules['db']
+        commits_before = commit_count(db_service)
+        session.calls.clear()
+
+        if args.tracemalloc:
+            tracemalloc.start()
+
+        update_timings = Timings()
+        duration = await replay(dp, bot, updates, args.rate, args.concurrency, update_timings)
+
+        # Фоновая стадия и отложенная запись - часть стоимости обновлений
+        drain_started = time.perf_counter()
+        if modules.get('update_pipeline'):
+            await modules['update_pipeline'].stop()
+        await db_service.flush_writes()
+        drain = time.perf_counter() - drain_started
+
+        traced_peak = None
+        if args.tracemalloc:
+            traced_peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+
+        report = {
+            'updates': len(updates),
+            'mode': f"rate {args.rate}/s" if args.rate else f"max (concurrency {args.concurrency})",
+            'duration_s': round(duration, 3),
+            'drain_s': round(drain, 3),
+            'updates_per_s': round(len(updates) / duration, 1) if duration else 0.0,
+            'latency': update_timings.summary('update'),
+            'db_commits': commit_count(db_service) - commits_before,
+            'api_calls': dict(session.calls),
+            'peak_rss_mb': peak_rss_mb(),
+            'traced_peak_mb': traced_peak,
+            'instrumented_methods': wrapped,
+            'handlers': {name: handler_timings.summary(name) for name in sorted(handler_timings.samples)},
+            'modules': {name: module_timings.summary(name) for name in sorted(module_timings.samples)}
+        }
+
+        if modules.get('media_triggers'):
+            await modules['media_triggers'].close()
+        await db_service.close()
+        await bot.session.close()
+
+    return report
+
+
+# =================== ОТЧЕТ ===================
+
+def print_report(report: Dict[str, Any], top: int):
+    latency = report['latency']
+    print("\n" + "=" * 60)
+    print(f"🏎️ Обновлений: {report['updates']} ({report['mode']})")
+    print(f"⏱️ Прогон: {report['duration_s']}с + фоновая запись {report['drain_s']}с")
+    print(f"🚀 Пропускная способность: {report['updates_per_s']} обновлений/с")
+    print(f"📊 Обновление: p50 {latency['p50_ms']} мс | p95 {latency['p95_ms']} мс | "
+          f"p99 {latency['p99_ms']} мс | max {latency['max_ms']} мс | ошибок {latency['errors']}")
+    print(f"💾 Коммитов БД: {report['db_commits']}")
+    print(f"📡 Запросов к API: {sum(report['api_calls'].values())} {report['api_calls']}")
+    if report['peak_rss_mb'] is not None:
+        print(f"📈 Пик RSS: {report['peak_rss_mb']} МБ")
+    if report['traced_peak_mb'] is not None:
+        print(f"📈 Пик памяти Python (tracemalloc): {report['traced_peak_mb']} МБ")
+
+    print("\n🎛️ ОБРАБОТЧИКИ")
+    _print_table(report['handlers'], top)
+
+    print(f"\n🧩 МЕТОДЫ МОДУЛЕЙ (включающее время, по сумме; замерено методов: {report['instrumented_methods']})")
+    _print_table(report['modules'], top)
+    print("=" * 60)
+
+
+def _print_table(rows: Dict[str, Dict[str, Any]], top: int):
+    if not rows:
+        print("   (нет вызовов)")
+        return
+    print(f"   {'имя':<48} {'вызовов':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'сумма мс':>11}")
+    for name, row in sorted(rows.items(), key=lambda item: -item[1]['total_ms'])[:top]:
+        errors = f"  ❌{row['errors']}" if row['errors'] else ""
+        print(f"   {name:<48} {row['count']:>8} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['total_ms']:>11.1f}{errors}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """🔍 Регрессии относительно прошлого отчета"""
+    regressions = []
+
+    def worse(name: str, current: float, previous: float, higher_is_better: bool = False):
+        if not previous:
+            return
+        change = (previous - current) / previous if higher_is_better else (current - previous) / previous
+        if change > tolerance:
+            regressions.append(f"{name}: {previous} -> {current} (хуже на {change:.0%})")
+
+    worse("p95 обновления, мс", report['latency']['p95_ms'], baseline['latency']['p95_ms'])
+    worse("p99 обновления, мс", report['latency']['p99_ms'], baseline['latency']['p99_ms'])
+    # Пропускная способность сравнима только при одинаковом режиме подачи
+    if report['mode'] == baseline.get('mode'):
+        worse("обновлений/с", report['updates_per_s'], baseline['updates_per_s'], higher_is_better=True)
+    else:
+        print(f"⚠️ Режимы различаются ({baseline.get('mode')} -> {report['mode']}), обновлений/с не сравниваются")
+    worse("коммитов БД", report['db_commits'], baseline['db_commits'])
+
+    for name, row in report['handlers'].items():
+        previous = baseline.get('handlers', {}).get(name)
+        if previous:
+            worse(f"p95 {name}, мс", row['p95_ms'], previous['p95_ms'])
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Прогон обновлений через Dispatcher без сети")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--updates", help="JSONL с записанными обновлениями Telegram")
+    source.add_argument("--synthetic", type=int, default=1000, help="Число синтетических обновлений")
+    parser.add_argument("--chats", type=int, default=50, help="Чатов в синтетической нагрузке")
+    parser.add_argument("--users", type=int, default=200, help="Пользователей в синтетической нагрузке")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", type=float, default=0.0, help="Обновлений/с (0 - максимум)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Одновременных обновлений в режиме максимума")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Имитация задержки Telegram API")
+    parser.add_argument("--tracemalloc", action="store_true", help="Пик памяти Python (замедляет прогон)")
+    parser.add_argument("--top", type=int, default=20, help="Строк в таблицах")
+    parser.add_argument("--json", help="Сохранить отчет в JSON")
+    parser.add_argument("--baseline", help="Отчет JSON для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (0.2 = 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="Логи модулей")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR)
+
+    report = asyncio.run(run(args))
+    report['generated_at'] = datetime.now().isoformat()
+    print_report(report, args.top)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"💾 Отчет сохранен: {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n🐢 РЕГРЕССИИ (допуск {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   • {line}")
+            return 1
+        print(f"\n✅ Регрессий нет (допуск {args.tolerance:.0%})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
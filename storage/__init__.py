@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+🗄️ БЭКЕНДЫ ХРАНИЛИЩА
+
+• sqlite   - файл SQLite: один писатель + пул читателей (по умолчанию)
+• postgres - PostgreSQL через пул asyncpg, для нескольких процессов бота
+
+Выбор: DB_BACKEND=sqlite|postgres, для postgres - DATABASE_URL.
+Проверка совместимости: python storage_conformance.py [--dsn ...]
+"""
+
+from storage.base import StorageBackend, Record, RowShape, row_converter
+from storage.sqlite import SQLiteBackend
+
+
+def create_backend(config) -> StorageBackend:
+    """🏭 Бэкенд по конфигурации БД"""
+    backend = (getattr(config, 'backend', '') or 'sqlite').lower()
+
+    if backend == 'sqlite':
+        return SQLiteBackend(config)
+
+    if backend in ('postgres', 'postgresql'):
+        from storage.postgres import PostgresBackend
+        return PostgresBackend(config)
+
+    raise ValueError(f"Неизвестный бэкенд БД: {backend}")
+
+
+__all__ = ["StorageBackend", "SQLiteBackend", "Record", "RowShape", "row_converter", "create_backend"]
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+🗄️ Базовый интерфейс хранилища
+
+DatabaseService работает с базой только через StorageBackend: SQL в модулях
+пишется в диалекте SQLite (плейсхолдеры '?', INSERT OR REPLACE), а бэкенд
+другой СУБД переводит его в свой диалект.
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Union, Sequence, Tuple
+
+
+class Record:
+    """📦 Легковесная запись для результатов запросов
+
+    Наследник перечисляет колонки в __slots__ в порядке SELECT:
+
+        class KarmaRow(Record):
+            __slots__ = ('user_id', 'karma')
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """📋 Преобразование в словарь"""
+        return {name: getattr(self, name, None) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name, None)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+RowShape = Union[str, type]
+
+
+def row_converter(row_shape: RowShape, columns: Sequence[str]) -> Optional[Callable]:
+    """🔧 Построение конвертера строк один раз на запрос (None - отдавать строки как есть)"""
+    if row_shape in ('tuple', tuple):
+        return None
+
+    if row_shape in ('dict', dict):
+        columns = tuple(columns)
+        return lambda row: dict(zip(columns, row))
+
+    if isinstance(row_shape, type):
+        return lambda row: row_shape(*row)
+
+    raise ValueError(f"Неизвестная форма строки: {row_shape!r}")
+
+
+class StorageBackend(ABC):
+    """🗄️ Бэкенд хранилища
+
+    Записи вне transaction() коммитятся сразу. Внутри transaction() все
+    вызовы текущей задачи идут в одной транзакции; вложенный блок -
+    точка сохранения (SAVEPOINT).
+    """
+
+    dialect = ""
+
+    # Возможности, которые есть не у всех СУБД
+    supports_archive = False    # Помесячные архивные файлы (ATTACH)
+    supports_backup = False     # Online backup API
+    supports_explain = False    # EXPLAIN QUERY PLAN для советника по индексам
+    supports_maintenance = False  # VACUUM / optimize / чекпойнты WAL по расписанию
+
+    @abstractmethod
+    async def connect(self):
+        """🔌 Открытие соединений"""
+
+    @abstractmethod
+    async def close(self):
+        """🔒 Закрытие соединений"""
+
+    # =================== ЗАПИСЬ ===================
+
+    @abstractmethod
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        """⚡ Выполнение запроса, возвращает число затронутых строк"""
+
+    @abstractmethod
+    async def execute_many(self, query: str, params_list: List[tuple]):
+        """⚡ Пакетное выполнение одного запроса"""
+
+    @abstractmethod
+    async def execute_batch(self, batch: List[Tuple[str, List[tuple]]]):
+        """⚡ Несколько пакетов [(запрос, строки)] одной транзакцией"""
+
+    @abstractmethod
+    def transaction(self):
+        """🔐 Транзакция (асинхронный контекстный менеджер)"""
+
+    @abstractmethod
+    def in_transaction(self) -> bool:
+        """🔎 Выполняется ли текущая задача внутри transaction()"""
+
+    # =================== ЧТЕНИЕ ===================
+
+    @abstractmethod
+    async def fetch_one(self, query: str, params: tuple = (), row_shape: RowShape = 'dict'):
+        """📝 Одна строка или None"""
+
+    @abstractmethod
+    async def fetch_all(self, query: str, params: tuple = (), row_shape: RowShape = 'dict') -> list:
+        """📋 Все строки"""
+
+    @abstractmethod
+    def iterate(self, query: str, params: tuple = (), row_shape: RowShape = 'dict',
+                batch_size: int = 500) -> AsyncIterator[Any]:
+        """🌊 Потоковое чтение пачками"""
+
+    # =================== СХЕМА ===================
+
+    @abstractmethod
+    async def table_exists(self, table: str) -> bool:
+        """🔎 Есть ли таблица"""
+
+    @abstractmethod
+    async def table_columns(self, table: str) -> List[str]:
+        """📋 Колонки таблицы"""
+
+    @abstractmethod
+    async def backfill(self, table: str, assignments: str, where: str,
+                       params: tuple = (), batch_size: int = 1000) -> int:
+        """🔁 UPDATE пачками, каждая пачка - своя транзакция"""
+
+    # =================== СЛУЖЕБНОЕ ===================
+
+    def is_transient_error(self, error: Exception) -> bool:
+        """⏳ Временная ли ошибка (блокировка, обрыв соединения) - можно повторить"""
+        return False
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """📊 Статистика соединений"""
+        return {'backend': self.dialect}
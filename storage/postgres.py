@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+🐘 PostgreSQL бэкенд (asyncpg)
+
+Для нескольких процессов бота с одной базой. Модули пишут SQL в диалекте
+SQLite, бэкенд переводит его:
+• плейсхолдеры '?' -> $1, $2, ...
+• INSERT OR REPLACE -> INSERT ... ON CONFLICT (первичный ключ) DO UPDATE
+  (в отличие от SQLite, колонки не из списка INSERT сохраняют старые значения)
+• INSERT OR IGNORE -> INSERT ... ON CONFLICT DO NOTHING
+• DDL: AUTOINCREMENT -> BIGSERIAL, INTEGER -> BIGINT (id Telegram не влезают
+  в int4), REAL -> DOUBLE PRECISION, DATETIME/DATE -> TEXT
+
+Даты хранятся текстом в том же формате, что у sqlite3 ('YYYY-MM-DD HH:MM:SS'),
+поэтому сравнения и fromisoformat() в модулях работают без изменений.
+
+Требуется пакет asyncpg (pip install asyncpg).
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+from contextlib import asynccontextmanager
+from datetime import datetime, date
+from typing import List, Dict, Any, AsyncIterator, Tuple
+
+from storage.base import StorageBackend, RowShape, row_converter
+
+logger = logging.getLogger(__name__)
+
+_INSERT_OR_RE = re.compile(
+    r"^\s*INSERT\s+OR\s+(REPLACE|IGNORE)\s+INTO\s+(\w+)\s*\(([^)]*)\)",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Замены типов в DDL (ключевые слова в схеме пишутся заглавными)
+_DDL_REPLACEMENTS = [
+    (re.compile(r"\bINTEGER PRIMARY KEY AUTOINCREMENT\b"), "BIGSERIAL PRIMARY KEY"),
+    (re.compile(r"\bINTEGER\b"), "BIGINT"),
+    (re.compile(r"\bREAL\b"), "DOUBLE PRECISION"),
+    (re.compile(r"\bDATETIME\b"), "TEXT"),
+    (re.compile(r"(?<=\s)DATE\b"), "TEXT"),
+    (re.compile(r"\bDEFAULT CURRENT_TIMESTAMP\b"),
+     "DEFAULT (to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS'))"),
+]
+
+
+def convert_placeholders(query: str) -> str:
+    """🔁 '?' -> $1..$n вне строковых литералов и идентификаторов в кавычках"""
+    result = []
+    index = 0
+    quote_char = None
+
+    for char in query:
+        if quote_char:
+            if char == quote_char:
+                quote_char = None
+        elif char in ("'", '"'):
+            quote_char = char
+        elif char == '?':
+            index += 1
+            result.append(f"${index}")
+            continue
+        result.append(char)
+
+    return "".join(result)
+
+
+def translate_ddl(query: str) -> str:
+    """🏗️ DDL SQLite -> PostgreSQL"""
+    for pattern, replacement in _DDL_REPLACEMENTS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+def _is_ddl(query: str) -> bool:
+    head = query.lstrip().upper()
+    return head.startswith(("CREATE TABLE", "ALTER TABLE"))
+
+
+def _adapt_param(value):
+    """🕐 datetime/date -> текст в формате адаптера sqlite3"""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _adapt_params(params) -> tuple:
+    return tuple(_adapt_param(value) for value in params or ())
+
+
+class PostgresBackend(StorageBackend):
+    """🐘 Хранилище в PostgreSQL с пулом соединений asyncpg"""
+
+    dialect = "postgres"
+
+    def __init__(self, config):
+        self.config = config
+        self.dsn = config.dsn
+        self.pool_min_size = max(1, getattr(config, 'pool_min_size', 2))
+        self.pool_max_size = max(self.pool_min_size, getattr(config, 'pool_max_size', 10))
+        self.pool = None
+
+        # Кэш перевода запросов (аналог кэша выражений sqlite3)
+        self._translated: Dict[str, str] = {}
+        self._primary_keys: Dict[str, List[str]] = {}
+        self._pk_lock = asyncio.Lock()
+
+        # Соединение транзакции текущей задачи (задачи, созданные внутри, наследуют его)
+        self._tx_connection: contextvars.ContextVar = contextvars.ContextVar(
+            f'pg_tx_connection_{id(self)}', default=None
+        )
+        # committed - транзакции transaction(), autocommitted - одиночные записи
+        self.tx_stats = {'committed': 0, 'autocommitted': 0, 'rolled_back': 0, 'savepoints_rolled_back': 0}
+
+    async def connect(self):
+        """🔌 Открытие пула соединений"""
+        try:
+            import asyncpg
+        except ImportError as e:
+            raise RuntimeError("Для DB_BACKEND=postgres нужен пакет asyncpg (pip install asyncpg)") from e
+
+        if not self.dsn:
+            raise RuntimeError("Для DB_BACKEND=postgres нужен DATABASE_URL")
+
+        self._asyncpg = asyncpg
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.pool_min_size,
+            max_size=self.pool_max_size,
+            command_timeout=30.0
+        )
+        logger.info(f"🐘 Пул PostgreSQL открыт: {self.pool_min_size}-{self.pool_max_size} соединений")
+
+    async def close(self):
+        """🔒 Закрытие пула"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    # =================== ПЕРЕВОД SQL ===================
+
+    async def _primary_key(self, table: str) -> List[str]:
+        """🔑 Колонки первичного ключа (для INSERT OR REPLACE)"""
+        if table in self._primary_keys:
+            return self._primary_keys[table]
+
+        async with self._pk_lock:
+            if table not in self._primary_keys:
+                rows = await self._fetch_raw("""
+                    SELECT a.attname
+                    FROM pg_index i
+                    JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                    WHERE i.indrelid = $1::regclass AND i.indisprimary
+                """, (table,))
+                self._primary_keys[table] = [row[0] for row in rows]
+        return self._primary_keys[table]
+
+    async def _translate(self, query: str) -> str:
+        """🔁 Запрос SQLite -> PostgreSQL (с кэшем)"""
+        translated = self._translated.get(query)
+        if translated is not None:
+            return translated
+
+        translated = query
+        if _is_ddl(query):
+            translated = translate_ddl(query)
+
+        match = _INSERT_OR_RE.match(translated)
+        if match:
+            mode, table, column_list = match.group(1).upper(), match.group(2), match.group(3)
+            columns = [column.strip() for column in column_list.split(',')]
+            translated = re.sub(r"\bOR\s+(REPLACE|IGNORE)\s+", "", translated, count=1, flags=re.IGNORECASE)
+            translated = translated.rstrip().rstrip(';')
+
+            if mode == 'IGNORE':
+                translated += " ON CONFLICT DO NOTHING"
+            else:
+                key = await self._primary_key(table)
+                updates = [column for column in columns if column not in key]
+                # Без ключа среди колонок конфликт невозможен - как и в SQLite, это обычный INSERT
+                if key and all(column in columns for column in key):
+                    if updates:
+                        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in updates)
+                        translated += f" ON CONFLICT ({', '.join(key)}) DO UPDATE SET {assignments}"
+                    else:
+                        translated += f" ON CONFLICT ({', '.join(key)}) DO NOTHING"
+
+        translated = convert_placeholders(translated)
+        self._translated[query] = translated
+        return translated
+
+    # =================== ТРАНЗАКЦИИ ===================
+
+    def in_transaction(self) -> bool:
+        return self._tx_connection.get() is not None
+
+    @asynccontextmanager
+    async def _connection(self):
+        """🔌 Соединение транзакции текущей задачи или свободное из пула"""
+        conn = self._tx_connection.get()
+        if conn is not None:
+            yield conn
+            return
+
+        async with self.pool.acquire() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def transaction(self):
+        """🔐 Транзакция; вложенные блоки asyncpg оформляет точками сохранения"""
+        conn = self._tx_connection.get()
+        if conn is not None:
+            try:
+                async with conn.transaction():
+                    yield self
+            except BaseException:
+                self.tx_stats['savepoints_rolled_back'] += 1
+                raise
+            return
+
+        async with self.pool.acquire() as conn:
+            token = self._tx_connection.set(conn)
+            try:
+                async with conn.transaction():
+                    yield self
+            except BaseException:
+                self.tx_stats['rolled_back'] += 1
+                raise
+            else:
+                self.tx_stats['committed'] += 1
+            finally:
+                self._tx_connection.reset(token)
+
+    # =================== ЗАПИСЬ ===================
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        sql = await self._translate(query)
+        async with self._connection() as conn:
+            status = await conn.execute(sql, *_adapt_params(params))
+        if not self.in_transaction():
+            self.tx_stats['autocommitted'] += 1
+        # "UPDATE 3" / "INSERT 0 1" - число строк последним словом
+        tail = status.rsplit(' ', 1)[-1] if status else ''
+        return int(tail) if tail.isdigit() else -1
+
+    async def execute_many(self, query: str, params_list: List[tuple]):
+        sql = await self._translate(query)
+        rows = [_adapt_params(params) for params in params_list]
+        async with self._connection() as conn:
+            await conn.executemany(sql, rows)
+        if not self.in_transaction():
+            self.tx_stats['autocommitted'] += 1
+
+    async def execute_batch(self, batch: List[Tuple[str, List[tuple]]]):
+        translated = [(await self._translate(query), rows) for query, rows in batch]
+        async with self.transaction():
+            conn = self._tx_connection.get()
+            for sql, rows in translated:
+                await conn.executemany(sql, [_adapt_params(params) for params in rows])
+
+    # =================== ЧТЕНИЕ ===================
+
+    async def _fetch_raw(self, sql: str, params: tuple = ()):
+        async with self._connection() as conn:
+            return await conn.fetch(sql, *params)
+
+    async def fetch_one(self, query: str, params: tuple = (), row_shape: RowShape = 'dict'):
+        sql = await self._translate(query)
+        async with self._connection() as conn:
+            row = await conn.fetchrow(sql, *_adapt_params(params))
+        if row is None:
+            return None
+        convert = row_converter(row_shape, list(row.keys()))
+        return convert(tuple(row)) if convert else tuple(row)
+
+    async def fetch_all(self, query: str, params: tuple = (), row_shape: RowShape = 'dict') -> list:
+        sql = await self._translate(query)
+        async with self._connection() as conn:
+            rows = await conn.fetch(sql, *_adapt_params(params))
+        if not rows:
+            return []
+        convert = row_converter(row_shape, list(rows[0].keys()))
+        return [convert(tuple(row)) for row in rows] if convert else [tuple(row) for row in rows]
+
+    async def iterate(self, query: str, params: tuple = (), row_shape: RowShape = 'dict',
+                      batch_size: int = 500) -> AsyncIterator[Any]:
+        sql = await self._translate(query)
+        async with self._connection() as conn:
+            # Серверный курсор asyncpg работает только внутри транзакции;
+            # внутри уже открытой транзакции это будет точка сохранения
+            transaction = conn.transaction() if self.in_transaction() else conn.transaction(readonly=True)
+            async with transaction:
+                convert = None
+                async for row in conn.cursor(sql, *_adapt_params(params), prefetch=batch_size):
+                    if convert is None:
+                        convert = row_converter(row_shape, list(row.keys())) or tuple
+                    yield convert(tuple(row))
+
+    # =================== СХЕМА ===================
+
+    async def table_exists(self, table: str) -> bool:
+        rows = await self._fetch_raw("SELECT to_regclass($1) IS NOT NULL", (table,))
+        return bool(rows[0][0])
+
+    async def table_columns(self, table: str) -> List[str]:
+        rows = await self._fetch_raw("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = $1
+            ORDER BY ordinal_position
+        """, (table,))
+        return [row[0] for row in rows]
+
+    async def backfill(self, table: str, assignments: str, where: str,
+                       params: tuple = (), batch_size: int = 1000) -> int:
+        """🔁 UPDATE пачками по ctid (params - только для where)
+
+        Число проходов ограничено исходным числом подходящих строк, поэтому
+        цикл завершается, даже если после обновления строка все еще
+        подходит под where.
+        """
+        where_sql = convert_placeholders(where)
+        count_sql = f"SELECT COUNT(*) FROM {table} WHERE {where_sql}"
+        update_sql = f"""
+            UPDATE {table} SET {convert_placeholders(assignments)}
+            WHERE ctid = ANY(ARRAY(
+                SELECT ctid FROM {table} WHERE {where_sql} LIMIT {int(batch_size)}
+            ))
+        """
+        params = _adapt_params(params)
+
+        rows = await self._fetch_raw(count_sql, params)
+        total = rows[0][0]
+        updated = 0
+
+        for _ in range(total // batch_size + 1):
+            async with self._connection() as conn:
+                status = await conn.execute(update_sql, *params)
+            count = int(status.rsplit(' ', 1)[-1])
+            if count == 0:
+                break
+            updated += count
+            await asyncio.sleep(0)
+
+        return updated
+
+    # =================== СЛУЖЕБНОЕ ===================
+
+    def is_transient_error(self, error: Exception) -> bool:
+        asyncpg = getattr(self, '_asyncpg', None)
+        if asyncpg is None:
+            return False
+        return isinstance(error, (
+            asyncpg.exceptions.SerializationError,
+            asyncpg.exceptions.DeadlockDetectedError,
+            asyncpg.exceptions.ConnectionDoesNotExistError,
+            asyncpg.exceptions.TooManyConnectionsError,
+            asyncpg.exceptions.CannotConnectNowError,
+            ConnectionError,
+        ))
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        stats = {'backend': self.dialect, 'transactions': dict(self.tx_stats)}
+        if self.pool:
+            stats.update({
+                'pool_size': self.pool.get_size(),
+                'idle_connections': self.pool.get_idle_size(),
+                'pool_min_size': self.pool_min_size,
+                'pool_max_size': self.pool_max_size
+            })
+        return stats
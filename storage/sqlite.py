@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+🪶 SQLite бэкенд
+
+Одно соединение-писатель (запись и транзакции сериализуются блокировкой)
+и пул соединений только для чтения: в режиме WAL читатели не ждут писателя.
+"""
+
+import asyncio
+import logging
+import sqlite3
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from urllib.parse import quote
+
+import aiosqlite
+
+from storage.base import StorageBackend, RowShape, row_converter
+
+logger = logging.getLogger(__name__)
+
+# Размер кэша скомпилированных запросов на соединение (у sqlite3 по умолчанию 128)
+STATEMENT_CACHE_SIZE = 256
+
+
+def _columns(cursor) -> List[str]:
+    return [column[0] for column in cursor.description]
+
+
+class SQLiteBackend(StorageBackend):
+    """🪶 Хранилище в файле SQLite"""
+
+    dialect = "sqlite"
+    supports_archive = True
+    supports_backup = True
+    supports_explain = True
+    supports_maintenance = True
+
+    def __init__(self, config):
+        self.config = config
+        self.db_path = config.path
+        self.connection: Optional[aiosqlite.Connection] = None  # Единственное соединение-писатель
+
+        # Пул соединений только для чтения (WAL позволяет читать параллельно с записью)
+        self.read_pool_size = max(0, getattr(config, 'read_pool_size', 4))
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        self.pool_stats = {'reads': 0, 'writer_reads': 0, 'reader_waits': 0}
+
+        # Писатель один: запись и транзакции сериализуются через блокировку
+        self.write_lock = asyncio.Lock()
+        self._tx_task: Optional[asyncio.Task] = None
+        self._tx_depth = 0
+        # committed - транзакции transaction(), autocommitted - одиночные записи
+        self.tx_stats = {'committed': 0, 'autocommitted': 0, 'rolled_back': 0, 'savepoints_rolled_back': 0}
+
+    async def connect(self):
+        """🔌 Открытие писателя и пула читателей"""
+        # Создаем директорию если не существует
+        if self.db_path != ':memory:':
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = await aiosqlite.connect(
+            self.db_path,
+            timeout=30.0,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+
+        # Новые БД сразу создаются с инкрементальным VACUUM (для старых - no-op,
+        # их переводит планировщик обслуживания)
+        await self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+        # Включаем WAL режим если настроено
+        if getattr(self.config, 'wal_mode', True):
+            await self.connection.execute("PRAGMA journal_mode=WAL")
+
+        # Настройки производительности
+        await self.connection.execute("PRAGMA foreign_keys=ON")
+        await self.connection.execute("PRAGMA cache_size=-2000")
+        await self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        await self._open_readers()
+
+    async def close(self):
+        """🔒 Закрытие читателей и писателя"""
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._reader_queue = None
+
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
+
+    async def _open_readers(self):
+        """📖 Открытие пула соединений только для чтения"""
+        if self.read_pool_size <= 0 or self.db_path == ':memory:':
+            logger.info("📖 Пул читателей отключен, чтение идет через писателя")
+            return
+
+        uri = f"file:{quote(Path(self.db_path).resolve().as_posix())}?mode=ro"
+        self._reader_queue = asyncio.Queue()
+
+        for _ in range(self.read_pool_size):
+            reader = await aiosqlite.connect(
+                uri, uri=True, timeout=30.0, cached_statements=STATEMENT_CACHE_SIZE
+            )
+            await reader.execute("PRAGMA cache_size=-2000")
+            self._readers.append(reader)
+            self._reader_queue.put_nowait(reader)
+
+        logger.info(f"📖 Пул читателей открыт: {len(self._readers)} соединений")
+
+    @asynccontextmanager
+    async def read_connection(self):
+        """📖 Выдача свободного читателя (или писателя, если пула нет)"""
+        self.pool_stats['reads'] += 1
+
+        # Внутри транзакции читаем через писателя, чтобы видеть свои изменения
+        if not self._reader_queue or self.in_transaction():
+            self.pool_stats['writer_reads'] += 1
+            yield self.connection
+            return
+
+        if self._reader_queue.empty():
+            self.pool_stats['reader_waits'] += 1
+
+        reader = await self._reader_queue.get()
+        try:
+            yield reader
+        finally:
+            self._reader_queue.put_nowait(reader)
+
+    # =================== ТРАНЗАКЦИИ ===================
+
+    def in_transaction(self) -> bool:
+        """🔎 Выполняется ли текущая задача внутри transaction()"""
+        return self._tx_task is not None and self._tx_task is asyncio.current_task()
+
+    @asynccontextmanager
+    async def writer(self):
+        """✍️ Доступ к писателю: вне транзакции - под блокировкой и с коммитом"""
+        if self.in_transaction():
+            yield self.connection
+            return
+
+        async with self.write_lock:
+            try:
+                yield self.connection
+                await self.connection.commit()
+                self.tx_stats['autocommitted'] += 1
+            except Exception:
+                await self.connection.rollback()
+                raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        """🔐 BEGIN IMMEDIATE; вложенные блоки - SAVEPOINT"""
+        if self.in_transaction():
+            self._tx_depth += 1
+            savepoint = f"sp_{self._tx_depth}"
+            await self.connection.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield self
+            except BaseException:
+                await self.connection.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                await self.connection.execute(f"RELEASE SAVEPOINT {savepoint}")
+                self.tx_stats['savepoints_rolled_back'] += 1
+                raise
+            else:
+                await self.connection.execute(f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                self._tx_depth -= 1
+            return
+
+        async with self.write_lock:
+            self._tx_task = asyncio.current_task()
+            self._tx_depth = 0
+            try:
+                await self.connection.execute("BEGIN IMMEDIATE")
+                try:
+                    yield self
+                except BaseException:
+                    await self.connection.rollback()
+                    self.tx_stats['rolled_back'] += 1
+                    raise
+                else:
+                    await self.connection.commit()
+                    self.tx_stats['committed'] += 1
+            finally:
+                self._tx_task = None
+                self._tx_depth = 0
+
+    # =================== ЗАПИСЬ ===================
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        async with self.writer() as conn:
+            async with conn.execute(query, params or ()) as cursor:
+                return cursor.rowcount
+
+    async def execute_many(self, query: str, params_list: List[tuple]):
+        async with self.writer() as conn:
+            await conn.executemany(query, params_list)
+
+    async def execute_batch(self, batch: List[Tuple[str, List[tuple]]]):
+        async with self.writer() as conn:
+            for query, rows in batch:
+                await conn.executemany(query, rows)
+
+    # =================== ЧТЕНИЕ ===================
+
+    async def fetch_one(self, query: str, params: tuple = (), row_shape: RowShape = 'dict'):
+        async with self.read_connection() as conn:
+            # Курсор закрываем сразу, чтобы не держать снимок чтения
+            async with conn.execute(query, params or ()) as cursor:
+                row = await cursor.fetchone()
+                if row is None:
+                    return None
+                convert = row_converter(row_shape, _columns(cursor))
+                return convert(row) if convert else row
+
+    async def fetch_all(self, query: str, params: tuple = (), row_shape: RowShape = 'dict') -> list:
+        async with self.read_connection() as conn:
+            async with conn.execute(query, params or ()) as cursor:
+                rows = await cursor.fetchall()
+                if not rows:
+                    return []
+                convert = row_converter(row_shape, _columns(cursor))
+                return [convert(row) for row in rows] if convert else list(rows)
+
+    async def iterate(self, query: str, params: tuple = (), row_shape: RowShape = 'dict',
+                      batch_size: int = 500) -> AsyncIterator[Any]:
+        async with self.read_connection() as conn:
+            async with conn.execute(query, params or ()) as cursor:
+                convert = row_converter(row_shape, _columns(cursor))
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield convert(row) if convert else row
+
+    # =================== СХЕМА ===================
+
+    async def table_exists(self, table: str) -> bool:
+        row = await self.fetch_one(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,), row_shape='tuple'
+        )
+        return row is not None
+
+    async def table_columns(self, table: str) -> List[str]:
+        rows = await self.fetch_all(f"PRAGMA table_info({table})", row_shape='tuple')
+        return [row[1] for row in rows]
+
+    async def backfill(self, table: str, assignments: str, where: str,
+                       params: tuple = (), batch_size: int = 1000) -> int:
+        """🔁 UPDATE пачками по возрастанию rowid
+
+        Проход по rowid завершается, даже если после обновления строка
+        все еще подходит под where.
+        """
+        last_rowid = -1
+        updated = 0
+        while True:
+            async with self.writer() as conn:
+                async with conn.execute(f"""
+                    SELECT rowid FROM {table}
+                    WHERE rowid > ? AND ({where})
+                    ORDER BY rowid LIMIT ?
+                """, (last_rowid, *params, batch_size)) as cursor:
+                    rowids = [row[0] for row in await cursor.fetchall()]
+
+                if rowids:
+                    await conn.execute(f"""
+                        UPDATE {table} SET {assignments}
+                        WHERE rowid BETWEEN ? AND ? AND ({where})
+                    """, (rowids[0], rowids[-1], *params))
+
+            if not rowids:
+                return updated
+
+            updated += len(rowids)
+            last_rowid = rowids[-1]
+
+            # Отдаем управление циклу событий между пачками
+            await asyncio.sleep(0)
+
+    # =================== СЛУЖЕБНОЕ ===================
+
+    def is_transient_error(self, error: Exception) -> bool:
+        # "database is locked" и подобные - повторяемы; битые данные - нет
+        return isinstance(error, sqlite3.OperationalError)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.dialect,
+            'writer': 1 if self.connection else 0,
+            'readers': len(self._readers),
+            'idle_readers': self._reader_queue.qsize() if self._reader_queue else 0,
+            **self.pool_stats,
+            'transactions': dict(self.tx_stats)
+        }
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+🧪 Проверка совместимости бэкендов хранилища
+
+Прогоняет один и тот же набор операций DatabaseService на выбранном бэкенде:
+CRUD, формы строк, именованные запросы, upsert, транзакции и SAVEPOINT,
+потоковое чтение, очередь записи и повторный прогон миграций.
+
+Использование:
+    python storage_conformance.py                         # SQLite во временной папке
+    python storage_conformance.py --dsn postgresql://...  # PostgreSQL (пустая БД!)
+
+Код возврата 1, если хоть одна проверка не прошла.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+from config import DatabaseConfig
+from database import DatabaseService
+from migrations import run_migrations
+from storage.base import Record
+
+
+class SettingRow(Record):
+    __slots__ = ('key', 'value')
+
+
+class ConformanceError(AssertionError):
+    """Проверка не прошла"""
+
+
+def check(condition, message: str):
+    if not condition:
+        raise ConformanceError(message)
+
+
+async def check_crud(db: DatabaseService):
+    """👤 Сохранение и чтение пользователя, формы строк"""
+    check(await db.save_user({'id': 10_000_000_001, 'username': 'alice', 'full_name': 'Alice'}),
+          "save_user вернул False")
+
+    row = await db.fetch_one("SELECT id, username FROM users WHERE id = ?", (10_000_000_001,))
+    check(row == {'id': 10_000_000_001, 'username': 'alice'}, f"dict: {row}")
+
+    row = await db.fetch_one("SELECT id, username FROM users WHERE id = ?", (10_000_000_001,), row_shape='tuple')
+    check(tuple(row) == (10_000_000_001, 'alice'), f"tuple: {row}")
+
+    await db.execute("UPDATE users SET username = ? WHERE id = ?", ('alice2', 10_000_000_001))
+    rows = await db.fetch_all("SELECT username FROM users WHERE id = ?", (10_000_000_001,))
+    check(rows == [{'username': 'alice2'}], f"UPDATE: {rows}")
+
+    deleted = await db.execute("DELETE FROM users WHERE id = ?", (10_000_000_001,))
+    check(deleted == 1, f"DELETE вернул {deleted}")
+    check(await db.fetch_one("SELECT 1 FROM users WHERE id = ?", (10_000_000_001,)) is None, "строка не удалена")
+
+
+async def check_upsert_and_named(db: DatabaseService):
+    """⚙️ INSERT OR REPLACE дважды, именованный запрос, Record"""
+    await db.set_setting('conformance', 'one')
+    await db.set_setting('conformance', 'two')
+    check(await db.get_setting('conformance') == 'two', "upsert не обновил значение")
+
+    count = await db.fetch_one("SELECT COUNT(*) AS n FROM system_settings WHERE key = ?", ('conformance',))
+    check(count['n'] == 1, f"upsert создал дубликаты: {count}")
+
+    db.register_query('conformance.setting', "SELECT key, value FROM system_settings WHERE key = ?")
+    row = await db.fetch_one('conformance.setting', ('conformance',), row_shape=SettingRow)
+    check(isinstance(row, SettingRow) and row.value == 'two', f"Record: {row}")
+
+    # '?' внутри строкового литерала - не плейсхолдер
+    row = await db.fetch_one("SELECT value, 'a?b' AS literal FROM system_settings WHERE key = ?", ('conformance',))
+    check(row and row['literal'] == 'a?b', f"литерал с '?': {row}")
+
+
+async def check_transactions(db: DatabaseService):
+    """🔐 Коммит, откат, откат вложенного блока"""
+    async with db.transaction():
+        await db.set_setting('tx.commit', '1')
+        await db.set_setting('tx.commit2', '2')
+    check(await db.get_setting('tx.commit2') == '2', "транзакция не зафиксирована")
+
+    try:
+        async with db.transaction():
+            await db.set_setting('tx.rollback', '1')
+            raise RuntimeError("откат")
+    except RuntimeError:
+        pass
+    check(await db.get_setting('tx.rollback') is None, "откат не сработал")
+
+    async with db.transaction():
+        await db.set_setting('tx.outer', '1')
+        try:
+            async with db.transaction():
+                await db.set_setting('tx.inner', '1')
+                raise RuntimeError("откат вложенного")
+        except RuntimeError:
+            pass
+        # Внутри транзакции чтение видит свои изменения
+        check(await db.get_setting('tx.outer') == '1', "чтение внутри транзакции")
+    check(await db.get_setting('tx.outer') == '1', "внешний блок потерян")
+    check(await db.get_setting('tx.inner') is None, "вложенный блок не откатился")
+
+    async def writer(index: int):
+        async with db.transaction():
+            await db.set_setting(f'tx.concurrent.{index}', str(index))
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(writer(i) for i in range(10)))
+    row = await db.fetch_one("SELECT COUNT(*) AS n FROM system_settings WHERE key LIKE 'tx.concurrent.%'")
+    check(row['n'] == 10, f"параллельные транзакции: {row}")
+
+
+async def check_bulk_and_stream(db: DatabaseService):
+    """🌊 execute_many, очередь записи, потоковое чтение"""
+    await db.execute_many(
+        "INSERT INTO chat_logs (chat_id, user_id, text) VALUES (?, ?, ?)",
+        [(-100, 100_000 + i, f'bulk_{i:04d}') for i in range(1200)]
+    )
+
+    texts = [row['text'] async for row in db.iterate(
+        "SELECT text FROM chat_logs WHERE chat_id = ? ORDER BY text", (-100,), batch_size=100
+    )]
+    check(len(texts) == 1200, f"iterate вернул {len(texts)} строк")
+    check(texts == sorted(texts), "iterate нарушил порядок")
+
+    for i in range(50):
+        await db.log_message(-200, i, f'user{i}', f'User {i}', f'text {i}')
+    await db.flush_writes()
+    row = await db.fetch_one("SELECT COUNT(*) AS n FROM chat_logs WHERE chat_id = ?", (-200,))
+    check(row['n'] == 50, f"очередь записи: {row}")
+
+    stats = await db.get_user_stats(7)
+    check(stats['total_messages'] == 1, f"статистика пользователя: {stats}")
+
+
+async def check_migrations(db: DatabaseService):
+    """🧬 Повторный прогон миграций ничего не применяет"""
+    applied = await run_migrations(db.backend)
+    check(applied == [], f"повторно применены миграции: {applied}")
+
+
+CHECKS = [check_crud, check_upsert_and_named, check_transactions, check_bulk_and_stream, check_migrations]
+
+
+async def run(config: DatabaseConfig) -> int:
+    db = DatabaseService(config)
+    await db.initialize()
+    failed = 0
+
+    try:
+        for check_func in CHECKS:
+            try:
+                await check_func(db)
+                print(f"✅ {check_func.__doc__}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ {check_func.__doc__}: {e}")
+    finally:
+        await db.close()
+
+    print(f"\n{'✅' if not failed else '❌'} {db.backend.dialect}: "
+          f"{len(CHECKS) - failed}/{len(CHECKS)} проверок пройдено")
+    return 1 if failed else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Проверка совместимости бэкендов хранилища")
+    parser.add_argument("--dsn", default="", help="PostgreSQL DSN (по умолчанию - временная SQLite)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+    if args.dsn:
+        return asyncio.run(run(DatabaseConfig(backend='postgres', dsn=args.dsn)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        return asyncio.run(run(DatabaseConfig(path=str(Path(tmp) / 'conformance.db'))))
+
+
+if __name__ == "__main__":
+    sys.exit(main())